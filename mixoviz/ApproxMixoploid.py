@@ -0,0 +1,220 @@
+'''
+A fast approximate version of the TrioMixoploid.py autosome estimate for triage (see "mixoviz trio-mixoploid --approx").  The autosomes
+are cut into small regions that are read in a random order, and after each region the diploid fraction and its confidence interval are
+updated.  The scan stops as soon as the interval is narrower than the tolerance, or when the site or time budget is used up.
+
+The regions are a random sample of clusters of sites, so the interval comes from the spread between regions rather than between sites,
+which keeps it honest when one chromosome differs from the rest (e.g. a mosaic trisomy).  It shrinks to nothing once every region has
+been read, where the estimate is the diploid_frac of the full scan.
+'''
+
+import dataclasses
+import functools
+import multiprocessing
+import numpy as np
+import statistics
+import sys
+import time
+
+from .Options import CI_LEVEL
+from .Regions import planRegions, runShard
+from .RunStats import activeStats, countRejects, timed
+from .SiteCache import loadRegion, readHeader
+from .TrioBAllele import isAutosome
+from .TrioMixoploid import calculateRatios, informativeMasks, printRatioHeader
+from .VcfArrays import MissingContig, PROBAND, trioRejectMasks
+
+#the columns of the approximate table
+APPROX_COLUMNS = ['chrom', 'diploid_frac', 'triploid_frac', 'e', 'diploid_frac_ci_low', 'diploid_frac_ci_high', 'sites_0011', 'sites_1100',
+    'regions', 'regions_total', 'seconds', 'stopped']
+
+#the interval is only trusted once this many regions with informative sites of both kinds have been read
+MIN_REGIONS = 20
+
+def approxRegion(vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, cacheDir, region):
+    '''
+    This function reads one sampled region, it is run in a worker process when threads are used
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param region - the Regions.Region to read
+    @return - tuple (n0011, sum0011, n1100, sum1100) of the number of informative sites of each kind and the sum of their proband
+        B-allele frequencies, or None if the contig has no records
+    '''
+    try:
+        sites = loadRegion(vcfFN, region, [proband, father, mother], cacheDir)
+    except MissingContig:
+        return None
+
+    with timed('filter'):
+        mask0011, mask1100 = informativeMasks(sites, MIN_DEPTH, MIN_QUALITY)
+        if activeStats() is not None:
+            countRejects(len(sites.pos), trioRejectMasks(sites, MIN_DEPTH, MIN_QUALITY)+[('genotype', ~(mask0011 | mask1100))])
+        ret = ()
+        for mask in [mask0011, mask1100]:
+            refDepths = sites.ad[mask, PROBAND, 0]
+            altDepths = sites.ad[mask, PROBAND, 1]
+            ret += (int(mask.sum()), float(np.sum(1.0*altDepths/(refDepths+altDepths))))
+        return ret
+
+def approxInterval(moments, informativeRegions, regionsTotal):
+    '''
+    This function solves the system for the regions read so far and linearizes it to get a confidence interval.  Each ratio is a ratio
+    estimator over the sampled regions, so its variance comes from the per-region residuals with a finite population correction.
+    @param moments - the sum of the outer products of (1, n0011, sum0011, n1100, sum1100) over the regions read, see approxRegion(...)
+    @param informativeRegions - the number of regions read with informative sites of both kinds
+    @param regionsTotal - the number of regions that could be read
+    @return - tuple (p, e, low, high), the interval is nan until MIN_REGIONS regions have informative sites of both kinds
+    '''
+    regions, n0011, sum0011, n1100, sum1100 = moments[0]
+    if n0011 == 0 or n1100 == 0:
+        return (np.nan, np.nan, np.nan, np.nan)
+    mean0011 = sum0011/n0011
+    mean1100 = sum1100/n1100
+    ps, es = calculateRatios(np.array([mean0011]), np.array([mean1100]))
+    p, e = (ps[0], es[0])
+    if informativeRegions < MIN_REGIONS:
+        return (p, e, np.nan, np.nan)
+
+    #from p = 1-3*f01+3*f10, each region moves p by its residuals (sum-n*mean) weighted by -3/N01 and 3/N10, so the sum of their
+    #squares is a quadratic form of the moments and no per-region values need to be kept
+    w = np.array([3*mean0011/n0011, -3/n0011, -3*mean1100/n1100, 3/n1100])
+    variance = (1-regions/regionsTotal)*regions/(regions-1)*w.dot(moments[1:, 1:]).dot(w)
+    z = statistics.NormalDist().inv_cdf(.5+CI_LEVEL/200.0)
+    halfWidth = z*np.sqrt(max(variance, 0.0))
+    return (p, e, p-halfWidth, p+halfWidth)
+
+def approxTrioBiallelic(vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, tolerance, maxSites=None, maxSeconds=None, regionSize=100000,
+    threads=1, cacheDir=None, seed=0, regionsFN=None):
+    '''
+    This function reads random autosome regions until the autosome diploid fraction is known to within the tolerance
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @param tolerance - stop once the confidence interval of diploid_frac is at most this wide
+    @param maxSites - optional budget of informative sites, stop once this many have been used
+    @param maxSeconds - optional time budget, stop once this many seconds have passed
+    @param regionSize - the size of each sampled region in base pairs
+    @param threads - the number of worker processes reading regions ahead of the estimate
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py), the first region of a contig caches all of it
+    @param seed - the random seed for the order of the regions
+    @param regionsFN - optional BED file, only the records inside its regions are sampled
+    @return - an ApproxRatio with the estimate, its interval, and how much of the VCF was used
+    '''
+    start = time.perf_counter()
+    contigs, samples = readHeader(vcfFN, cacheDir)
+    for sampleLabel in [proband, father, mother]:
+        if (sampleLabel not in samples):
+            raise Exception('Missing required column "'+sampleLabel+'" in VCF file: '+vcfFN)
+
+    #every autosome region in a random order, so any prefix is a random sample spread across the genome
+    plan = planRegions(vcfFN, contigs, regionSize, regionsFN)
+    regions = [region for chrom, chromRegions in plan if isAutosome(chrom) for region in chromRegions]
+    rng = np.random.default_rng(seed)
+    regions = [regions[i] for i in rng.permutation(len(regions))]
+
+    runStats = activeStats()
+    collect = runStats is not None
+    worker = functools.partial(approxRegion, vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, cacheDir)
+    jobs = ((shardIndex, worker, region, collect, collect and threads > 1 and runStats.profile) for shardIndex, region in enumerate(regions))
+    pool = None
+    if threads <= 1:
+        completed = (runShard(job) for job in jobs)
+    else:
+        #imap keeps the sampled order, so the stopping point does not depend on which worker finishes first
+        pool = multiprocessing.Pool(threads)
+        completed = pool.imap(runShard, jobs)
+
+    ret = ApproxRatio(MIN_DEPTH, MIN_QUALITY, tolerance, seed, np.nan, np.nan, np.nan, np.nan, 0, 0, 0, len(regions), 0.0, 'exhausted')
+    moments = np.zeros((5, 5))
+    informativeRegions = 0
+    empty = 0
+    try:
+        for shardIndex, result, stats in completed:
+            if stats is not None:
+                runStats.merge(stats)
+            ret.regions += 1
+            if result is None:
+                #a region of a contig without records is not part of the sampled population
+                empty += 1
+                continue
+            ret.sites0011 += result[0]
+            ret.sites1100 += result[2]
+            if result[0] > 0 and result[2] > 0:
+                informativeRegions += 1
+
+            with timed('ratios'):
+                x = np.array((1.0,)+result)
+                moments += np.outer(x, x)
+                ret.p, ret.e, ret.low, ret.high = approxInterval(moments, informativeRegions, len(regions)-empty)
+            if ret.high-ret.low <= tolerance:
+                ret.stopped = 'tolerance'
+                break
+            if maxSites is not None and ret.sites0011+ret.sites1100 >= maxSites:
+                ret.stopped = 'sites'
+                break
+            if maxSeconds is not None and time.perf_counter()-start >= maxSeconds:
+                ret.stopped = 'seconds'
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+    ret.seconds = time.perf_counter()-start
+    return ret
+
+@dataclasses.dataclass
+class ApproxRatio:
+    '''
+    The result of approxTrioBiallelic(...)
+    '''
+    MIN_DEPTH: int
+    MIN_QUALITY: int
+    tolerance: float
+    seed: int
+    #the diploid fraction and error term from the mean frequencies of the regions read, and the interval of the diploid fraction
+    p: float
+    e: float
+    low: float
+    high: float
+    #the informative sites used and the regions read out of every autosome region
+    sites0011: int
+    sites1100: int
+    regions: int
+    regionsTotal: int
+    seconds: float
+    #why the scan stopped: 'tolerance', 'sites', 'seconds', or 'exhausted' when every region was read
+    stopped: str
+
+    def row(self):
+        '''
+        @return - the values in the order of APPROX_COLUMNS, with '--' where the ratios could not be calculated
+        '''
+        values = [self.p, 1-self.p, self.e, self.low, self.high]
+        values = ['--' if np.isnan(x) else x for x in values]
+        return ['autosomes']+values+[self.sites0011, self.sites1100, self.regions, self.regionsTotal, self.seconds, self.stopped]
+
+    def write(self, fp=None):
+        '''
+        This function prints the estimate in the TSV format of TrioMixoploid.py, with only the autosomes row
+        @param fp - the file handle to print to (default: STDOUT)
+        '''
+        if fp is None:
+            fp = sys.stdout
+        printRatioHeader(self.MIN_DEPTH, self.MIN_QUALITY, fp, medians=False)
+        print('##  APPROXIMATE = random autosome regions read until the '+str(CI_LEVEL)+'% interval of diploid_frac is at most '+
+            str(self.tolerance)+' wide, seed '+str(self.seed), file=fp)
+        print('##diploid_frac_ci_low, diploid_frac_ci_high - the '+str(CI_LEVEL)+'% confidence interval for diploid_frac from the spread '+
+            'between the regions read', file=fp)
+        print('##sites_0011, sites_1100 - the informative sites used where the parents are 0/0 and 1/1, and 1/1 and 0/0', file=fp)
+        print('##regions, regions_total - the regions read and the number of autosome regions', file=fp)
+        print('##seconds - the time taken', file=fp)
+        print('##stopped - why reading stopped: tolerance, sites, seconds, or exhausted when every region was read', file=fp)
+        print('#'+'\t'.join(APPROX_COLUMNS), file=fp)
+        print('\t'.join([str(x) for x in self.row()]), file=fp)
@@ -0,0 +1,162 @@
+'''
+This module creates scatterplots of the B-allele frequencies, one per chromosome (see "mixoviz ballele -h").
+'''
+
+import dataclasses
+import numpy as np
+import os
+import sys
+
+from .Rendering import RenderPool, drawSites, loadPyplot
+from .RunStats import activeStats, countRejects, setContig, timed
+from .SiteCache import loadContig, readHeader
+from .VcfArrays import MISSING, MissingContig
+    
+def plotChromosomeCalls(vcfFN, sampleLabel, outDir, MIN_DEPTH, MIN_QUAL, cacheDir=None, density=False, imageFormat='png', dpi=None,
+    renderThreads=1):
+    '''
+    This is the primary plotting function
+    @param vcfFN - the VCF filename, must be a bgzipped vcf (.vcf.gz) with a tabix index (.vcf.gz.tbi)
+    @param sampleLabel - the column label in the VCF for the sample we care about
+    @param outDir - the directory to save the images to, all files will be saved as <chrom>.<imageFormat> within that directory
+    @param MIN_DEPTH - the minimum depth to include a variant in the plot
+    @param MIN_QUAL - the minimum quality to include a variant in the plot
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param density - if True, draw binned density images instead of scatter plots (see Rendering.drawSites(...))
+    @param imageFormat - the image format and file extension to save the figures as
+    @param dpi - the resolution of the saved images, None uses the matplotlib default
+    @param renderThreads - the number of worker processes used to draw the figures
+    @return - a SamplePlots with the figure for each contig and the contigs without any data
+    '''
+    
+    #do this first just to make sure it's all good
+    if not os.path.exists(outDir):
+        os.makedirs(outDir)
+    
+    contigs, samples = readHeader(vcfFN, cacheDir)
+    chromList = contigs.keys()
+    if (sampleLabel not in samples):
+        raise Exception('Missing required column "'+sampleLabel+'" in VCF file: '+vcfFN)
+    
+    ret = SamplePlots({}, [], {})
+    with RenderPool(renderThreads) as renderPool:
+        for chrom in chromList:
+            #this is done on a per-chromosome basis
+            setContig(chrom)
+            try:
+                sites = loadContig(vcfFN, chrom, [sampleLabel], cacheDir)
+            except MissingContig:
+                ret.missing.append(chrom)
+                continue
+            
+            with timed('filter'):
+                if activeStats() is not None:
+                    countRejects(len(sites.pos), sampleRejectMasks(sites, 0, MIN_DEPTH, MIN_QUAL))
+                xs, ys = sampleRatios(sites, 0, MIN_DEPTH, MIN_QUAL)
+            renderPool.submit(plotSampleContig, vcfFN, sampleLabel, chrom, contigs[chrom], xs, ys, outDir, MIN_DEPTH, MIN_QUAL, density,
+                imageFormat, dpi)
+            ret.figures[chrom] = outDir+'/'+chrom+'.'+imageFormat
+            ret.counts[chrom] = len(xs)
+    return ret
+
+@dataclasses.dataclass
+class SamplePlots:
+    '''
+    The result of plotChromosomeCalls(...)
+    '''
+    #contig name to the saved figure filename
+    figures: dict
+    #the contigs in the VCF header that had no data
+    missing: list
+    #contig name to the number of plotted variants
+    counts: dict
+
+    def write(self, fp=None):
+        '''
+        This function prints a warning for each contig without any data
+        @param fp - the file handle to print to (default: STDOUT)
+        '''
+        if fp is None:
+            fp = sys.stdout
+        for chrom in self.missing:
+            print('Warning: missing data for chromosome "'+chrom+'"', file=fp)
+
+def sampleRatios(sites, column, MIN_DEPTH, MIN_QUAL):
+    '''
+    This function filters one sample's calls on a contig and calculates the B-allele frequencies
+    @param sites - a ContigSites tuple
+    @param column - the sample column in sites to use
+    @param MIN_DEPTH - the minimum depth to include a variant in the plot
+    @param MIN_QUAL - the minimum quality to include a variant in the plot
+    @return - tuple (xs, ys)
+        xs - positions of the passing variants
+        ys - B-allele frequency of the passing variants, as a percentage
+    '''
+    #if either GQ or AD is absent or unparseable, we don't want the variant to be included
+    gq = sites.gq[:, column]
+    refAD = sites.ad[:, column, 0]
+    altAD = sites.ad[:, column, 1]
+    passing = ((gq != MISSING) &
+        (refAD != MISSING) &
+        (refAD+altAD >= MIN_DEPTH) &
+        (gq >= MIN_QUAL))
+    
+    xs = sites.pos[passing]
+    ys = 100.0*altAD[passing]/(altAD[passing]+refAD[passing])
+    return (xs, ys)
+
+def sampleRejectMasks(sites, column, MIN_DEPTH, MIN_QUAL):
+    '''
+    This function breaks the filter in sampleRatios(...) down by the reason a site fails, for RunStats.countRejects(...)
+    @param sites - a ContigSites tuple
+    @param column - the sample column in sites to use
+    @param MIN_DEPTH - the minimum depth to include a variant in the plot
+    @param MIN_QUAL - the minimum quality to include a variant in the plot
+    @return - list of (reason, mask) where mask is True for the sites failing that filter
+    '''
+    gq = sites.gq[:, column]
+    refAD = sites.ad[:, column, 0]
+    altAD = sites.ad[:, column, 1]
+    return [('missing_gq', gq == MISSING),
+        ('missing_ad', refAD == MISSING),
+        ('depth', refAD+altAD < MIN_DEPTH),
+        ('quality', gq < MIN_QUAL)]
+
+def mergeRatios(ratios):
+    '''
+    @param ratios - a list of sampleRatios(...) results for consecutive regions of a contig
+    @return - one sampleRatios(...) result covering all of the regions
+    '''
+    if len(ratios) == 1:
+        return ratios[0]
+    return (np.concatenate([xs for xs, ys in ratios]), np.concatenate([ys for xs, ys in ratios]))
+
+def plotSampleContig(vcfFN, sampleLabel, chrom, chromLen, xs, ys, outDir, MIN_DEPTH, MIN_QUAL, density=False, imageFormat='png', dpi=None):
+    '''
+    This function draws and saves the B-allele plot for one contig
+    @param vcfFN - the VCF filename, used for the title
+    @param sampleLabel - the column label in the VCF for the sample
+    @param chrom - the contig name
+    @param chromLen - the contig length from the VCF header
+    @param xs - positions from sampleRatios(...)
+    @param ys - B-allele frequencies from sampleRatios(...)
+    @param outDir - the directory to save the image to as <chrom>.<imageFormat>
+    @param MIN_DEPTH - the minimum depth that was required, only used for the axis label
+    @param MIN_QUAL - the minimum quality that was required, only used for the axis label
+    @param density - if True, draw binned density images instead of scatter plots (see Rendering.drawSites(...))
+    @param imageFormat - the image format and file extension to save the figure as
+    @param dpi - the resolution of the saved image, None uses the matplotlib default
+    '''
+    outFN = outDir+'/'+chrom+'.'+imageFormat
+    
+    plt = loadPyplot()
+    plt.figure()
+    drawSites(plt.gca(), xs, ys, chromLen, density)
+    plt.xlabel('Position on Chromosome '+chrom)
+    plt.ylabel('Call ratio (sum(AD) >= '+str(MIN_DEPTH)+' && qual >= '+str(MIN_QUAL)+')')
+    plt.title(vcfFN.split('/')[-1]+' '+sampleLabel+'['+chrom+']')
+    plt.xlim([0, chromLen])
+    plt.ylim([0, 100])
+    plt.grid()
+    plt.savefig(outFN, dpi=dpi)
+    plt.close()
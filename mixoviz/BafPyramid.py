@@ -0,0 +1,455 @@
+'''
+A multi-resolution pyramid of binned B-allele frequencies for browsing a trio at any zoom (see "mixoviz trio-pyramid -h" and "mixoviz
+pyramid-view -h").  The export scans the VCF once and counts the sites of each panel in (position bin, B-allele frequency bin) cells.
+Level 0 uses the finest position bins and each level above doubles the bin size, up to the level where a whole contig fits in one tile.
+Each level is cut into tiles of TILE_BINS position bins that are stored as separate members of a .npz file, each holding only its
+non-empty cells, and empty tiles are not stored at all.  A view only loads the few tiles under it from the level whose bins are closest
+to the resolution of the figure, so drawing it does not depend on the size of the region or the number of sites.
+
+The panels are the nine parental genotype classes of the TrioBAllele.py figure, top left to bottom right, followed by the proband,
+father, and mother on their own as in the BAllele.py figures.
+'''
+
+import dataclasses
+import functools
+import json
+import numpy as np
+import os
+import sys
+import zipfile
+
+from .Options import DEFAULT_PYRAMID_BAF_BINS, DEFAULT_PYRAMID_BIN_SIZE
+from .Regions import mapRegions, planRegions
+from .Rendering import drawCounts, loadPyplot
+from .SiteCache import readHeader
+from .TrioBAllele import deriveRatio, expectedLines, isAutosome
+from .TrioReport import mergeScans, scanRegion
+from .VcfArrays import GT_LABELS
+
+#the file layout version, written to the metadata and checked when a pyramid is opened
+PYRAMID_VERSION = 1
+
+#the position bins in one tile, every tile of every level covers this many bins
+TILE_BINS = 256
+
+#the most position bins drawn across one view, a view uses the finest level with no more bins than this
+MAX_VIEW_BINS = 1024
+
+#the number of trio panels, they come before the single-sample panels
+TRIO_PANELS = 9
+
+def exportPyramid(vcfFN, proband, father, mother, outFN, MIN_DEPTH, MIN_QUALITY, SAMPLE_DEPTH, SAMPLE_QUAL, threads=1, cacheDir=None,
+    binSize=DEFAULT_PYRAMID_BIN_SIZE, bafBins=DEFAULT_PYRAMID_BAF_BINS, shardSize=None, regionsFN=None):
+    '''
+    This function scans the VCF once and writes the pyramid of every contig with data
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param outFN - the .npz file to write the pyramid to
+    @param MIN_DEPTH - the minimum depth required by all trio calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all trio calls to consider it
+    @param SAMPLE_DEPTH - the minimum depth to include a variant in the single-sample panels
+    @param SAMPLE_QUAL - the minimum quality to include a variant in the single-sample panels
+    @param threads - the number of worker processes used to scan contigs in parallel
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param binSize - the position bin size of the finest level in base pairs, must be a power of two
+    @param bafBins - the number of B-allele frequency bins between 0 and 100%
+    @param shardSize - the largest region scanned by one worker in base pairs, None scans whole contigs (see Regions.py)
+    @param regionsFN - optional BED file, only the records inside its regions are used
+    @return - a PyramidExport with the contigs without any data and the size of the pyramid
+    '''
+    if binSize < 1 or (binSize & (binSize-1)) != 0:
+        raise Exception('The pyramid bin size must be a power of two: '+str(binSize))
+    if bafBins < 1:
+        raise Exception('The pyramid needs at least one B-allele frequency bin: '+str(bafBins))
+    binShift = binSize.bit_length()-1
+
+    #get the chromosomes we plan to go through
+    sampleLabels = [proband, father, mother]
+    contigs, samples = readHeader(vcfFN, cacheDir)
+    plan = planRegions(vcfFN, contigs, shardSize, regionsFN)
+    chromList = [chrom for chrom, regions in plan]
+    for sampleLabel in sampleLabels:
+        if (sampleLabel not in samples):
+            raise Exception('Missing required column "'+sampleLabel+'" in VCF file: '+vcfFN)
+
+    ret = PyramidExport(outFN, [], 0, 0, None)
+    writer = PyramidWriter(outFN, binShift, bafBins)
+    try:
+        totals = [0.0, 0.0, 0.0, 0.0]
+        worker = functools.partial(scanRegion, vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, SAMPLE_DEPTH, SAMPLE_QUAL, cacheDir)
+        for chrom, result in zip(chromList, mapRegions(worker, plan, threads, mergeScans)):
+            if result is None:
+                ret.missing.append(chrom)
+                continue
+            summary, split, ratios = result
+
+            #the same autosome totals as TrioBAllele.renderTrioPlots(...), so the red lines match the figures
+            if isAutosome(chrom):
+                for i, k in enumerate([('0/0', '1/1'), ('1/1', '0/0')]):
+                    if not (k in split):
+                        break
+                    totals[2*i] += np.sum(split[k][1])
+                    totals[2*i+1] += np.sum(split[k][2])
+
+            #positions and frequencies (0 to 1) of each panel, top left to bottom right then proband, father, mother
+            panelSites = []
+            for pType in range(0, 3):
+                for mType in range(0, 3):
+                    pos, refDepths, altDepths = split.get((GT_LABELS[pType], GT_LABELS[mType]), ([], [], []))
+                    panelSites.append((np.asarray(pos), 1.0*np.asarray(altDepths)/(np.asarray(refDepths)+np.asarray(altDepths))))
+            for xs, ys in ratios:
+                panelSites.append((xs, ys/100.0))
+
+            chromLen = max([contigs[chrom] or 0]+[int(pos[-1]) for pos, freqs in panelSites if len(pos) > 0])
+            ret.tiles += writer.addContig(chrom, max(chromLen, 1), panelSites)
+            ret.contigs += 1
+
+        ret.derivedRatio = deriveRatio(*totals)
+        writer.finish({
+            'version': PYRAMID_VERSION,
+            'vcf': vcfFN.split('/')[-1],
+            'samples': sampleLabels,
+            'panels': [pLabel+' '+mLabel for pLabel in GT_LABELS for mLabel in GT_LABELS]+sampleLabels,
+            'thresholds': [MIN_DEPTH, MIN_QUALITY, SAMPLE_DEPTH, SAMPLE_QUAL],
+            'derivedRatio': ret.derivedRatio
+        })
+    except:
+        writer.abort()
+        raise
+    return ret
+
+@dataclasses.dataclass
+class PyramidExport:
+    '''
+    The result of exportPyramid(...)
+    '''
+    outFN: str
+    #the contigs with no data
+    missing: list
+    #the number of contigs and stored tiles in the pyramid
+    contigs: int
+    tiles: int
+    #the diploid fraction derived from all autosomes, used for the red lines in the trio views
+    derivedRatio: float
+
+    def write(self, fp=None):
+        '''
+        This function prints the missing contigs and the size of the pyramid
+        @param fp - the file handle to print to (default: STDOUT)
+        '''
+        if fp is None:
+            fp = sys.stdout
+        for chrom in self.missing:
+            print('Warning: missing data for chromosome "'+chrom+'"', file=fp)
+        print('Derived ratio=', self.derivedRatio, file=fp)
+        print('Wrote '+str(self.tiles)+' tiles for '+str(self.contigs)+' contigs to '+self.outFN, file=fp)
+
+def pyramidLevels(chromLen, binShift):
+    '''
+    @param chromLen - the contig length
+    @param binShift - log2 of the finest position bin size
+    @return - the number of levels, the top level holds the whole contig in a single tile
+    '''
+    levels = 1
+    while ((chromLen-1) >> (binShift+levels-1)) >= TILE_BINS:
+        levels += 1
+    return levels
+
+def tileName(contigIndex, level, tile):
+    '''
+    @return - the .npz member name of one tile, without the .npy extension
+    '''
+    return 'c'+str(contigIndex)+'/l'+str(level)+'/t'+str(tile)
+
+class PyramidWriter(object):
+    '''
+    Writes the tiles of each contig to a temporary .npz as they are counted, then adds the metadata and moves it into place
+    '''
+    def __init__(self, outFN, binShift, bafBins):
+        '''
+        @param outFN - the .npz file to write
+        @param binShift - log2 of the finest position bin size
+        @param bafBins - the number of B-allele frequency bins
+        '''
+        self.outFN = outFN
+        self.tmpFN = outFN+'.'+str(os.getpid())+'.tmp'
+        self.binShift = binShift
+        self.bafBins = bafBins
+        self.contigs = []
+        self.panels = None
+        self.zf = zipfile.ZipFile(self.tmpFN, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def writeArray(self, name, values):
+        '''
+        @param name - the member name, without the .npy extension
+        @param values - the array to store
+        '''
+        with self.zf.open(name+'.npy', 'w', force_zip64=True) as fp:
+            np.lib.format.write_array(fp, np.ascontiguousarray(values), allow_pickle=False)
+
+    def addContig(self, chrom, chromLen, panelSites):
+        '''
+        This function counts one contig at every level and writes its non-empty tiles
+        @param chrom - the contig name
+        @param chromLen - the contig length
+        @param panelSites - list of (positions, B-allele frequencies from 0 to 1) for each panel
+        @return - the number of tiles written
+        '''
+        contigIndex = len(self.contigs)
+        levels = pyramidLevels(chromLen, self.binShift)
+        self.contigs.append([chrom, int(chromLen), levels])
+        self.panels = len(panelSites)
+
+        #each site becomes a position bin at level 0 and a frequency bin, sites without depth have no frequency and are left out
+        sites = []
+        for panel, (pos, freqs) in enumerate(panelSites):
+            passing = np.isfinite(freqs)
+            posBins = (np.asarray(pos, dtype='int64')[passing]-1) >> self.binShift
+            bafBins = np.clip((freqs[passing]*self.bafBins).astype('int64'), 0, self.bafBins-1)
+            sites.append((panel, posBins, bafBins))
+
+        #a cell key orders the counts by tile, then panel, then position bin in the tile, then frequency bin
+        cellsPerTile = self.panels*TILE_BINS*self.bafBins
+        written = 0
+        for level in range(0, levels):
+            keys = []
+            for panel, posBins, bafBins in sites:
+                levelBins = posBins >> level
+                keys.append(((levelBins//TILE_BINS*self.panels+panel)*TILE_BINS+levelBins % TILE_BINS)*self.bafBins+bafBins)
+            keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+            tiles = keys//cellsPerTile
+            bounds = np.flatnonzero(np.diff(tiles))+1
+            for first, last in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(keys)]])):
+                if first == last:
+                    continue
+                #a tile is stored sparse as rows of cell index (into the (panels, TILE_BINS, bafBins) layout) and count
+                tile = np.array([keys[first:last] % cellsPerTile, counts[first:last]], dtype='uint32')
+                self.writeArray(tileName(contigIndex, level, tiles[first]), tile)
+                written += 1
+        return written
+
+    def finish(self, meta):
+        '''
+        This function writes the metadata and moves the finished pyramid into place
+        @param meta - dictionary of the export settings, the bin sizes and contigs are added to it
+        '''
+        meta = dict(meta, binShift=self.binShift, bafBins=self.bafBins, tileBins=TILE_BINS, contigs=self.contigs)
+        self.writeArray('meta', np.frombuffer(json.dumps(meta).encode('utf-8'), dtype='uint8'))
+        self.zf.close()
+        os.replace(self.tmpFN, self.outFN)
+
+    def abort(self):
+        '''
+        This function removes the partial pyramid after an error
+        '''
+        self.zf.close()
+        if os.path.exists(self.tmpFN):
+            os.remove(self.tmpFN)
+
+class BafPyramid(object):
+    '''
+    A pyramid written by exportPyramid(...), only the metadata is read when it is opened and tiles are read as views need them
+    '''
+    def __init__(self, pyramidFN):
+        '''
+        @param pyramidFN - the .npz file written by exportPyramid(...)
+        '''
+        self.npz = np.load(pyramidFN, allow_pickle=False)
+        self.members = set(self.npz.files)
+        if 'meta' not in self.members:
+            raise Exception('Not a B-allele frequency pyramid: '+pyramidFN)
+        self.meta = json.loads(self.npz['meta'].tobytes().decode('utf-8'))
+        if self.meta['version'] != PYRAMID_VERSION:
+            raise Exception('Unsupported pyramid version '+str(self.meta['version'])+' in '+pyramidFN)
+        self.binShift = self.meta['binShift']
+        self.bafBins = self.meta['bafBins']
+        self.panels = self.meta['panels']
+        self.contigs = {}
+        for contigIndex, (chrom, chromLen, levels) in enumerate(self.meta['contigs']):
+            self.contigs[chrom] = (contigIndex, chromLen, levels)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        self.npz.close()
+
+    def contigLength(self, chrom):
+        '''
+        @param chrom - the contig name
+        @return - the contig length
+        '''
+        if chrom not in self.contigs:
+            raise Exception('No contig "'+chrom+'" in the pyramid')
+        return self.contigs[chrom][1]
+
+    def viewLevel(self, chrom, start, end):
+        '''
+        @param chrom - the contig name
+        @param start - the 0-based start of the view
+        @param end - the end of the view
+        @return - the finest level with at most MAX_VIEW_BINS position bins across the view
+        '''
+        contigIndex, chromLen, levels = self.contigs[chrom]
+        level = 0
+        while level < levels-1 and ((end-start-1) >> (self.binShift+level)) >= MAX_VIEW_BINS:
+            level += 1
+        return level
+
+    def readTile(self, contigIndex, level, tile):
+        '''
+        @return - the counts of one tile with shape (panels, TILE_BINS, B-allele frequency bins), None if the tile is empty
+        '''
+        name = tileName(contigIndex, level, tile)
+        if name not in self.members:
+            return None
+        cells, counts = self.npz[name]
+        ret = np.zeros(len(self.panels)*TILE_BINS*self.bafBins, dtype='uint32')
+        ret[cells] = counts
+        return ret.reshape(len(self.panels), TILE_BINS, self.bafBins)
+
+    def counts(self, chrom, start=0, end=None, level=None):
+        '''
+        This function reads the counts covering a region, only the tiles overlapping it are loaded
+        @param chrom - the contig name
+        @param start - the 0-based start of the region, sites with start < POS <= end are counted
+        @param end - the end of the region (default: the contig length)
+        @param level - the level to read (default: viewLevel(...))
+        @return - tuple (counts, binStart, binSize)
+            counts - array of site counts with shape (panels, position bins, B-allele frequency bins)
+            binStart - the 0-based position of the first bin, the region is rounded out to whole bins
+            binSize - the size of each position bin in base pairs
+        '''
+        contigIndex, chromLen, levels = self.contigs[chrom]
+        if end is None:
+            end = chromLen
+        start = max(start, 0)
+        end = max(min(end, chromLen), start+1)
+        if level is None:
+            level = self.viewLevel(chrom, start, end)
+        shift = self.binShift+level
+        firstBin = start >> shift
+        lastBin = (end-1) >> shift
+
+        ret = np.zeros((len(self.panels), lastBin-firstBin+1, self.bafBins), dtype='uint32')
+        for tile in range(firstBin//TILE_BINS, lastBin//TILE_BINS+1):
+            tileCounts = self.readTile(contigIndex, level, tile)
+            if tileCounts is None:
+                continue
+            lo = max(firstBin, tile*TILE_BINS)
+            hi = min(lastBin+1, (tile+1)*TILE_BINS)
+            ret[:, lo-firstBin:hi-firstBin] = tileCounts[:, lo-tile*TILE_BINS:hi-tile*TILE_BINS]
+        return (ret, firstBin << shift, 1 << shift)
+
+def parseRegion(region):
+    '''
+    @param region - "chrom" or "chrom:start-end" with a 1-based inclusive start and end, commas are allowed in the numbers
+    @return - tuple (chrom, start, end) with a 0-based start, start and end are None for a whole contig
+    '''
+    if ':' not in region:
+        return (region, None, None)
+    chrom, span = region.rsplit(':', 1)
+    try:
+        start, end = [int(x.replace(',', '')) for x in span.split('-')]
+    except ValueError:
+        raise Exception('Region must be "chrom" or "chrom:start-end": '+region)
+    if start < 1 or end < start:
+        raise Exception('Region must be "chrom" or "chrom:start-end": '+region)
+    return (chrom, start-1, end)
+
+def renderRegion(pyramidFN, outFN, region, samples=False, dpi=None):
+    '''
+    This function draws one region from the pyramid, as the 3x3 trio figure or as the three single-sample panels
+    @param pyramidFN - the .npz file written by exportPyramid(...)
+    @param outFN - the image filename, the format comes from the extension
+    @param region - "chrom" or "chrom:start-end", see parseRegion(...)
+    @param samples - if True, draw the proband, father, and mother instead of the parental genotype classes
+    @param dpi - the resolution of the saved image, None uses the matplotlib default
+    '''
+    chrom, start, end = parseRegion(region)
+    with BafPyramid(pyramidFN) as pyramid:
+        chromLen = pyramid.contigLength(chrom)
+        if start is None:
+            start, end = (0, chromLen)
+        counts, binStart, binSize = pyramid.counts(chrom, start, end)
+        meta = pyramid.meta
+        panels = pyramid.panels
+
+    plt = loadPyplot()
+    if samples:
+        f, axarr = plt.subplots(3, 1, sharex=True, sharey=True)
+        f.set_figheight(12)
+        f.set_figwidth(12)
+        axes = [(axarr[i], TRIO_PANELS+i) for i in range(0, 3)]
+        plotHlines = None
+    else:
+        f, axarr = plt.subplots(3, 3, sharex=True, sharey=True)
+        f.set_figheight(12)
+        f.set_figwidth(12)
+        axes = [(axarr[i // 3, i % 3], i) for i in range(0, TRIO_PANELS)]
+        plotHlines = expectedLines(meta['derivedRatio']) if isAutosome(chrom) else None
+    binEnd = binStart+counts.shape[1]*binSize
+    plt.suptitle(meta['vcf']+' '+meta['samples'][0]+'['+chrom+':'+str(start+1)+'-'+str(end)+'] '+str(binSize)+' bp bins')
+    plt.xlim([start, end])
+    plt.ylim([0, 100])
+
+    for ax, panel in axes:
+        drawCounts(ax, counts[panel], binStart, binEnd)
+        ax.set_title(panels[panel])
+        ax.grid()
+        if plotHlines is not None:
+            for hlineValue in plotHlines[panel]:
+                ax.axhline(100.0*hlineValue, color='red', linestyle='dashed', linewidth=2)
+
+    # hide tick and tick label of the big axes
+    f.add_subplot(111, frameon=False)
+    plt.tick_params(labelcolor='none', top='off', bottom='off', left='off', right='off')
+    plt.xlabel("Position")
+    plt.ylabel("B-allele frequency")
+    plt.savefig(outFN, dpi=dpi)
+    plt.close(f)
+
+def renderKaryogram(pyramidFN, outFN, panel=None, dpi=None):
+    '''
+    This function draws one panel for every contig in the pyramid, one row per contig on a shared position axis, from the top level of
+    each contig so only one tile per contig is read
+    @param pyramidFN - the .npz file written by exportPyramid(...)
+    @param outFN - the image filename, the format comes from the extension
+    @param panel - the panel name to draw, a sample label or a parental genotype class such as "0/0 1/1" (default: the proband)
+    @param dpi - the resolution of the saved image, None uses the matplotlib default
+    '''
+    with BafPyramid(pyramidFN) as pyramid:
+        meta = pyramid.meta
+        if panel is None:
+            panel = meta['samples'][0]
+        if panel not in pyramid.panels:
+            raise Exception('Unknown panel "'+panel+'", expected one of: '+', '.join(pyramid.panels))
+        panelIndex = pyramid.panels.index(panel)
+        rows = []
+        for chrom, chromLen, levels in meta['contigs']:
+            counts, binStart, binSize = pyramid.counts(chrom, 0, chromLen, levels-1)
+            rows.append((chrom, chromLen, counts[panelIndex], binStart, binStart+counts.shape[1]*binSize))
+
+    plt = loadPyplot()
+    f, axarr = plt.subplots(max(len(rows), 1), 1, sharex=True, sharey=True, squeeze=False)
+    f.set_figheight(1+.6*len(rows))
+    f.set_figwidth(12)
+    plt.suptitle(meta['vcf']+' '+panel)
+    plt.xlim([0, max([chromLen for chrom, chromLen, counts, x0, x1 in rows]+[1])])
+    plt.ylim([0, 100])
+
+    for ax, (chrom, chromLen, counts, x0, x1) in zip(axarr[:, 0], rows):
+        drawCounts(ax, counts, x0, x1)
+        ax.axvline(chromLen, color='black', linewidth=1)
+        ax.set_ylabel(chrom, rotation=0, horizontalalignment='right', verticalalignment='center')
+        ax.set_yticks([])
+        ax.grid()
+
+    plt.xlabel("Position")
+    plt.savefig(outFN, dpi=dpi)
+    plt.close(f)
@@ -0,0 +1,185 @@
+'''
+Summaries of the proband B-allele frequencies used by the mixoploidy calculation.  ExactBaf keeps every frequency so the mean and median
+are exact.  BafHistogram keeps a fixed number of bins instead, so its memory does not depend on the number of sites, and it reports how
+far its median can be from the exact one.  Both can be merged, which is how the per-contig summaries become the autosome total, and both
+can be bootstrapped with bootstrapMeans(...).
+'''
+
+import numpy as np
+
+class ExactBaf(object):
+    '''
+    Every B-allele frequency, for exact statistics
+    '''
+    def __init__(self):
+        self.freqs = []
+
+    def add(self, refDepths, altDepths):
+        '''
+        @param refDepths - the reference allele depths for each site
+        @param altDepths - the alternate allele depths for each site
+        '''
+        self.freqs.append(1.0*altDepths/(refDepths+altDepths))
+
+    def merge(self, other):
+        '''
+        @param other - another ExactBaf to fold into this one
+        '''
+        self.freqs += other.freqs
+
+    def count(self):
+        '''
+        @return - the number of sites added
+        '''
+        return sum(len(freqs) for freqs in self.freqs)
+
+    def values(self):
+        '''
+        @return - every frequency as a single array
+        '''
+        return np.concatenate(self.freqs) if self.freqs else np.array([])
+
+    def mean(self):
+        '''
+        @return - the mean frequency
+        '''
+        return np.mean(self.values())
+
+    def median(self):
+        '''
+        @return - tuple (median, bound) where bound is always 0
+        '''
+        return (np.median(self.values()), 0.0)
+
+    def distinct(self):
+        '''
+        @return - tuple (values, counts) of each distinct frequency and the number of sites with it
+        '''
+        return np.unique(self.values(), return_counts=True)
+
+class BafHistogram(object):
+    '''
+    A fixed-resolution histogram of B-allele frequencies over [0, 1].  Alongside the count, each bin keeps the sum, minimum, and maximum of
+    its frequencies, so the median estimate is the mean of the bin holding the middle site and the error bound is the spread of that bin.
+    Frequencies come from small integer ratios, so most bins hold a single distinct value and the bound is usually 0.
+    '''
+    def __init__(self, bins):
+        '''
+        @param bins - the number of equal-width bins between 0 and 1
+        '''
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype='int64')
+        self.sums = np.zeros(bins, dtype='float64')
+        self.mins = np.full(bins, np.inf)
+        self.maxs = np.full(bins, -np.inf)
+        self.total = 0.0
+        #sites without reads (possible with a minimum depth of 0) have no frequency, like ExactBaf they make the mean and median nan
+        self.nonFinite = 0
+
+    def add(self, refDepths, altDepths):
+        '''
+        @param refDepths - the reference allele depths for each site
+        @param altDepths - the alternate allele depths for each site
+        '''
+        with np.errstate(divide='ignore', invalid='ignore'):
+            freqs = 1.0*altDepths/(refDepths+altDepths)
+        finite = np.isfinite(freqs)
+        if not finite.all():
+            self.nonFinite += int(np.sum(~finite))
+            freqs = freqs[finite]
+        binIndices = np.minimum((freqs*self.bins).astype('int64'), self.bins-1)
+        self.counts += np.bincount(binIndices, minlength=self.bins)
+        self.sums += np.bincount(binIndices, weights=freqs, minlength=self.bins)
+        np.minimum.at(self.mins, binIndices, freqs)
+        np.maximum.at(self.maxs, binIndices, freqs)
+        self.total += np.sum(freqs)
+
+    def merge(self, other):
+        '''
+        @param other - another BafHistogram with the same number of bins to fold into this one
+        '''
+        if other.bins != self.bins:
+            raise Exception('Cannot merge BAF histograms with '+str(self.bins)+' and '+str(other.bins)+' bins')
+        self.counts += other.counts
+        self.sums += other.sums
+        np.minimum(self.mins, other.mins, out=self.mins)
+        np.maximum(self.maxs, other.maxs, out=self.maxs)
+        self.total += other.total
+        self.nonFinite += other.nonFinite
+
+    def count(self):
+        '''
+        @return - the number of sites added
+        '''
+        return int(np.sum(self.counts))+self.nonFinite
+
+    def mean(self):
+        '''
+        @return - the mean frequency, this is exact up to floating point rounding
+        '''
+        n = self.count()
+        return self.total/n if n > 0 and self.nonFinite == 0 else np.nan
+
+    def rankValue(self, rank, cumCounts):
+        '''
+        @param rank - the 0-based rank of a site in sorted order
+        @param cumCounts - the cumulative sum of self.counts
+        @return - tuple (estimate, bound) for the frequency at that rank
+        '''
+        b = np.searchsorted(cumCounts, rank, side='right')
+        estimate = self.sums[b]/self.counts[b]
+        return (estimate, max(estimate-self.mins[b], self.maxs[b]-estimate))
+
+    def median(self):
+        '''
+        @return - tuple (median, bound) where the exact median is within bound of the estimate
+        '''
+        n = self.count()
+        if n == 0 or self.nonFinite > 0:
+            return (np.nan, 0.0)
+        cumCounts = np.cumsum(self.counts)
+        lowValue, lowBound = self.rankValue((n-1)//2, cumCounts)
+        highValue, highBound = self.rankValue(n//2, cumCounts)
+        return ((lowValue+highValue)/2.0, (lowBound+highBound)/2.0)
+
+    def distinct(self):
+        '''
+        @return - tuple (values, counts) with the mean frequency and number of sites for each non-empty bin
+        '''
+        nonEmpty = self.counts > 0
+        values = self.sums[nonEmpty]/self.counts[nonEmpty]
+        counts = self.counts[nonEmpty]
+        if self.nonFinite > 0:
+            values = np.append(values, np.nan)
+            counts = np.append(counts, self.nonFinite)
+        return (values, counts)
+
+#the most multinomial draws held in memory at once by bootstrapMeans(...)
+BOOTSTRAP_BATCH_SIZE = 2**22
+
+def bootstrapMeans(baf, replicates, rng):
+    '''
+    This function resamples the sites with replacement and returns the mean frequency of each resample.  Sites with the same frequency
+    are interchangeable, so each resample is a single multinomial draw over the distinct values instead of one draw per site.
+    @param baf - an ExactBaf or BafHistogram with at least one site
+    @param replicates - the number of resamples
+    @param rng - the numpy.random.Generator to draw from
+    @return - an array with the mean frequency of each resample
+    '''
+    values, counts = baf.distinct()
+    n = int(np.sum(counts))
+    batchSize = max(1, BOOTSTRAP_BATCH_SIZE//len(values))
+    means = []
+    for start in range(0, replicates, batchSize):
+        draws = rng.multinomial(n, counts/n, size=min(batchSize, replicates-start))
+        means.append(draws.dot(values)/n)
+    return np.concatenate(means)
+
+def newBafSummary(bins=None):
+    '''
+    @param bins - the number of histogram bins, None keeps every frequency
+    @return - an empty ExactBaf or BafHistogram
+    '''
+    if bins is None:
+        return ExactBaf()
+    return BafHistogram(bins)
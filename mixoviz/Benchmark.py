@@ -0,0 +1,153 @@
+'''
+This module times the mixoviz commands on synthetic trio VCFs from SimulateTrio.py at several sizes.  Each stage runs as its own process,
+so the wall-clock time and peak memory are measured the same way a user would see them.  The results are written as JSON so runs
+from different versions can be compared (see "mixoviz benchmark -h").
+'''
+
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from .Options import BENCHMARK_STAGES
+from .SimulateTrio import DEFAULT_PARAMS, checkSimulation
+
+#the stages that can be timed, simulate always runs since it makes the input for the others
+STAGES = ['simulate']+BENCHMARK_STAGES
+
+#the stages that report the diploid fraction, and the table they write it to relative to their output directory (None is stdout)
+ACCURACY_TABLES = {'TrioMixoploid': None, 'TrioReport': 'mixoploid.tsv'}
+
+#the trio column labels written by SimulateTrio.py
+PROBAND, FATHER, MOTHER = 'PROBAND', 'FATHER', 'MOTHER'
+
+#the mixoviz subcommand that runs each stage
+STAGE_COMMANDS = {'simulate': 'simulate', 'BAllele': 'ballele', 'TrioBAllele': 'trio-ballele', 'TrioMixoploid': 'trio-mixoploid',
+    'TrioReport': 'trio-report'}
+
+#the directory containing the mixoviz package, added to PYTHONPATH so the stages run this copy of the code
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def stageCommand(stage, vcfFN, outDir, sites, args):
+    '''
+    @param stage - one of STAGES
+    @param vcfFN - the simulated VCF
+    @param outDir - the directory for this stage's output
+    @param sites - the number of records to simulate
+    @param args - the parsed command line arguments
+    @return - the command line for the stage
+    '''
+    command = [sys.executable, '-m', 'mixoviz', STAGE_COMMANDS[stage]]
+    if stage == 'simulate':
+        return command+['-n', str(sites), '-p', str(args.diploidFrac), '--seed', str(args.seed), vcfFN]
+
+    command += ['--io-threads', str(args.ioThreads)]
+    if stage == 'BAllele':
+        return command+[vcfFN, PROBAND, outDir, '-r', str(args.renderThreads)]
+    elif stage == 'TrioMixoploid':
+        return command+[vcfFN, PROBAND, FATHER, MOTHER, '-t', str(args.threads)]
+    else:
+        return command+[vcfFN, PROBAND, FATHER, MOTHER, outDir, '-t', str(args.threads), '-r', str(args.renderThreads)]
+
+def runStage(command, stdoutFN):
+    '''
+    This function runs one stage and measures it
+    @param command - the command line to run
+    @param stdoutFN - the file to save the stage's standard output to
+    @return - tuple (seconds, peakRSS)
+        seconds - the wall-clock time
+        peakRSS - the largest resident set size in KB of the stage or any worker process it waited on
+    '''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([PACKAGE_ROOT]+([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    with open(stdoutFN, 'w') as fp:
+        start = time.perf_counter()
+        proc = subprocess.Popen(command, stdout=fp, env=env)
+        pid, status, usage = os.wait4(proc.pid, 0)
+        seconds = time.perf_counter()-start
+    #the process is already reaped, so the Popen object must not wait on it again
+    proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    if proc.returncode != 0:
+        raise Exception('Stage failed with exit code '+str(proc.returncode)+': '+' '.join(command))
+    return (seconds, usage.ru_maxrss)
+
+def readDiploidFrac(tableFN):
+    '''
+    @param tableFN - a TrioMixoploid.py table
+    @return - tuple (mean, median) of the diploid fraction on the autosomes row, None for values that are missing
+    '''
+    with open(tableFN, 'r') as fp:
+        for l in fp:
+            fields = l.rstrip('\n').split('\t')
+            if fields[0] == 'autosomes':
+                return tuple(float(value) if value != '--' else None for value in (fields[1], fields[4]))
+    return (None, None)
+
+def gitVersion():
+    '''
+    @return - the commit of the scripts, or None if it is not a git checkout
+    '''
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=PACKAGE_ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except:
+        return None
+
+def runBenchmark(workDir, scales, stages, args):
+    '''
+    This function simulates a VCF at each scale and times each stage on it
+    @param workDir - the directory for the simulated VCFs and the stage outputs
+    @param scales - the numbers of records to simulate
+    @param stages - the stages to time after the simulation
+    @param args - the parsed command line arguments
+    @return - a JSON-serializable dictionary with the environment and one entry per (scale, stage, repeat)
+    '''
+    results = []
+    for sites in scales:
+        vcfFN = os.path.join(workDir, 'sim_'+str(sites)+'.vcf.gz')
+        for stage in ['simulate']+stages:
+            for repeat in range(0, args.repeats if stage != 'simulate' else 1):
+                outDir = os.path.join(workDir, stage+'_'+str(sites))
+                if not os.path.exists(outDir):
+                    os.makedirs(outDir)
+                stdoutFN = os.path.join(outDir, 'stdout.txt')
+                seconds, peakRSS = runStage(stageCommand(stage, vcfFN, outDir, sites, args), stdoutFN)
+
+                result = {
+                    'sites' : sites,
+                    'stage' : stage,
+                    'repeat' : repeat,
+                    'seconds' : seconds,
+                    'sites_per_sec' : sites/seconds,
+                    'peak_rss_kb' : peakRSS
+                }
+                if stage == 'simulate':
+                    #the benchmark only means something if the proband really is the simulated mixture at every kind of site
+                    classes = checkSimulation(vcfFN, DEFAULT_PARAMS._replace(diploidFrac=args.diploidFrac), [PROBAND, FATHER, MOTHER])
+                    result['baf_classes'] = [{'father' : fatherGT, 'mother' : motherGT, 'sites' : n, 'mean_baf' : meanBaf,
+                        'expected_baf' : expected} for fatherGT, motherGT, n, meanBaf, expected, passed in classes]
+                    failed = [fatherGT+' x '+motherGT for fatherGT, motherGT, n, meanBaf, expected, passed in classes if not passed]
+                    if len(failed) > 0:
+                        raise Exception('The proband B-allele frequencies in '+vcfFN+' do not match the simulated mixture for parents: '+
+                            ', '.join(failed))
+                if stage in ACCURACY_TABLES:
+                    table = ACCURACY_TABLES[stage]
+                    meanFrac, medianFrac = readDiploidFrac(stdoutFN if table is None else os.path.join(outDir, table))
+                    result['diploid_frac'] = meanFrac
+                    result['diploid_frac_median'] = medianFrac
+                    result['diploid_frac_error'] = meanFrac-args.diploidFrac if meanFrac is not None else None
+                results.append(result)
+                print('\t'.join([stage, str(sites), str(repeat), '%.3f' % seconds, str(peakRSS)]), file=sys.stderr)
+
+    return {
+        'version' : gitVersion(),
+        'python' : platform.python_version(),
+        'platform' : platform.platform(),
+        'cpus' : os.cpu_count(),
+        'threads' : args.threads,
+        'render_threads' : args.renderThreads,
+        'io_threads' : args.ioThreads,
+        'diploid_frac' : args.diploidFrac,
+        'seed' : args.seed,
+        'results' : results
+    }
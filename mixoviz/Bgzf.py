@@ -0,0 +1,398 @@
+'''
+Minimal readers for BGZF compressed files and their tabix (.tbi) indices.  These only cover what the scripts need: finding where each
+contig lives in a bgzipped VCF and walking the uncompressed bytes between two virtual offsets.  BgzfWriter and TabixBuilder write the
+same formats, so test and benchmark VCFs can be made without bgzip and tabix.
+'''
+
+import collections
+import concurrent.futures
+import gzip
+import os
+import struct
+import time
+import zlib
+
+from .Lru import MAX_OPEN_FILES, LruCache, fileStamp
+from .Options import DEFAULT_IO_QUEUE
+from .RunStats import activeStats
+
+#the bin tabix uses to store per-reference metadata instead of chunks
+PSEUDO_BIN = 37450
+
+#the most uncompressed bytes bgzip puts in one block
+BLOCK_DATA_SIZE = 0xff00
+
+#the empty block bgzip writes at the end of every file
+EOF_BLOCK = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+#environment variables holding the iterRange(...) inflate settings, so worker processes inherit them (see setIoThreads(...))
+IO_THREADS_ENV = 'MIXOVIZ_IO_THREADS'
+IO_QUEUE_ENV = 'MIXOVIZ_IO_QUEUE'
+
+#the thread pool used by iterRange(...), tuple (pid, threads, executor) so forked workers start their own
+_inflatePool = None
+
+#the tabix linear index has one entry per 16kb window
+LINEAR_SHIFT = 14
+
+#header values for a VCF index: format, col_seq, col_beg, col_end, meta ('#'), skip
+TABIX_VCF_HEADER = (2, 1, 2, 0, ord('#'), 0)
+
+#beg/end - virtual offsets covering every record for the contig
+#intervals - the linear index, virtual offset of the first record overlapping each 16kb window
+ContigIndex = collections.namedtuple('ContigIndex', ['beg', 'end', 'intervals'])
+
+def readTabixIndex(tbiFN):
+    '''
+    This function parses a tabix index
+    @param tbiFN - the .tbi filename
+    @return - dictionary where key is the contig name and value is a ContigIndex, contigs with no records are not included
+    '''
+    with gzip.open(tbiFN, 'rb') as fp:
+        data = fp.read()
+
+    if data[0:4] != b'TBI\x01':
+        raise Exception('Not a tabix index: '+tbiFN)
+
+    #n_ref, format, col_seq, col_beg, col_end, meta, skip, l_nm
+    header = struct.unpack_from('<8i', data, 4)
+    nRef = header[0]
+    offset = 36
+    names = data[offset:offset+header[7]].split(b'\x00')[0:nRef]
+    offset += header[7]
+
+    ret = {}
+    for name in names:
+        beg = None
+        end = None
+        nBin, = struct.unpack_from('<i', data, offset)
+        offset += 4
+        for b in range(0, nBin):
+            binNum, nChunk = struct.unpack_from('<Ii', data, offset)
+            offset += 8
+            chunks = struct.unpack_from('<'+str(2*nChunk)+'Q', data, offset)
+            offset += 16*nChunk
+            if binNum == PSEUDO_BIN:
+                continue
+
+            chunkBeg = min(chunks[0::2])
+            chunkEnd = max(chunks[1::2])
+            if beg is None or chunkBeg < beg:
+                beg = chunkBeg
+            if end is None or chunkEnd > end:
+                end = chunkEnd
+
+        nIntv, = struct.unpack_from('<i', data, offset)
+        offset += 4
+        intervals = struct.unpack_from('<'+str(nIntv)+'Q', data, offset)
+        offset += 8*nIntv
+
+        if beg is not None:
+            ret[name.decode()] = ContigIndex(beg, end, intervals)
+
+    return ret
+
+#indexes parsed by openTabixIndex(...), keyed on the file stamp so a rewritten index is parsed again
+_indexes = LruCache(MAX_OPEN_FILES)
+
+def openTabixIndex(tbiFN):
+    '''
+    @param tbiFN - the .tbi filename
+    @return - the readTabixIndex(...) result, reused across calls within the same process; callers must not modify it
+    '''
+    k = fileStamp(tbiFN)
+    tabixIndex = _indexes.get(k)
+    if tabixIndex is None:
+        tabixIndex = _indexes.put(k, readTabixIndex(tbiFN))
+    return tabixIndex
+
+def setIoThreads(threads, queueDepth=None):
+    '''
+    This function sets how iterRange(...) inflates blocks in this process and in any worker process started after it
+    @param threads - the number of threads inflating blocks ahead of the reader, 0 inflates each block when it is read
+    @param queueDepth - the most blocks inflated ahead of the reader, None keeps DEFAULT_IO_QUEUE
+    '''
+    if threads < 0 or (queueDepth is not None and queueDepth < 1):
+        raise Exception('Expected at least 0 I/O threads and a queue depth of at least 1')
+    os.environ[IO_THREADS_ENV] = str(threads)
+    os.environ[IO_QUEUE_ENV] = str(queueDepth if queueDepth is not None else DEFAULT_IO_QUEUE)
+
+def ioThreads():
+    '''
+    @return - tuple (threads, queueDepth) from setIoThreads(...), (0, DEFAULT_IO_QUEUE) by default
+    '''
+    return (int(os.environ.get(IO_THREADS_ENV, 0)), int(os.environ.get(IO_QUEUE_ENV, DEFAULT_IO_QUEUE)))
+
+def inflatePool(threads):
+    '''
+    @param threads - the number of threads
+    @return - a ThreadPoolExecutor with that many threads, shared by every iterRange(...) call in this process
+    '''
+    global _inflatePool
+    if _inflatePool is None or _inflatePool[0:2] != (os.getpid(), threads):
+        #a forked worker inherits the parent's pool object but none of its threads
+        _inflatePool = (os.getpid(), threads, concurrent.futures.ThreadPoolExecutor(threads, thread_name_prefix='bgzf'))
+    return _inflatePool[2]
+
+def readCompressedBlock(fp, coffset):
+    '''
+    This function reads a single BGZF block without inflating it
+    @param fp - a binary file handle for the BGZF file
+    @param coffset - the file offset where the block starts
+    @return - tuple (cdata, nextOffset)
+        cdata - the raw deflate data of the block, None at the end of the file
+        nextOffset - the file offset of the following block
+    '''
+    fp.seek(coffset)
+    header = fp.read(18)
+    if len(header) < 18:
+        return (None, coffset)
+
+    #the only extra subfield bgzip writes is BC, which stores the total block size - 1
+    xlen, = struct.unpack_from('<H', header, 10)
+    extra = header[12:] + fp.read(xlen-6)
+    bsize = None
+    i = 0
+    while i < xlen:
+        si1, si2, slen = struct.unpack_from('<BBH', extra, i)
+        if si1 == 66 and si2 == 67:
+            bsize, = struct.unpack_from('<H', extra, i+4)
+        i += 4+slen
+    if bsize is None:
+        raise Exception('Not a BGZF block at offset '+str(coffset))
+
+    cdata = fp.read(bsize-xlen-19)
+    fp.read(8)
+    return (cdata, coffset+bsize+1)
+
+def readBlock(fp, coffset):
+    '''
+    This function reads and inflates a single BGZF block
+    @param fp - a binary file handle for the BGZF file
+    @param coffset - the file offset where the block starts
+    @return - tuple (data, nextOffset)
+        data - the uncompressed bytes of the block, empty at the end of the file
+        nextOffset - the file offset of the following block
+    '''
+    cdata, nextOffset = readCompressedBlock(fp, coffset)
+    if cdata is None:
+        return (b'', coffset)
+    return (zlib.decompress(cdata, -15), nextOffset)
+
+def iterRange(fp, beg, end):
+    '''
+    This function yields the uncompressed data between two virtual offsets, one chunk per BGZF block.  With setIoThreads(...) the
+    blocks are inflated ahead of the caller by a thread pool, so the caller parses one block while the next ones are inflated.
+    @param fp - a binary file handle for the BGZF file
+    @param beg - the virtual offset to start at
+    @param end - the virtual offset to stop at (exclusive)
+    '''
+    threads, queueDepth = ioThreads()
+    if threads > 0:
+        return iterRangeThreaded(fp, beg, end, threads, queueDepth)
+    return iterRangeSerial(fp, beg, end)
+
+def iterRangeSerial(fp, beg, end):
+    '''
+    iterRange(...) inflating each block when it is read
+    '''
+    coffset = beg >> 16
+    uoffset = beg & 0xFFFF
+    endCoffset = end >> 16
+    stats = activeStats()
+    while coffset <= endCoffset:
+        if stats is None:
+            data, nextOffset = readBlock(fp, coffset)
+        else:
+            start = time.perf_counter()
+            data, nextOffset = readBlock(fp, coffset)
+            stats.addTime('decompress', time.perf_counter()-start)
+        if len(data) == 0 and nextOffset == coffset:
+            break
+        if coffset == endCoffset:
+            data = data[0:end & 0xFFFF]
+        yield data[uoffset:]
+        uoffset = 0
+        coffset = nextOffset
+
+def iterRangeThreaded(fp, beg, end, threads, queueDepth):
+    '''
+    iterRange(...) with up to queueDepth blocks inflating in the thread pool, zlib releases the GIL so they inflate while the caller
+    parses; the blocks are still yielded in file order.  The time spent waiting for a block is counted as the decompress stage.
+    '''
+    pool = inflatePool(threads)
+    coffset = beg >> 16
+    uoffset = beg & 0xFFFF
+    endCoffset = end >> 16
+    stats = activeStats()
+
+    #(block offset, future of the inflated data) in file order, the compressed reads stay on this thread since they share fp
+    pending = collections.deque()
+    def readAhead():
+        nonlocal coffset
+        while len(pending) < queueDepth and coffset <= endCoffset:
+            cdata, nextOffset = readCompressedBlock(fp, coffset)
+            if cdata is None:
+                coffset = endCoffset+1
+                break
+            pending.append((coffset, pool.submit(zlib.decompress, cdata, -15)))
+            coffset = nextOffset
+
+    readAhead()
+    while len(pending) > 0:
+        blockOffset, future = pending.popleft()
+        if stats is None:
+            data = future.result()
+        else:
+            start = time.perf_counter()
+            data = future.result()
+            stats.addTime('decompress', time.perf_counter()-start)
+
+        #queue the next blocks before handing this one over so the pool stays busy while the caller parses
+        readAhead()
+        if blockOffset == endCoffset:
+            data = data[0:end & 0xFFFF]
+        yield data[uoffset:]
+        uoffset = 0
+
+class BgzfWriter(object):
+    '''
+    Writes a BGZF file, the output can be read by gzip and by readBlock(...), and tell() gives the virtual offsets used by tabix
+    '''
+    def __init__(self, fp, level=6):
+        '''
+        @param fp - a binary file handle to write the blocks to
+        @param level - the zlib compression level
+        '''
+        self.fp = fp
+        self.level = level
+        self.coffset = 0
+        self.buffer = bytearray()
+
+    def tell(self):
+        '''
+        @return - the virtual offset of the next byte written
+        '''
+        return (self.coffset << 16) | len(self.buffer)
+
+    def write(self, data):
+        '''
+        @param data - the bytes to write
+        '''
+        self.buffer += data
+        while len(self.buffer) >= BLOCK_DATA_SIZE:
+            self.writeBlock(bytes(self.buffer[0:BLOCK_DATA_SIZE]))
+            del self.buffer[0:BLOCK_DATA_SIZE]
+
+    def writeBlock(self, data):
+        '''
+        @param data - the uncompressed bytes of one block, at most BLOCK_DATA_SIZE
+        '''
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        cdata = compressor.compress(data)+compressor.flush()
+        header = struct.pack('<BBBBIBBHBBHH', 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(cdata)+25)
+        self.fp.write(header+cdata+struct.pack('<II', zlib.crc32(data), len(data)))
+        self.coffset += len(header)+len(cdata)+8
+
+    def close(self):
+        '''
+        This function flushes the last block and writes the EOF block, the file handle is left open
+        '''
+        if len(self.buffer) > 0:
+            self.writeBlock(bytes(self.buffer))
+            self.buffer = bytearray()
+        self.fp.write(EOF_BLOCK)
+        self.coffset += len(EOF_BLOCK)
+
+def reg2bin(beg, end):
+    '''
+    @param beg - the 0-based start of a record
+    @param end - the 0-based, exclusive end of a record
+    @return - the smallest tabix bin holding the record
+    '''
+    end -= 1
+    if beg >> 14 == end >> 14:
+        return 4681+(beg >> 14)
+    if beg >> 17 == end >> 17:
+        return 585+(beg >> 17)
+    if beg >> 20 == end >> 20:
+        return 73+(beg >> 20)
+    if beg >> 23 == end >> 23:
+        return 9+(beg >> 23)
+    if beg >> 26 == end >> 26:
+        return 1+(beg >> 26)
+    return 0
+
+class TabixBuilder(object):
+    '''
+    Collects the virtual offsets of the records in a sorted BGZF file and writes the tabix index for them
+    '''
+    def __init__(self):
+        self.names = []
+        self.bins = {}
+        self.intervals = {}
+        self.counts = {}
+
+    def add(self, chrom, beg, end, vbeg, vend):
+        '''
+        @param chrom - the record's contig, records must be added in file order with each contig contiguous
+        @param beg - the 0-based start of the record
+        @param end - the 0-based, exclusive end of the record
+        @param vbeg - the virtual offset of the start of the record's line
+        @param vend - the virtual offset just past the record's line
+        '''
+        if not (chrom in self.bins):
+            self.names.append(chrom)
+            self.bins[chrom] = {}
+            self.intervals[chrom] = []
+            self.counts[chrom] = 0
+        self.counts[chrom] += 1
+
+        chunks = self.bins[chrom].setdefault(reg2bin(beg, end), [])
+        if chunks and (chunks[-1][1] >> 16) == (vbeg >> 16):
+            chunks[-1][1] = vend
+        else:
+            chunks.append([vbeg, vend])
+
+        intervals = self.intervals[chrom]
+        lastWindow = (max(end, beg+1)-1) >> LINEAR_SHIFT
+        if len(intervals) <= lastWindow:
+            #windows before this record with no record of their own start at this record, like tabix does
+            intervals.extend([None]*(lastWindow+1-len(intervals)))
+        for window in range(beg >> LINEAR_SHIFT, lastWindow+1):
+            if intervals[window] is None:
+                intervals[window] = vbeg
+
+    def write(self, tbiFN):
+        '''
+        @param tbiFN - the .tbi filename to write
+        '''
+        nameBytes = b''.join(name.encode()+b'\x00' for name in self.names)
+        data = [b'TBI\x01', struct.pack('<8i', len(self.names), *TABIX_VCF_HEADER, len(nameBytes)), nameBytes]
+        for name in self.names:
+            bins = self.bins[name]
+            allChunks = [chunk for chunks in bins.values() for chunk in chunks]
+            data.append(struct.pack('<i', len(bins)+1))
+            for binNum, chunks in sorted(bins.items()):
+                data.append(struct.pack('<Ii', binNum, len(chunks)))
+                for chunk in chunks:
+                    data.append(struct.pack('<QQ', *chunk))
+            data.append(struct.pack('<IiQQQQ', PSEUDO_BIN, 2, min(chunk[0] for chunk in allChunks), max(chunk[1] for chunk in allChunks),
+                self.counts[name], 0))
+
+            intervals = self.intervals[name]
+            filled = []
+            for window in range(len(intervals)-1, -1, -1):
+                if intervals[window] is not None:
+                    filled.append(intervals[window])
+                else:
+                    filled.append(filled[-1])
+            filled.reverse()
+            data.append(struct.pack('<i', len(filled)))
+            data.append(struct.pack('<'+str(len(filled))+'Q', *filled))
+        data.append(struct.pack('<Q', 0))
+
+        with open(tbiFN, 'wb') as fp:
+            writer = BgzfWriter(fp)
+            writer.write(b''.join(data))
+            writer.close()
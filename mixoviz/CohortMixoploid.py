@@ -0,0 +1,144 @@
+'''
+This module runs the TrioMixoploid.py calculation for every trio in a joint-called VCF using a single scan of the file
+(see "mixoviz cohort-mixoploid -h").
+'''
+
+import functools
+import os
+import sys
+
+from .Regions import mapRegions, planRegions
+from .SiteCache import loadRegion, readHeader
+from .TrioMixoploid import depthSummaries, mergeSummaries, printRatioHeader, printRatioTable, ratioColumns, ratioRows
+from .VcfArrays import GT_HOMALT, GT_HOMREF, MissingContig, callPassMask
+
+def readTrios(manifestFN, samples):
+    '''
+    This function loads the trios to test from either a PED file or a simple three column manifest
+    @param manifestFN - a PED file (family, individual, father, mother, sex, phenotype) or a whitespace-separated file with the proband,
+        father, and mother on each line; blank lines and lines starting with '#' are ignored
+    @param samples - the sample labels present in the VCF
+    @return - a list of (proband, father, mother) tuples
+    '''
+    trios = []
+    with open(manifestFN, 'r') as fp:
+        for l in fp:
+            fields = l.split()
+            if len(fields) == 0 or fields[0][0] == '#':
+                continue
+
+            if len(fields) == 3:
+                #explicit trio, so everything has to be present
+                trio = tuple(fields)
+                for sampleLabel in trio:
+                    if (sampleLabel not in samples):
+                        raise Exception('Missing required column "'+sampleLabel+'" in VCF file for trio: '+' '.join(trio))
+                trios.append(trio)
+            elif len(fields) >= 6:
+                #PED entry, only individuals with both parents sequenced are trios
+                trio = (fields[1], fields[2], fields[3])
+                if trio[1] == '0' or trio[2] == '0':
+                    continue
+                if all(sampleLabel in samples for sampleLabel in trio):
+                    trios.append(trio)
+                else:
+                    print('Warning: skipping trio with samples missing from the VCF: '+' '.join(trio), file=sys.stderr)
+            else:
+                raise Exception('Unexpected line in trio manifest "'+manifestFN+'": '+l.rstrip())
+    return trios
+
+def cohortRegion(vcfFN, sampleLabels, trioColumns, MIN_DEPTH, MIN_QUALITY, cacheDir, bins, region):
+    '''
+    This function reads a region once and gathers the informative calls for every trio, it is run in a worker process when threads
+    are used
+    @param vcfFN - the .vcf.bgz file to parse
+    @param sampleLabels - every sample used by at least one trio
+    @param trioColumns - list of (proband, father, mother) column indices into sampleLabels
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param bins - the number of BAF histogram bins for the medians, None keeps every frequency for exact medians
+    @param region - the Regions.Region to scan
+    @return - list with one TrioMixoploid.depthSummaries(...) tuple per trio, or None if the contig has no records
+    '''
+    try:
+        sites = loadRegion(vcfFN, region, sampleLabels, cacheDir)
+    except MissingContig:
+        return None
+
+    #the per-call filters and genotypes are shared by every trio a sample belongs to
+    callPassing = sites.snv[:, None] & callPassMask(sites, MIN_DEPTH, MIN_QUALITY)
+    homRef = sites.gt == GT_HOMREF
+    homAlt = sites.gt == GT_HOMALT
+
+    ret = []
+    for pro, fat, mot in trioColumns:
+        passing = callPassing[:, pro] & callPassing[:, fat] & callPassing[:, mot]
+        mask0011 = passing & homRef[:, fat] & homAlt[:, mot]
+        mask1100 = passing & homAlt[:, fat] & homRef[:, mot]
+        ret.append(depthSummaries((sites.ad[mask0011, pro, 0], sites.ad[mask0011, pro, 1],
+            sites.ad[mask1100, pro, 0], sites.ad[mask1100, pro, 1]), bins))
+    return ret
+
+def mergeCohortSummaries(results):
+    '''
+    @param results - a list of cohortRegion(...) results for consecutive regions of a contig
+    @return - one cohortRegion(...) result covering all of the regions
+    '''
+    return [mergeSummaries([result[i] for result in results]) for i in range(0, len(results[0]))]
+
+def calcCohort(vcfFN, manifestFN, outDir, MIN_DEPTH, MIN_QUALITY, longFormat=False, threads=1, cacheDir=None, bins=None, bootstrap=0,
+    seed=0, shardSize=None, regionsFN=None):
+    '''
+    This function scans the VCF once and writes the TrioMixoploid.py table for every trio
+        <outDir>/<proband>.tsv - one table per trio, the same format as TrioMixoploid.py
+        <outDir>/cohort.tsv - instead of the above when longFormat is set, all trios in one table with a leading proband column
+    @param vcfFN - the .vcf.bgz file to parse
+    @param manifestFN - the PED file or trio manifest, see readTrios(...)
+    @param outDir - the directory to save the tables to
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @param longFormat - if True, write a single long-format table
+    @param threads - the number of worker processes used to scan contigs in parallel
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param bins - the number of BAF histogram bins for the medians, None keeps every frequency for exact medians
+    @param bootstrap - the number of bootstrap replicates for the confidence intervals, 0 skips them
+    @param seed - the random seed for the bootstrap replicates, each trio uses the same seed
+    @param shardSize - the largest region scanned by one worker in base pairs, None scans whole contigs (see Regions.py)
+    @param regionsFN - optional BED file, only the records inside its regions are used
+    '''
+    if not os.path.exists(outDir):
+        os.makedirs(outDir)
+
+    contigs, samples = readHeader(vcfFN, cacheDir)
+    plan = planRegions(vcfFN, contigs, shardSize, regionsFN)
+    chromList = [chrom for chrom, regions in plan]
+    trios = readTrios(manifestFN, samples)
+
+    #each sample is extracted once no matter how many trios it is part of
+    sampleLabels = []
+    for trio in trios:
+        for sampleLabel in trio:
+            if not (sampleLabel in sampleLabels):
+                sampleLabels.append(sampleLabel)
+    trioColumns = [tuple(sampleLabels.index(sampleLabel) for sampleLabel in trio) for trio in trios]
+
+    #iterate through the VCF, each region is handled by cohortRegion(...)
+    summaries = [[] for trio in trios]
+    worker = functools.partial(cohortRegion, vcfFN, sampleLabels, trioColumns, MIN_DEPTH, MIN_QUALITY, cacheDir, bins)
+    for chrom, result in zip(chromList, mapRegions(worker, plan, threads, mergeCohortSummaries)):
+        for i in range(0, len(trios)):
+            summaries[i].append(None if result is None else result[i])
+
+    if longFormat:
+        with open(outDir+'/cohort.tsv', 'w') as fp:
+            printRatioHeader(MIN_DEPTH, MIN_QUALITY, fp, bins, bootstrap, seed)
+            print('##proband - the proband label, rows for each trio are grouped together', file=fp)
+            print('#'+'\t'.join(['proband']+ratioColumns(bins, bootstrap)), file=fp)
+            for trio, trioSummaries in zip(trios, summaries):
+                for rowValues in ratioRows(chromList, trioSummaries, bins, bootstrap, seed):
+                    print('\t'.join([str(x) for x in [trio[0]]+rowValues]), file=fp)
+    else:
+        for trio, trioSummaries in zip(trios, summaries):
+            with open(outDir+'/'+trio[0]+'.tsv', 'w') as fp:
+                printRatioTable(chromList, trioSummaries, MIN_DEPTH, MIN_QUALITY, fp, bins, bootstrap, seed)
@@ -0,0 +1,546 @@
+'''
+A long-running local server for trio jobs (see "mixoviz serve -h").  Each worker is a persistent process, so the imports, the VCF
+readers and tabix indexes, and the extracted site arrays (see SiteCache.setMemoryLimit(...)) stay warm between jobs on the same files.
+
+The server speaks JSON over HTTP and only listens on localhost by default:
+    POST /jobs - queue a job, the body has the REQUIRED_FIELDS and any of JOB_DEFAULTS, returns the job status
+    GET /jobs - the status of every job the server remembers
+    GET /jobs/<id> - the status of one job, including its result once it is done
+    DELETE /jobs/<id> - cancel a job, a running job has its worker process restarted
+    GET /status - the workers, queue length, and memory caches of the server
+The client functions at the bottom of this module (and "mixoviz submit/status/cancel") only need the standard library.
+'''
+
+import collections
+import dataclasses
+import http.server
+import importlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+#the job fields every submission must have, the VCF and the trio labels
+REQUIRED_FIELDS = ['vcf', 'proband', 'father', 'mother']
+
+#the optional job fields and their defaults, these match the "mixoviz trio-mixoploid" and "mixoviz trio-ballele" options; the trio
+#figures are only drawn when outDir is set
+JOB_DEFAULTS = {'depth' : 20, 'quality' : 20, 'cacheDir' : None, 'bins' : None, 'bootstrap' : 0, 'seed' : 0, 'shardSize' : None,
+    'regions' : None, 'outDir' : None, 'density' : False, 'imageFormat' : 'png', 'dpi' : None}
+
+#the job fields that are filenames, made absolute by the client so the server can run from any directory
+PATH_FIELDS = ['vcf', 'cacheDir', 'regions', 'outDir']
+
+#job states, a job moves from queued to running to one of the finished states
+QUEUED = 'queued'
+RUNNING = 'running'
+FINISHED_STATES = ['done', 'failed', 'cancelled']
+
+#the number of finished jobs remembered for GET /jobs, older ones are forgotten first
+MAX_FINISHED_JOBS = 1000
+
+class ServerError(Exception):
+    '''
+    An error reported to the client, with the HTTP status to send
+    '''
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+def parseJob(body):
+    '''
+    This function checks a submitted job and fills in the defaults
+    @param body - the decoded JSON body of POST /jobs
+    @return - a dictionary with every field of REQUIRED_FIELDS and JOB_DEFAULTS
+    '''
+    if not isinstance(body, dict):
+        raise ServerError(400, 'Expected a JSON object')
+    unknown = [k for k in body if not (k in REQUIRED_FIELDS or k in JOB_DEFAULTS)]
+    if len(unknown) > 0:
+        raise ServerError(400, 'Unknown job fields: '+', '.join(sorted(unknown)))
+    for k in REQUIRED_FIELDS:
+        if body.get(k, None) is None:
+            raise ServerError(400, 'Missing required job field "'+k+'"')
+    ret = dict(JOB_DEFAULTS)
+    ret.update(body)
+    for k in PATH_FIELDS:
+        if ret[k] is not None:
+            ret[k] = os.path.abspath(ret[k])
+    return ret
+
+def runJob(job):
+    '''
+    This function runs one job inside a worker process, the scans are serial since the workers are the unit of concurrency
+    @param job - a dictionary from parseJob(...)
+    @return - the JSON-serializable result
+        columns, rows - the TrioMixoploid.RatioTable
+        missing, derivedRatio, figures - the TrioBAllele.TrioPlots, only when outDir is set
+        seconds - the wall time of the job
+        cache - the SiteCache.memoryStats() of the worker after the job
+    '''
+    from .SiteCache import memoryStats
+    from .TrioBAllele import plotTrioBiallelic
+    from .TrioMixoploid import calcTrioBiallelic
+
+    start = time.perf_counter()
+    table = calcTrioBiallelic(job['vcf'], job['proband'], job['father'], job['mother'], job['depth'], job['quality'], 1, job['cacheDir'],
+        job['bins'], job['bootstrap'], job['seed'], None, None, job['shardSize'], job['regions'])
+    ret = {'columns' : table.columns, 'rows' : table.rows}
+    if job['outDir'] is not None:
+        plots = plotTrioBiallelic(job['vcf'], job['proband'], job['father'], job['mother'], job['outDir'], job['depth'], job['quality'], 1,
+            job['cacheDir'], job['density'], job['imageFormat'], job['dpi'], 1, None, job['shardSize'], job['regions'])
+        ret['missing'] = plots.missing
+        ret['derivedRatio'] = plots.derivedRatio
+        ret['figures'] = plots.figures
+    ret['seconds'] = time.perf_counter()-start
+    ret['cache'] = memoryStats()
+    return ret
+
+def workerMain(conn, memoryBytes):
+    '''
+    This is the loop of a worker process, it runs jobs from the server until the connection is closed
+    @param conn - the worker's end of the pipe to the server
+    @param memoryBytes - the most bytes of site arrays to keep in memory between jobs
+    '''
+    from .Rendering import loadPyplot
+    from .SiteCache import setMemoryLimit
+
+    #pay for the heavy imports once, before the first job arrives, they are only imported for their side effect of being loaded
+    for moduleName in ['.TrioBAllele', '.TrioMixoploid']:
+        importlib.import_module(moduleName, __package__)
+    loadPyplot()
+    setMemoryLimit(memoryBytes)
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        try:
+            #numpy scalars and arrays are converted so the server never has to import numpy
+            reply = ('done', json.loads(json.dumps(runJob(job), default=lambda value: value.tolist())))
+        except Exception as e:
+            reply = ('failed', str(e))
+        try:
+            conn.send(reply)
+        except OSError:
+            #the server is gone
+            return
+
+class JobWorker(object):
+    '''
+    The server's handle on one worker process
+    '''
+    def __init__(self, memoryBytes):
+        '''
+        @param memoryBytes - the most bytes of site arrays the worker keeps in memory between jobs
+        '''
+        self.memoryBytes = memoryBytes
+        self.job = None
+        self.terminated = False
+        self.jobsRun = 0
+        self.cache = None
+        self.start()
+
+    def start(self):
+        '''
+        This function starts a fresh worker process, workers are spawned so they never inherit the server's threads
+        '''
+        self.terminated = False
+        context = multiprocessing.get_context('spawn')
+        self.conn, childConn = context.Pipe()
+        self.process = context.Process(target=workerMain, args=(childConn, self.memoryBytes), daemon=True)
+        self.process.start()
+        childConn.close()
+
+    def run(self, job):
+        '''
+        This function sends a job to the worker process and waits for it
+        @param job - a dictionary from parseJob(...)
+        @return - tuple (state, value), either ('done', result) or ('failed', message)
+        '''
+        try:
+            self.conn.send(job)
+            state, value = self.conn.recv()
+        except (EOFError, OSError):
+            #the process died or was terminated by JobServer.cancel(...), its caches are lost with it
+            self.stop()
+            self.start()
+            return ('failed', 'Worker process exited')
+        self.jobsRun += 1
+        if state == 'done':
+            self.cache = value['cache']
+        return (state, value)
+
+    def terminate(self):
+        '''
+        This function kills the worker process in the middle of a job, JobServer.workerLoop(...) starts a new one
+        '''
+        self.terminated = True
+        self.process.terminate()
+
+    def stop(self):
+        '''
+        This function ends the worker process
+        '''
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+    def status(self):
+        '''
+        @return - a JSON-serializable dictionary describing the worker
+        '''
+        return {'pid' : self.process.pid, 'job' : self.job.jobId if self.job is not None else None, 'jobs_run' : self.jobsRun,
+            'cache' : self.cache}
+
+@dataclasses.dataclass
+class Job:
+    '''
+    A job submitted to the server and its progress
+    '''
+    jobId: int
+    spec: dict
+    state: str = QUEUED
+    submitted: float = None
+    started: float = None
+    finished: float = None
+    result: dict = None
+    error: str = None
+    #set when a running job is cancelled, the worker thread finishes the job once its process is gone
+    cancelling: bool = False
+
+    def status(self, withResult=False):
+        '''
+        @param withResult - if True, include the result of a finished job
+        @return - a JSON-serializable dictionary describing the job
+        '''
+        ret = {'id' : self.jobId, 'state' : self.state, 'job' : self.spec, 'submitted' : self.submitted, 'started' : self.started,
+            'finished' : self.finished}
+        if self.error is not None:
+            ret['error'] = self.error
+        if withResult and self.result is not None:
+            ret['result'] = self.result
+        return ret
+
+class JobServer(object):
+    '''
+    The job queue and the worker processes that run it, every method is safe to call from the HTTP request threads
+    '''
+    def __init__(self, workers=1, memoryBytes=0, maxQueue=100):
+        '''
+        @param workers - the number of worker processes, which is also the number of jobs run at once
+        @param memoryBytes - the most bytes of site arrays each worker keeps in memory between jobs
+        @param maxQueue - the most jobs waiting for a worker, further submissions are refused until the queue drains
+        '''
+        self.maxQueue = maxQueue
+        self.lock = threading.Condition()
+        self.jobs = collections.OrderedDict()
+        self.queue = collections.deque()
+        self.nextId = 1
+        self.closing = False
+        self.started = time.time()
+        self.workers = [JobWorker(memoryBytes) for i in range(0, workers)]
+        self.threads = [threading.Thread(target=self.workerLoop, args=(worker,), daemon=True) for worker in self.workers]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, body):
+        '''
+        @param body - the decoded JSON body of POST /jobs
+        @return - the status of the queued job
+        '''
+        spec = parseJob(body)
+        with self.lock:
+            if self.closing:
+                raise ServerError(503, 'The server is shutting down')
+            if len(self.queue) >= self.maxQueue:
+                raise ServerError(503, 'The queue is full ('+str(self.maxQueue)+' jobs), try again later')
+            job = Job(self.nextId, spec, submitted=time.time())
+            self.nextId += 1
+            self.jobs[job.jobId] = job
+            self.queue.append(job)
+            self.lock.notify_all()
+            return job.status()
+
+    def getJob(self, jobId):
+        '''
+        @param jobId - the job id
+        @return - the Job, raises a ServerError if it is unknown
+        '''
+        if not (jobId in self.jobs):
+            raise ServerError(404, 'Unknown job '+str(jobId))
+        return self.jobs[jobId]
+
+    def jobStatus(self, jobId=None):
+        '''
+        @param jobId - the job id, None for every job
+        @return - the status of the job including its result, or a list with the status of every job
+        '''
+        with self.lock:
+            if jobId is None:
+                return [job.status() for job in self.jobs.values()]
+            return self.getJob(jobId).status(True)
+
+    def cancel(self, jobId):
+        '''
+        This function cancels a job, a queued job is dropped and a running job has its worker process terminated and restarted
+        @param jobId - the job id
+        @return - the status of the job
+        '''
+        with self.lock:
+            job = self.getJob(jobId)
+            if job.state == QUEUED:
+                self.queue.remove(job)
+                self.finish(job, 'cancelled')
+            elif job.state == RUNNING and not job.cancelling:
+                job.cancelling = True
+                for worker in self.workers:
+                    if worker.job is job:
+                        worker.terminate()
+            return job.status()
+
+    def status(self):
+        '''
+        @return - a JSON-serializable dictionary describing the server
+        '''
+        with self.lock:
+            states = collections.Counter(job.state for job in self.jobs.values())
+            return {'uptime' : time.time()-self.started, 'queued' : len(self.queue), 'max_queue' : self.maxQueue, 'jobs' : dict(states),
+                'workers' : [worker.status() for worker in self.workers]}
+
+    def finish(self, job, state, result=None, error=None):
+        '''
+        This function records the end of a job and forgets the oldest finished jobs past MAX_FINISHED_JOBS, the lock must be held
+        @param job - the Job
+        @param state - one of FINISHED_STATES
+        @param result - the result of a done job
+        @param error - the message of a failed job
+        '''
+        job.state = state
+        job.result = result
+        job.error = error
+        job.finished = time.time()
+        finished = [k for k, other in self.jobs.items() if other.state in FINISHED_STATES]
+        for k in finished[0:max(len(finished)-MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[k]
+        self.lock.notify_all()
+
+    def workerLoop(self, worker):
+        '''
+        This is the loop of the thread that feeds one worker process
+        @param worker - the JobWorker
+        '''
+        while True:
+            with self.lock:
+                while len(self.queue) == 0 and not self.closing:
+                    self.lock.wait()
+                if self.closing:
+                    return
+                job = self.queue.popleft()
+                job.state = RUNNING
+                job.started = time.time()
+                worker.job = job
+
+            state, value = worker.run(job.spec)
+            if worker.terminated:
+                #the job finished before the cancel reached the process, it still needs a fresh one
+                worker.stop()
+                worker.start()
+
+            with self.lock:
+                worker.job = None
+                if job.cancelling:
+                    self.finish(job, 'cancelled')
+                elif state == 'done':
+                    self.finish(job, state, result=value)
+                else:
+                    self.finish(job, state, error=value)
+
+    def close(self):
+        '''
+        This function cancels every job and stops the worker processes
+        '''
+        with self.lock:
+            self.closing = True
+            for job in list(self.queue):
+                self.finish(job, 'cancelled')
+            self.queue.clear()
+            self.lock.notify_all()
+        for worker in self.workers:
+            worker.stop()
+
+class JobRequestHandler(http.server.BaseHTTPRequestHandler):
+    '''
+    Maps the HTTP endpoints onto the JobServer held by the HTTP server
+    '''
+    def sendJson(self, status, value):
+        '''
+        @param status - the HTTP status code
+        @param value - the JSON-serializable response body
+        '''
+        data = json.dumps(value).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def handle(self):
+        try:
+            http.server.BaseHTTPRequestHandler.handle(self)
+        except ConnectionError:
+            #the client went away, nothing to answer
+            pass
+
+    def dispatch(self, method):
+        '''
+        @param method - the HTTP method, the path is in self.path
+        '''
+        jobServer = self.server.jobServer
+        parts = [part for part in self.path.split('?')[0].split('/') if part != '']
+        try:
+            if method == 'GET' and parts == ['status']:
+                self.sendJson(200, jobServer.status())
+            elif method == 'GET' and parts == ['jobs']:
+                self.sendJson(200, jobServer.jobStatus())
+            elif method == 'POST' and parts == ['jobs']:
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    body = json.loads(self.rfile.read(length).decode())
+                except ValueError:
+                    raise ServerError(400, 'The body is not valid JSON')
+                self.sendJson(201, jobServer.submit(body))
+            elif len(parts) == 2 and parts[0] == 'jobs' and method in ['GET', 'DELETE']:
+                try:
+                    jobId = int(parts[1])
+                except ValueError:
+                    raise ServerError(404, 'Unknown job '+parts[1])
+                self.sendJson(200, jobServer.jobStatus(jobId) if method == 'GET' else jobServer.cancel(jobId))
+            else:
+                raise ServerError(404, 'Unknown endpoint '+method+' '+self.path)
+        except ServerError as e:
+            self.sendJson(e.status, {'error' : str(e)})
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            http.server.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+def serve(host, port, workers=1, memoryBytes=0, maxQueue=100, verbose=False):
+    '''
+    This function runs the job server until it is interrupted
+    @param host - the address to listen on, keep it on localhost since jobs name files on this machine
+    @param port - the port to listen on, 0 picks a free port
+    @param workers - the number of worker processes
+    @param memoryBytes - the most bytes of site arrays each worker keeps in memory between jobs
+    @param maxQueue - the most jobs waiting for a worker
+    @param verbose - if True, log every request to STDERR
+    '''
+    jobServer = JobServer(workers, memoryBytes, maxQueue)
+    httpServer = http.server.ThreadingHTTPServer((host, port), JobRequestHandler)
+    httpServer.daemon_threads = True
+    httpServer.jobServer = jobServer
+    httpServer.verbose = verbose
+    print('Serving on http://'+host+':'+str(httpServer.server_address[1]), file=sys.stderr, flush=True)
+
+    #a service manager stops the server with SIGTERM, shut down the workers the same way as for an interrupt
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        httpServer.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpServer.server_close()
+        jobServer.close()
+
+def serverUrl(host, port):
+    '''
+    @param host - the server address
+    @param port - the server port
+    @return - the base URL of the server
+    '''
+    return 'http://'+host+':'+str(port)
+
+def request(url, method, path, body=None):
+    '''
+    This function sends one request to the job server
+    @param url - the base URL of the server
+    @param method - the HTTP method
+    @param path - the endpoint path
+    @param body - the JSON-serializable body, if any
+    @return - the decoded JSON response, raises an exception with the server's message on an error status
+    '''
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url.rstrip('/')+path, data=data, method=method, headers={'Content-Type' : 'application/json'})
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return json.load(resp)
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.load(e)['error']
+        except:
+            message = str(e)
+        raise Exception('Job server error '+str(e.code)+': '+message)
+
+def submitJob(url, spec):
+    '''
+    @param url - the base URL of the server
+    @param spec - the job fields, see REQUIRED_FIELDS and JOB_DEFAULTS; relative filenames are made absolute here
+    @return - the status of the queued job
+    '''
+    spec = dict(spec)
+    for k in PATH_FIELDS:
+        if spec.get(k, None):
+            spec[k] = os.path.abspath(spec[k])
+    return request(url, 'POST', '/jobs', spec)
+
+def jobStatus(url, jobId=None):
+    '''
+    @param url - the base URL of the server
+    @param jobId - the job id, None for every job
+    @return - the job status (with its result once done), or a list with the status of every job
+    '''
+    return request(url, 'GET', '/jobs' if jobId is None else '/jobs/'+str(jobId))
+
+def cancelJob(url, jobId):
+    '''
+    @param url - the base URL of the server
+    @param jobId - the job id
+    @return - the status of the job
+    '''
+    return request(url, 'DELETE', '/jobs/'+str(jobId))
+
+def serverStatus(url):
+    '''
+    @param url - the base URL of the server
+    @return - the server status, see JobServer.status()
+    '''
+    return request(url, 'GET', '/status')
+
+def waitJob(url, jobId, interval=0.5):
+    '''
+    @param url - the base URL of the server
+    @param jobId - the job id
+    @param interval - seconds between polls
+    @return - the status of the finished job, including its result
+    '''
+    while True:
+        status = jobStatus(url, jobId)
+        if status['state'] in FINISHED_STATES:
+            return status
+        time.sleep(interval)
@@ -0,0 +1,85 @@
+'''
+A least-recently-used cache bounded by a count or by bytes.  The scripts run once per process, but a long-running process such as the
+job server (see JobServer.py) opens many VCFs, so the readers, tabix indexes, and site arrays it keeps between jobs are held in these.
+'''
+
+import collections
+import os
+
+#the number of VCF readers, tabix indexes, and site caches kept open by each process
+MAX_OPEN_FILES = 16
+
+class LruCache(object):
+    '''
+    A dictionary that drops the least recently used entries once the total size of its values is over the limit
+    '''
+    def __init__(self, maxSize, sizeOf=None):
+        '''
+        @param maxSize - the largest total size to keep, 0 keeps nothing
+        @param sizeOf - function returning the size of a value, by default every value has size 1 so maxSize is a count
+        '''
+        self.maxSize = maxSize
+        self.sizeOf = sizeOf if sizeOf is not None else (lambda value: 1)
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, k):
+        '''
+        @param k - the key to look up
+        @return - the value for the key, or None if it is not cached
+        '''
+        if k in self.entries:
+            self.entries.move_to_end(k)
+            self.hits += 1
+            return self.entries[k][0]
+        self.misses += 1
+        return None
+
+    def put(self, k, value):
+        '''
+        This function stores a value and evicts the oldest entries until the cache fits, a value larger than the limit is not kept
+        @param k - the key to store under
+        @param value - the value to store
+        @return - the value, so callers can store and return in one step
+        '''
+        if k in self.entries:
+            self.size -= self.entries.pop(k)[1]
+        size = self.sizeOf(value)
+        if size <= self.maxSize:
+            self.entries[k] = (value, size)
+            self.size += size
+        self.resize(self.maxSize)
+        return value
+
+    def resize(self, maxSize):
+        '''
+        @param maxSize - the new limit, entries are evicted oldest first until the cache fits
+        '''
+        self.maxSize = maxSize
+        while self.size > self.maxSize:
+            oldKey, (oldValue, oldSize) = self.entries.popitem(last=False)
+            self.size -= oldSize
+
+    def clear(self):
+        '''
+        This function drops every entry, the hit and miss counts are kept
+        '''
+        self.entries.clear()
+        self.size = 0
+
+    def stats(self):
+        '''
+        @return - a JSON-serializable dictionary with the entry count, size, limit, hits, and misses
+        '''
+        return {'entries' : len(self.entries), 'size' : self.size, 'max_size' : self.maxSize, 'hits' : self.hits, 'misses' : self.misses}
+
+def fileStamp(fn):
+    '''
+    @param fn - a filename
+    @return - tuple (path, size, mtime) that changes whenever the file is rewritten, cache keys include it so stale entries are never
+        reused
+    '''
+    st = os.stat(fn)
+    return (os.path.abspath(fn), st.st_size, st.st_mtime_ns)
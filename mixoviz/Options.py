@@ -0,0 +1,38 @@
+'''
+Constants shared by the library modules and the command line.  This module has no imports so "mixoviz -h" can build every parser
+without loading numpy, matplotlib, or PyVCF.
+'''
+
+#image formats accepted by the --format options, each is also the file extension
+IMAGE_FORMATS = ['png', 'pdf', 'svg']
+
+#the confidence level of the bootstrap intervals, as a percentage
+CI_LEVEL = 95
+
+#the default sample labels of a simulated trio, in proband/father/mother order
+DEFAULT_LABELS = ['PROBAND', 'FATHER', 'MOTHER']
+
+#the stages Benchmark.py can time, the simulated input is always made first
+BENCHMARK_STAGES = ['BAllele', 'TrioBAllele', 'TrioMixoploid', 'TrioReport']
+
+#where the job server listens by default, see JobServer.py
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+#VCF reader backends, see VcfReaders.py
+READER_NAMES = ['auto', 'raw', 'pysam', 'cyvcf2', 'pyvcf']
+
+#the most BGZF blocks decompressed ahead of the parser with --io-threads, about 4MB of uncompressed data
+DEFAULT_IO_QUEUE = 64
+
+#the thresholds tried by "mixoviz trio-mixoploid --sweep", see ThresholdSweep.py
+DEFAULT_SWEEP_DEPTHS = [10, 15, 20, 25, 30]
+DEFAULT_SWEEP_QUALITIES = [0, 10, 20, 30, 40]
+
+#the defaults of "mixoviz trio-mixoploid --approx", see ApproxMixoploid.py
+DEFAULT_APPROX_TOLERANCE = .02
+DEFAULT_APPROX_REGION = 100000
+
+#the finest position bin size and the number of B-allele frequency bins of the tile pyramid, see BafPyramid.py
+DEFAULT_PYRAMID_BIN_SIZE = 4096
+DEFAULT_PYRAMID_BAF_BINS = 50
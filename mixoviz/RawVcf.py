@@ -0,0 +1,195 @@
+'''
+A lightweight record reader for tabix-indexed VCFs that only does the work the scripts need.  Records are read straight from the BGZF
+blocks listed in the tabix index, multi-allelic records are rejected from the ALT column before any sample column is split, and only
+the GT, GQ, and AD keys of the requested samples are parsed.  The parse cost per record depends on the requested samples, not on the
+number of samples in the file.
+
+The arrays match VcfArrays.extractContig(...), which does the same extraction through PyVCF.
+'''
+
+import array
+import collections
+import gzip
+import os
+import time
+
+from . import Bgzf
+from .Lru import MAX_OPEN_FILES, LruCache, fileStamp
+from .RunStats import activeStats
+from .VcfArrays import GT_CODES, GT_OTHER, MISSING, MissingContig, countMultiallelic, packSites
+
+#GT_CODES for the raw bytes of the GT field
+GT_BYTE_CODES = {gt.encode() : code for gt, code in GT_CODES.items()}
+
+#the FORMAT keys that are parsed, everything else is skipped
+FORMAT_KEYS = [b'GT', b'GQ', b'AD']
+
+#readers opened by openRawReader(...), keyed on (file stamp, pid) like VcfArrays.openReader(...)
+_rawReaders = LruCache(MAX_OPEN_FILES)
+
+class RawVcfReader(object):
+    '''
+    The header and tabix index of a single VCF, records are parsed on demand by extractRawContig(...)
+    '''
+    name = 'raw'
+
+    def __init__(self, vcfFN):
+        '''
+        @param vcfFN - the VCF filename, must be a bgzipped vcf (.vcf.gz) with a tabix index (.vcf.gz.tbi)
+        '''
+        self.vcfFN = vcfFN
+        self.samples = None
+        #contig name -> length (None if the header does not give one), in header order
+        self.contigs = collections.OrderedDict()
+        with gzip.open(vcfFN, 'rb') as fp:
+            for l in fp:
+                if l[0:9] == b'##contig=':
+                    fields = dict(kv.split('=', 1) for kv in l.rstrip(b'\r\n>').decode()[10:].split(',') if '=' in kv)
+                    if 'ID' in fields:
+                        length = fields.get('length', '')
+                        self.contigs[fields['ID']] = int(length) if length.isdigit() else None
+                elif l[0:6] == b'#CHROM':
+                    self.samples = l.rstrip(b'\r\n').decode().split('\t')[9:]
+                    break
+                elif l[0:1] != b'#':
+                    break
+        if self.samples is None:
+            raise Exception('Missing #CHROM header line in VCF file: '+vcfFN)
+        self.tabixIndex = Bgzf.openTabixIndex(vcfFN+'.tbi')
+
+    def extract(self, chrom, sampleLabels, start=None, end=None):
+        '''
+        @return - extractRawContig(...) on this reader, see VcfReaders for the common reader interface
+        '''
+        return extractRawContig(self, chrom, sampleLabels, start, end)
+
+    def iterLines(self, chrom, start=None):
+        '''
+        This function yields the raw record lines for a contig in file order
+        @param chrom - the contig to fetch, raises MissingContig if it has no records in the tabix index
+        @param start - optional 0-based position, reading starts at the linear index window holding it so some earlier records may
+            still be included
+        '''
+        if not (chrom in self.tabixIndex):
+            raise MissingContig(chrom, self.vcfFN)
+        contigIndex = self.tabixIndex[chrom]
+        prefix = chrom.encode()+b'\t'
+
+        beg = contigIndex.beg
+        if start is not None:
+            window = start >> 14
+            if window >= len(contigIndex.intervals):
+                return
+            beg = max(beg, contigIndex.intervals[window])
+
+        remainder = b''
+        with open(self.vcfFN, 'rb') as fp:
+            for data in Bgzf.iterRange(fp, beg, contigIndex.end):
+                lines = (remainder+data).split(b'\n')
+                remainder = lines.pop()
+                for l in lines:
+                    if l.startswith(prefix):
+                        yield l
+        if remainder.startswith(prefix):
+            yield remainder
+
+def openRawReader(vcfFN):
+    '''
+    @param vcfFN - the VCF filename, must be a bgzipped vcf (.vcf.gz) with a tabix index (.vcf.gz.tbi)
+    @return - a RawVcfReader for the file, reused across calls within the same process
+    '''
+    k = (fileStamp(vcfFN), os.getpid())
+    rawReader = _rawReaders.get(k)
+    if rawReader is None:
+        rawReader = _rawReaders.put(k, RawVcfReader(vcfFN))
+    return rawReader
+
+def parseRawQuality(value):
+    '''
+    @param value - the raw GQ bytes, may be None
+    @return - the quality as an int, or MISSING if it is absent or not a number
+    '''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return MISSING
+
+def parseRawDepths(value):
+    '''
+    @param value - the raw AD bytes, may be None
+    @return - tuple (ref, alt), both MISSING unless AD is exactly two integers
+    '''
+    try:
+        ref, alt = value.split(b',')
+        return (int(ref), int(alt))
+    except (AttributeError, ValueError):
+        return (MISSING, MISSING)
+
+def extractRawContig(rawReader, chrom, sampleLabels, start=None, end=None):
+    '''
+    This function is VcfArrays.extractContig(...) on the raw record lines
+    @param rawReader - a RawVcfReader from openRawReader(...)
+    @param chrom - the contig to fetch, raises an exception if it has no records
+    @param sampleLabels - the column labels for the samples to extract
+    @param start - optional 0-based start, only records with start < POS are included
+    @param end - optional end, only records with POS <= end are included
+    @return - a ContigSites tuple with one row per site
+    '''
+    #sample i is in column 9+i, so splitting stops after the last requested sample
+    columns = [9+rawReader.samples.index(sampleLabel) for sampleLabel in sampleLabels]
+    maxSplit = max(columns)+1 if columns else 9
+
+    #FORMAT strings repeat, so the key positions are only looked up once per distinct FORMAT
+    formatKeys = {}
+
+    stats = activeStats()
+    if stats is not None:
+        parseStart = time.perf_counter()
+        decompressSeconds = stats.seconds('decompress')
+    multiallelic = 0
+
+    pos = array.array('i')
+    snv = array.array('b')
+    gt = array.array('b')
+    gq = array.array('i')
+    ad = array.array('i')
+    for l in rawReader.iterLines(chrom, start):
+        #CHROM, POS, ID, REF, ALT come first, check ALT before touching the samples
+        fixed = l.split(b'\t', 5)
+        if start is not None or end is not None:
+            recordPos = int(fixed[1])
+            if start is not None and recordPos <= start:
+                continue
+            if end is not None and recordPos > end:
+                break
+        if b',' in fixed[4]:
+            multiallelic += 1
+            continue
+
+        fields = l.split(b'\t', maxSplit)
+        keyIndices = formatKeys.get(fields[8])
+        if keyIndices is None:
+            formatList = fields[8].split(b':')
+            keyIndices = [formatList.index(key) if key in formatList else None for key in FORMAT_KEYS]
+            formatKeys[fields[8]] = keyIndices
+        gtIndex, gqIndex, adIndex = keyIndices
+
+        pos.append(int(fixed[1]))
+        snv.append(len(fixed[3]) == 1)
+        for c in columns:
+            #trailing keys may be dropped from a sample column, those are treated as absent
+            values = fields[c].rstrip(b'\r').split(b':') if c < len(fields) else []
+            numValues = len(values)
+            gt.append(GT_BYTE_CODES.get(values[gtIndex], GT_OTHER) if gtIndex is not None and gtIndex < numValues else GT_OTHER)
+            gq.append(parseRawQuality(values[gqIndex]) if gqIndex is not None and gqIndex < numValues else MISSING)
+            ad.extend(parseRawDepths(values[adIndex]) if adIndex is not None and adIndex < numValues else (MISSING, MISSING))
+
+    if stats is not None:
+        #the decompress time is already counted by Bgzf.iterRange(...)
+        stats.addTime('parse', time.perf_counter()-parseStart-(stats.seconds('decompress')-decompressSeconds))
+    countMultiallelic(multiallelic)
+    return packSites(pos, snv, gt, gq, ad, len(columns))
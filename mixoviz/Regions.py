@@ -0,0 +1,176 @@
+'''
+Splitting the work into regions smaller than a contig.  Contigs can be cut into shards of bounded size and/or restricted to the
+intervals of a BED file, each shard is scanned independently, and the per-shard results are merged back into one result per contig.
+Shards are run largest-first so a single big contig no longer sets the wall-clock time.
+
+A record belongs to a region when its POS falls inside it, so every record is in exactly one shard and merging the shards in order gives
+the same arrays as scanning the whole contig.
+'''
+
+import collections
+import multiprocessing
+import os
+
+from . import Bgzf
+from .RunStats import activeStats, runCollected
+
+#the tabix linear index has one entry per 16kb window
+LINEAR_SHIFT = 14
+
+#chrom - the contig name
+#start, end - the 0-based, half-open interval, end is None for the rest of the contig
+#cost - the estimated compressed bytes holding the region's records, only used for scheduling
+Region = collections.namedtuple('Region', ['chrom', 'start', 'end', 'cost'])
+
+def readRegionsBed(bedFN):
+    '''
+    This function loads a BED file of target regions, overlapping and adjacent intervals are merged
+    @param bedFN - the BED filename, only the first three columns are used
+    @return - a dictionary where key is the contig name and value is a sorted list of (start, end) intervals
+    '''
+    intervals = collections.OrderedDict()
+    with open(bedFN, 'r') as fp:
+        for l in fp:
+            fields = l.split()
+            if len(fields) < 3 or fields[0][0] == '#' or fields[0] in ('track', 'browser'):
+                continue
+            intervals.setdefault(fields[0], []).append((int(fields[1]), int(fields[2])))
+
+    ret = collections.OrderedDict()
+    for chrom, chromIntervals in intervals.items():
+        merged = []
+        for start, end in sorted(chromIntervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        ret[chrom] = merged
+    return ret
+
+def regionCost(contigIndex, start, end):
+    '''
+    @param contigIndex - the Bgzf.ContigIndex for the contig, may be None if it has no records
+    @param start - the 0-based start of the region
+    @param end - the end of the region, None for the rest of the contig
+    @return - the number of compressed bytes between the first records of the two linear index windows
+    '''
+    if contigIndex is None:
+        return 0
+    intervals = contigIndex.intervals
+
+    def virtualOffset(position):
+        if position is None or (position >> LINEAR_SHIFT) >= len(intervals):
+            return contigIndex.end
+        return max(intervals[position >> LINEAR_SHIFT], contigIndex.beg)
+
+    return max((virtualOffset(end) >> 16)-(virtualOffset(start) >> 16), 0)
+
+def planRegions(vcfFN, contigs, shardSize=None, regionsFN=None):
+    '''
+    This function decides the shards to scan for each contig
+    @param vcfFN - the VCF filename; region costs come from its tabix index (.tbi), without one they are the region lengths
+    @param contigs - dictionary where key is the contig name and value is its length from the VCF header (may be None)
+    @param shardSize - the largest shard in base pairs, None scans each region in one piece
+    @param regionsFN - optional BED file, only records inside its intervals are scanned and contigs without intervals are skipped
+    @return - a list of (chrom, regions) in contig order, where regions is the list of Region shards for that contig
+    '''
+    tbiFN = vcfFN+'.tbi'
+    tabixIndex = Bgzf.openTabixIndex(tbiFN) if os.path.exists(tbiFN) else None
+    targets = readRegionsBed(regionsFN) if regionsFN is not None else None
+
+    plan = []
+    for chrom, chromLen in contigs.items():
+        contigIndex = tabixIndex.get(chrom, None) if tabixIndex is not None else None
+
+        def cost(start, end):
+            if tabixIndex is not None:
+                return regionCost(contigIndex, start, end)
+            #BCF and .csi indexes are not parsed, so base pairs stand in for compressed bytes
+            return max((end if end is not None else chromLen or 0)-start, 0)
+
+        if targets is not None:
+            if not (chrom in targets):
+                continue
+            intervals = targets[chrom]
+        elif shardSize is None:
+            intervals = [(0, None)]
+        else:
+            if not chromLen and tabixIndex is not None:
+                #no length in the header, the linear index still covers every record
+                chromLen = len(contigIndex.intervals) << LINEAR_SHIFT if contigIndex is not None else 0
+            intervals = [(0, chromLen)]
+
+        regions = []
+        for start, end in intervals:
+            if shardSize is None or end is None:
+                regions.append(Region(chrom, start, end, cost(start, end)))
+                continue
+            for shardStart in range(start, end, shardSize):
+                shardEnd = min(shardStart+shardSize, end)
+                regions.append(Region(chrom, shardStart, shardEnd, cost(shardStart, shardEnd)))
+        if len(regions) == 0:
+            regions.append(Region(chrom, 0, 0, 0))
+        plan.append((chrom, regions))
+    return plan
+
+def runShard(job):
+    '''
+    @param job - tuple (shardIndex, func, region, collect, profile)
+    @return - tuple (shardIndex, func(region), stats) where stats is the shard's RunStats if collect is True, otherwise None
+    '''
+    shardIndex, func, region, collect, profile = job
+    if not collect:
+        return (shardIndex, func(region), None)
+    result, stats = runCollected(func, (region,), region.chrom, profile)
+    return (shardIndex, result, stats)
+
+def mapRegions(func, plan, threads, merge):
+    '''
+    This function runs a per-region function over every shard and merges the results back into one per contig
+    @param func - a picklable function taking a Region as its only argument, returning None if the region cannot be read
+    @param plan - the result of planRegions(...)
+    @param threads - the number of worker processes, 1 runs everything in this process
+    @param merge - a function taking the list of non-None shard results of a contig (in region order) and returning the contig result
+    @return - an iterator over the merged result for each contig in plan order, None if no shard of the contig could be read
+    '''
+    shards = []
+    for chromIndex, (chrom, regions) in enumerate(plan):
+        for region in regions:
+            shards.append((chromIndex, region))
+    results = [[] for chrom, regions in plan]
+    remaining = [len(regions) for chrom, regions in plan]
+
+    runStats = activeStats()
+    collect = runStats is not None
+    profile = collect and runStats.profile
+
+    def mergeContig(chromIndex):
+        shardResults = [result for shardIndex, result in sorted(results[chromIndex], key=lambda x: x[0]) if result is not None]
+        results[chromIndex] = None
+        return merge(shardResults) if len(shardResults) > 0 else None
+
+    if threads <= 1:
+        jobs = ((shardIndex, func, region, collect, False) for shardIndex, (chromIndex, region) in enumerate(shards))
+        completed = (runShard(job) for job in jobs)
+        pool = None
+    else:
+        #largest first, so the small shards fill in around the big ones at the end
+        order = sorted(range(0, len(shards)), key=lambda shardIndex: -shards[shardIndex][1].cost)
+        pool = multiprocessing.Pool(threads)
+        completed = pool.imap_unordered(runShard, [(shardIndex, func, shards[shardIndex][1], collect, profile) for shardIndex in order])
+
+    try:
+        nextChrom = 0
+        for shardIndex, result, stats in completed:
+            if stats is not None:
+                runStats.merge(stats)
+            chromIndex = shards[shardIndex][0]
+            results[chromIndex].append((shardIndex, result))
+            remaining[chromIndex] -= 1
+            while nextChrom < len(plan) and remaining[nextChrom] == 0:
+                yield mergeContig(nextChrom)
+                nextChrom += 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
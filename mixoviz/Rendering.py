@@ -0,0 +1,186 @@
+'''
+Shared drawing helpers for the B-allele figures, and a pool of render workers so figures can be drawn and saved in parallel with the
+scan and with each other.
+'''
+
+import multiprocessing
+import numpy as np
+import os
+import shutil
+import tempfile
+
+from .RunStats import activeStats, runCollected, timed
+
+def loadPyplot():
+    '''
+    matplotlib is only imported once the first figure is drawn, so importing the package and parsing arguments stays fast
+    @return - the matplotlib.pyplot module using the AGG backend and the classic style
+    '''
+    import matplotlib
+    matplotlib.use('AGG')
+    import matplotlib.style
+    matplotlib.style.use('classic')
+    import matplotlib.pyplot as plt
+    return plt
+
+def drawSites(ax, xs, ys, xmax, density=False):
+    '''
+    This function draws one point per site, either as the original alpha-blended scatter or as a binned density image.  The density
+    image is a 2D histogram with one bin per pixel of the axes, so the cost of drawing and saving it does not depend on the number of
+    sites.
+    @param ax - the matplotlib axes to draw on
+    @param xs - the positions of each site
+    @param ys - the B-allele frequency of each site, as a percentage
+    @param xmax - the right edge of the x-axis, usually the contig length
+    @param density - if True, draw a binned density image instead of a scatter
+    '''
+    if not density:
+        ax.scatter(xs, ys, alpha=.01)
+        return
+
+    if not xmax:
+        xmax = max(np.max(xs) if len(xs) > 0 else 0, 1)
+    extent = ax.get_window_extent()
+    bins = (max(int(extent.width), 1), max(int(extent.height), 1))
+    counts, xedges, yedges = np.histogram2d(xs, ys, bins=bins, range=[[0, xmax], [0, 100]])
+    drawCounts(ax, counts, 0, xmax)
+
+def drawCounts(ax, counts, x0, x1):
+    '''
+    This function draws binned site counts as a density image, the same way drawSites(...) does with density
+    @param ax - the matplotlib axes to draw on
+    @param counts - 2D array of site counts, rows are position bins and columns are B-allele frequency bins from 0 to 100%
+    @param x0 - the position of the left edge of the first bin
+    @param x1 - the position of the right edge of the last bin
+    '''
+    #empty bins are left transparent so the grid and background still show
+    counts = np.ma.masked_equal(counts.T, 0)
+    if counts.count() == 0:
+        return
+    import matplotlib.colors
+    ax.imshow(counts, origin='lower', extent=[x0, x1, 0, 100], aspect='auto', interpolation='nearest', cmap='Blues',
+        norm=matplotlib.colors.LogNorm(vmin=.2, vmax=max(counts.max(), 1)))
+
+class RenderPool(object):
+    '''
+    This class runs figure rendering functions on a pool of worker processes.  Array arguments are handed to the workers as
+    memory-mapped .npy files in a temporary directory rather than pickled, and each file is removed as soon as its figure is saved.
+    With a single thread the functions are simply called in this process.
+    '''
+    def __init__(self, threads=1):
+        '''
+        @param threads - the number of render worker processes, 1 renders in this process
+        '''
+        self.pool = None
+        self.tmpDir = None
+        self.pending = []
+        self.spillCount = 0
+        if threads > 1:
+            self.tmpDir = tempfile.mkdtemp(prefix='mixoviz-render-')
+            self.pool = multiprocessing.Pool(threads)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType is None:
+            self.close()
+        else:
+            self.terminate()
+        return False
+
+    def submit(self, func, *args, **kwargs):
+        '''
+        This function queues a figure to be rendered as func(*args, **kwargs), any numpy array argument (or list of arrays) is handed
+        to the worker through a spill file
+        @param func - a module-level function that draws and saves a figure
+        @param args - the positional arguments for func
+        @param kwargs - the keyword arguments for func
+        '''
+        if self.pool is None:
+            with timed('render'):
+                func(*args, **kwargs)
+        else:
+            args = [self.spill(value) for value in args]
+            kwargs = {key : self.spill(value) for key, value in kwargs.items()}
+            stats = activeStats()
+            if stats is None:
+                self.pending.append(self.pool.apply_async(renderSpilled, (func, args, kwargs)))
+            else:
+                self.pending.append(self.pool.apply_async(runCollected, (renderSpilled, (func, args, kwargs), stats.chrom, stats.profile)))
+
+    def spill(self, value):
+        '''
+        @param value - any argument to a render function
+        @return - a SpillFile (or list of them) if value is an array (or a non-empty list of arrays), otherwise value unchanged
+        '''
+        if isinstance(value, (list, tuple)) and len(value) > 0 and all(isinstance(v, np.ndarray) for v in value):
+            return [self.spill(v) for v in value]
+        if not isinstance(value, np.ndarray):
+            return value
+        fn = os.path.join(self.tmpDir, str(self.spillCount)+'.npy')
+        self.spillCount += 1
+        np.save(fn, value)
+        return SpillFile(fn)
+
+    def close(self):
+        '''
+        This function waits for every queued figure, any exception from a worker is raised here
+        '''
+        if self.pool is not None:
+            self.pool.close()
+            try:
+                stats = activeStats()
+                for result in self.pending:
+                    if stats is None:
+                        result.get()
+                    else:
+                        stats.merge(result.get()[1])
+            finally:
+                self.pool.join()
+                shutil.rmtree(self.tmpDir, ignore_errors=True)
+                self.pool = None
+
+    def terminate(self):
+        '''
+        This function stops the workers without waiting for queued figures
+        '''
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            shutil.rmtree(self.tmpDir, ignore_errors=True)
+            self.pool = None
+
+class SpillFile(str):
+    '''
+    The filename of an array written by RenderPool.spill(...), kept distinct from ordinary string arguments
+    '''
+    pass
+
+def loadSpilled(value, spillFNs):
+    '''
+    @param value - an argument from RenderPool.spill(...)
+    @param spillFNs - list that any spill filenames are appended to
+    @return - the argument with every SpillFile replaced by its memory-mapped array
+    '''
+    if isinstance(value, list) and len(value) > 0 and all(isinstance(v, SpillFile) for v in value):
+        return [loadSpilled(v, spillFNs) for v in value]
+    if not isinstance(value, SpillFile):
+        return value
+    spillFNs.append(value)
+    return np.load(value, mmap_mode='r')
+
+def renderSpilled(func, args, kwargs):
+    '''
+    This function runs in a render worker, it maps the spilled arrays, renders the figure, and removes the spill files
+    @param func - the function passed to RenderPool.submit(...)
+    @param args - the positional arguments from RenderPool.spill(...)
+    @param kwargs - the keyword arguments from RenderPool.spill(...)
+    '''
+    spillFNs = []
+    args = [loadSpilled(value, spillFNs) for value in args]
+    kwargs = {key : loadSpilled(value, spillFNs) for key, value in kwargs.items()}
+    with timed('render'):
+        func(*args, **kwargs)
+    for fn in spillFNs:
+        os.remove(fn)
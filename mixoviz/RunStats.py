@@ -0,0 +1,245 @@
+'''
+Optional run statistics for the --stats and --profile options.  When enabled, the scripts record the wall time spent in each stage and
+the number of sites seen and rejected for each reason, per contig, and write them as a JSON report.  Worker processes collect into their
+own RunStats and hand it back with their result, so the report covers the whole run.  When disabled, every hook returns immediately.
+
+Stages:
+    decompress - inflating BGZF blocks
+    parse - turning record lines into arrays, not including decompress
+    filter - the depth, quality, and genotype masks and the per-contig summaries
+    ratios - solving for the diploid fraction, including bootstrap replicates and windows
+    render - drawing and saving the figures
+
+Stage times are summed over every process, so with worker processes they can add up to more than the wall time.  Multi-allelic records
+are only counted when they are parsed, so contigs read from a --cache directory report none.
+'''
+
+import collections
+import contextlib
+import cProfile
+import json
+import numpy as np
+import pstats
+import sys
+import time
+
+#the reasons a site can be rejected, in the order they are checked
+REJECT_REASONS = ['multiallelic', 'indel', 'missing_gq', 'missing_ad', 'depth', 'quality', 'genotype']
+
+#the RunStats collecting for this process, None when statistics are disabled
+_active = None
+
+class RunStats(object):
+    '''
+    The stage times and site counts for one process, keyed on contig
+    '''
+    def __init__(self, profile=False):
+        '''
+        @param profile - if True, worker processes profile their work and return it with their statistics
+        '''
+        self.profile = profile
+        self.chrom = None
+        self.contigs = collections.OrderedDict()
+        self.profiles = []
+
+    def contigEntry(self, chrom):
+        '''
+        @param chrom - the contig name, None for work that is not tied to a contig
+        @return - the dictionary of stage times and counts for the contig
+        '''
+        if not (chrom in self.contigs):
+            self.contigs[chrom] = {'stages' : collections.OrderedDict(), 'sites' : 0, 'passed' : 0, 'rejected' : collections.OrderedDict()}
+        return self.contigs[chrom]
+
+    def addTime(self, stage, seconds):
+        '''
+        @param stage - the stage name
+        @param seconds - the time to add to the current contig
+        '''
+        stages = self.contigEntry(self.chrom)['stages']
+        stages[stage] = stages.get(stage, 0.0)+seconds
+
+    def seconds(self, stage):
+        '''
+        @param stage - the stage name
+        @return - the time spent in the stage so far on the current contig
+        '''
+        return self.contigEntry(self.chrom)['stages'].get(stage, 0.0)
+
+    def addSites(self, numSites, passed, rejected):
+        '''
+        @param numSites - the number of sites seen
+        @param passed - how many of them passed every filter
+        @param rejected - dictionary where key is the reason and value is the number of sites rejected for it
+        '''
+        entry = self.contigEntry(self.chrom)
+        entry['sites'] += numSites
+        entry['passed'] += passed
+        for reason, count in rejected.items():
+            entry['rejected'][reason] = entry['rejected'].get(reason, 0)+count
+
+    def merge(self, other):
+        '''
+        @param other - the RunStats from a worker to fold into this one
+        '''
+        for chrom, otherEntry in other.contigs.items():
+            entry = self.contigEntry(chrom)
+            for stage, seconds in otherEntry['stages'].items():
+                entry['stages'][stage] = entry['stages'].get(stage, 0.0)+seconds
+            entry['sites'] += otherEntry['sites']
+            entry['passed'] += otherEntry['passed']
+            for reason, count in otherEntry['rejected'].items():
+                entry['rejected'][reason] = entry['rejected'].get(reason, 0)+count
+        self.profiles += other.profiles
+
+    def report(self, wallSeconds):
+        '''
+        @param wallSeconds - the wall time of the whole run
+        @return - a JSON-serializable dictionary with the totals and one entry per contig
+        '''
+        def summarize(entries):
+            stages = collections.OrderedDict()
+            rejected = collections.OrderedDict((reason, 0) for reason in REJECT_REASONS)
+            sites = 0
+            passed = 0
+            for entry in entries:
+                for stage, seconds in entry['stages'].items():
+                    stages[stage] = stages.get(stage, 0.0)+seconds
+                for reason, count in entry['rejected'].items():
+                    rejected[reason] += count
+                sites += entry['sites']
+                passed += entry['passed']
+            return {'stages' : stages, 'sites' : sites, 'passed' : passed, 'rejected' : rejected}
+
+        ret = summarize(self.contigs.values())
+        ret['command'] = sys.argv
+        ret['wall_seconds'] = wallSeconds
+        ret['sites_per_sec'] = ret['sites']/wallSeconds if wallSeconds > 0 else None
+        ret['contigs'] = collections.OrderedDict()
+        for chrom, entry in self.contigs.items():
+            if chrom is None:
+                continue
+            contigReport = summarize([entry])
+            contigReport['seconds'] = sum(contigReport['stages'].values())
+            contigReport['sites_per_sec'] = contigReport['sites']/contigReport['seconds'] if contigReport['seconds'] > 0 else None
+            ret['contigs'][chrom] = contigReport
+        return ret
+
+class ProfileData(object):
+    '''
+    A cProfile result from a worker process, in the form pstats.Stats.add(...) accepts
+    '''
+    def __init__(self, stats):
+        '''
+        @param stats - the stats dictionary of a cProfile.Profile after create_stats()
+        '''
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+def activeStats():
+    '''
+    @return - the RunStats collecting for this process, or None if statistics are disabled
+    '''
+    return _active
+
+def setContig(chrom):
+    '''
+    @param chrom - the contig that the following work belongs to, None for work that is not tied to a contig
+    '''
+    if _active is not None:
+        _active.chrom = chrom
+
+@contextlib.contextmanager
+def timed(stage):
+    '''
+    This context manager adds the time spent inside it to a stage of the current contig
+    @param stage - the stage name
+    '''
+    stats = _active
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.addTime(stage, time.perf_counter()-start)
+
+def countRejects(numSites, failMasks):
+    '''
+    This function counts each site against the first filter it fails
+    @param numSites - the number of sites the masks cover
+    @param failMasks - list of (reason, mask) in the order the filters apply, where mask is True for the sites failing that filter
+    '''
+    if _active is None:
+        return
+    remaining = np.ones(numSites, dtype=bool)
+    rejected = collections.OrderedDict()
+    for reason, failing in failMasks:
+        failed = failing & remaining
+        rejected[reason] = int(np.count_nonzero(failed))
+        remaining &= ~failed
+    _active.addSites(numSites, int(np.count_nonzero(remaining)), rejected)
+
+def runCollected(func, args, chrom, profile):
+    '''
+    This function runs func(*args) with a fresh RunStats, it is how worker processes collect the statistics they send back
+    @param func - the function to run
+    @param args - the arguments for func
+    @param chrom - the contig the work belongs to
+    @param profile - if True, the call is also profiled
+    @return - tuple (result, stats) with the result of func and the RunStats collected while it ran
+    '''
+    global _active
+    previous = _active
+    _active = RunStats(profile)
+    _active.chrom = chrom
+    profiler = cProfile.Profile() if profile else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        result = func(*args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.create_stats()
+            _active.profiles.append(profiler.stats)
+        collected = _active
+        _active = previous
+    return (result, collected)
+
+@contextlib.contextmanager
+def instrumented(statsFN=None, profileFN=None):
+    '''
+    This context manager wraps a whole run for the --stats and --profile options, it does nothing if both are None
+    @param statsFN - if set, the JSON report is written here at the end of the run
+    @param profileFN - if set, a cProfile dump of this process and every worker is written here at the end of the run
+    '''
+    global _active
+    if statsFN is None and profileFN is None:
+        yield
+        return
+
+    _active = RunStats(profileFN is not None)
+    profiler = None
+    if profileFN is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wallSeconds = time.perf_counter()-start
+        stats = _active
+        _active = None
+        if profiler is not None:
+            profiler.disable()
+            profileStats = pstats.Stats(profiler)
+            for workerStats in stats.profiles:
+                profileStats.add(ProfileData(workerStats))
+            profileStats.dump_stats(profileFN)
+        if statsFN is not None:
+            with open(statsFN, 'w') as fp:
+                json.dump(stats.report(wallSeconds), fp, indent=2)
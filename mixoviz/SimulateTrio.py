@@ -0,0 +1,246 @@
+'''
+This module writes a synthetic trio VCF (bgzipped and tabix-indexed) for testing and benchmarking without patient data.  The proband is a
+mixture of diploid cells and triploid cells carrying both maternal haplotypes, so TrioMixoploid.py should recover the simulated diploid
+fraction (see "mixoviz simulate -h").
+'''
+
+import collections
+import numpy as np
+
+from .Bgzf import BgzfWriter, TabixBuilder
+from .Options import DEFAULT_LABELS
+from .SiteCache import loadContig, readHeader
+from .VcfArrays import FATHER, GT_LABELS, MOTHER, PROBAND
+
+#GRCh38 autosomes and chrX, used when no contig layout is given
+GRCH38_CONTIGS = collections.OrderedDict([
+    ('chr1', 248956422), ('chr2', 242193529), ('chr3', 198295559), ('chr4', 190214555), ('chr5', 181538259), ('chr6', 170805979),
+    ('chr7', 159345973), ('chr8', 145138636), ('chr9', 138394717), ('chr10', 133797422), ('chr11', 135086622), ('chr12', 133275309),
+    ('chr13', 114364328), ('chr14', 107043718), ('chr15', 101991189), ('chr16', 90338345), ('chr17', 83257441), ('chr18', 80373285),
+    ('chr19', 58617616), ('chr20', 64444167), ('chr21', 46709983), ('chr22', 50818468), ('chrX', 156040895)
+])
+
+#sites are generated and written in batches of this many records to bound memory
+BATCH_SIZE = 100000
+
+#genotype strings indexed by the number of alternate alleles
+GT_STRINGS = ['0/0', '0/1', '1/1']
+
+BASES = np.array(['A', 'C', 'G', 'T'])
+
+#the parameters of a simulation, see simulateTrio(...)
+SimParams = collections.namedtuple('SimParams', ['diploidFrac', 'depth', 'dispersion', 'errorRate', 'multiallelicRate', 'indelRate'])
+
+#the defaults from the command line
+DEFAULT_PARAMS = SimParams(0.7, 35, None, 0.001, 0.02, 0.1)
+
+def parseContigs(contigString):
+    '''
+    @param contigString - comma separated list of name:length pairs, or None for GRCH38_CONTIGS
+    @return - an OrderedDict where key is the contig name and value is its length
+    '''
+    if contigString is None:
+        return GRCH38_CONTIGS
+    contigs = collections.OrderedDict()
+    for item in contigString.split(','):
+        name, length = item.rsplit(':', 1)
+        contigs[name] = int(length)
+    return contigs
+
+def allocateSites(contigs, numSites):
+    '''
+    @param contigs - an OrderedDict where key is the contig name and value is its length
+    @param numSites - the total number of sites
+    @return - a list with the number of sites on each contig, proportional to length and summing to numSites
+    '''
+    lengths = np.array(list(contigs.values()), dtype='float64')
+    counts = np.floor(numSites*lengths/np.sum(lengths)).astype('int64')
+    #the remainder goes to the longest contigs
+    for i in np.argsort(-lengths)[0:numSites-int(np.sum(counts))]:
+        counts[i] += 1
+    return [min(int(count), length) for count, length in zip(counts, contigs.values())]
+
+def simulateCalls(rng, alleleFracs, params):
+    '''
+    @param rng - the numpy.random.Generator to draw from
+    @param alleleFracs - the true alternate allele fraction of each call
+    @param params - a SimParams tuple
+    @return - tuple (refDepths, altDepths, quals)
+    '''
+    n = len(alleleFracs)
+    if params.dispersion is None:
+        depths = rng.poisson(params.depth, n)
+    else:
+        depths = rng.negative_binomial(params.dispersion, params.dispersion/(params.dispersion+params.depth), n)
+    observed = alleleFracs*(1-params.errorRate)+(1-alleleFracs)*params.errorRate
+    altDepths = rng.binomial(depths, observed)
+    quals = np.minimum(99, (3*depths*rng.uniform(0.5, 1.0, n)).astype('int64'))
+    return (depths-altDepths, altDepths, quals)
+
+def simulateBatch(rng, chrom, positions, params):
+    '''
+    This function creates the VCF record lines for one batch of sites
+    @param rng - the numpy.random.Generator to draw from
+    @param chrom - the contig name
+    @param positions - the sorted 1-based positions of the sites
+    @param params - a SimParams tuple
+    @return - tuple (lines, refLengths), the record lines as bytes and the length of each REF allele
+    '''
+    n = len(positions)
+
+    #each parental haplotype carries the alternate allele with the site's population frequency
+    af = rng.uniform(0.05, 0.95, n)
+    father = rng.random((n, 2)) < af[:, np.newaxis]
+    mother = rng.random((n, 2)) < af[:, np.newaxis]
+
+    #diploid cells get one haplotype from each parent, triploid cells get the same paternal haplotype and both maternal haplotypes
+    paternal = father[np.arange(n), rng.integers(0, 2, n)]
+    maternal = mother[np.arange(n), rng.integers(0, 2, n)]
+    #the haplotypes are bool arrays, so they are counted as integers since adding two bool arrays is a logical or
+    p = params.diploidFrac
+    paternal = paternal.astype('int64')
+    maternal = maternal.astype('int64')
+    probandFracs = p*(paternal+maternal)/2.0+(1-p)*(paternal+np.sum(mother, axis=1))/3.0
+    probandGT = np.where(probandFracs == 0, 0, np.where(probandFracs == 1, 2, 1))
+
+    gtCounts = [probandGT, np.sum(father, axis=1), np.sum(mother, axis=1)]
+    fracs = [probandFracs, gtCounts[1]/2.0, gtCounts[2]/2.0]
+    calls = [simulateCalls(rng, memberFracs, params) for memberFracs in fracs]
+
+    #alleles, the extra ALT allele of a multi-allelic site has no reads
+    refIndices = rng.integers(0, 4, n)
+    refs = BASES[refIndices]
+    alts = BASES[(refIndices+rng.integers(1, 4, n)) % 4]
+    kinds = rng.random(n)
+    isMulti = kinds < params.multiallelicRate
+    isIndel = (kinds >= params.multiallelicRate) & (kinds < params.multiallelicRate+params.indelRate)
+    isDeletion = isIndel & (rng.random(n) < 0.5)
+    indelSizes = rng.integers(1, 4, n)
+    insertions = BASES[rng.integers(0, 4, (n, 3))]
+
+    lines = []
+    refLengths = []
+    for i in range(0, n):
+        ref = refs[i]
+        alt = alts[i]
+        if isDeletion[i]:
+            ref = ref+''.join(insertions[i, 0:indelSizes[i]])
+            alt = refs[i]
+        elif isIndel[i]:
+            alt = ref+''.join(insertions[i, 0:indelSizes[i]])
+        extraAD = ''
+        if isMulti[i]:
+            alt = alt+','+BASES[(refIndices[i]+2) % 4] if alt != BASES[(refIndices[i]+2) % 4] else alt+','+BASES[(refIndices[i]+3) % 4]
+            extraAD = ',0'
+
+        samples = []
+        for gtCount, (refDepths, altDepths, quals) in zip(gtCounts, calls):
+            samples.append(GT_STRINGS[gtCount[i]]+':'+str(refDepths[i])+','+str(altDepths[i])+extraAD+':'+str(refDepths[i]+altDepths[i])+
+                ':'+str(quals[i]))
+        lines.append(('\t'.join([chrom, str(positions[i]), '.', ref, alt, '50', 'PASS', '.', 'GT:AD:DP:GQ']+samples)+'\n').encode())
+        refLengths.append(len(ref))
+    return (lines, refLengths)
+
+def simulateTrio(outFN, numSites, contigs=None, params=None, sampleLabels=None, seed=0):
+    '''
+    This function writes a bgzipped trio VCF and its tabix index (<outFN>.tbi)
+    @param outFN - the VCF filename to write (.vcf.gz)
+    @param numSites - the total number of records, spread over the contigs in proportion to their length
+    @param contigs - an OrderedDict where key is the contig name and value is its length, None uses GRCH38_CONTIGS
+    @param params - a SimParams tuple, None uses the defaults from the command line
+    @param sampleLabels - the (proband, father, mother) column labels, None uses DEFAULT_LABELS
+    @param seed - the random seed, the same arguments and seed always give the same file
+    @return - the number of records written
+    '''
+    if contigs is None:
+        contigs = GRCH38_CONTIGS
+    if params is None:
+        params = DEFAULT_PARAMS
+    if sampleLabels is None:
+        sampleLabels = DEFAULT_LABELS
+    rng = np.random.default_rng(seed)
+
+    header = ['##fileformat=VCFv4.2', '##source=SimulateTrio.py']
+    for key, value in params._asdict().items():
+        header.append('##simulation_'+key+'='+str(value))
+    header.append('##simulation_seed='+str(seed))
+    header.append('##FILTER=<ID=PASS,Description="All filters passed">')
+    header.append('##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">')
+    header.append('##FORMAT=<ID=AD,Number=R,Type=Integer,Description="Allelic depths for the ref and alt alleles in the order listed">')
+    header.append('##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Approximate read depth">')
+    header.append('##FORMAT=<ID=GQ,Number=1,Type=Integer,Description="Genotype Quality">')
+    for chrom, chromLen in contigs.items():
+        header.append('##contig=<ID='+chrom+',length='+str(chromLen)+'>')
+    header.append('\t'.join(['#CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO', 'FORMAT']+list(sampleLabels)))
+
+    numRecords = 0
+    tabixBuilder = TabixBuilder()
+    with open(outFN, 'wb') as fp:
+        writer = BgzfWriter(fp)
+        writer.write(('\n'.join(header)+'\n').encode())
+        for (chrom, chromLen), chromSites in zip(contigs.items(), allocateSites(contigs, numSites)):
+            positions = np.sort(rng.choice(chromLen, chromSites, replace=False))+1
+            for start in range(0, chromSites, BATCH_SIZE):
+                batch = positions[start:start+BATCH_SIZE]
+                lines, refLengths = simulateBatch(rng, chrom, batch, params)
+                for pos, refLength, l in zip(batch.tolist(), refLengths, lines):
+                    vbeg = writer.tell()
+                    writer.write(l)
+                    tabixBuilder.add(chrom, pos-1, pos-1+refLength, vbeg, writer.tell())
+                numRecords += len(lines)
+        writer.close()
+    tabixBuilder.write(outFN+'.tbi')
+    return numRecords
+
+def expectedBaf(fatherGT, motherGT, params):
+    '''
+    @param fatherGT - the number of alternate alleles in the father's genotype
+    @param motherGT - the number of alternate alleles in the mother's genotype
+    @param params - a SimParams tuple
+    @return - the mean proband B-allele frequency simulateBatch(...) gives sites with these parental genotypes
+    '''
+    #each transmitted haplotype carries the alternate allele with chance GT/2, the triploid cells carry both maternal haplotypes
+    p = params.diploidFrac
+    alleleFrac = p*(fatherGT/2.0+motherGT/2.0)/2.0+(1-p)*(fatherGT/2.0+motherGT)/3.0
+    return alleleFrac*(1-params.errorRate)+(1-alleleFrac)*params.errorRate
+
+def checkSimulation(vcfFN, params, sampleLabels=None):
+    '''
+    This function reads a simulated VCF back and compares the mean proband B-allele frequency of every pair of parental genotypes to
+    expectedBaf(...), so a broken simulation is caught even when the informative 0/0 and 1/1 sites still look right
+    @param vcfFN - a VCF written by simulateTrio(...)
+    @param params - the SimParams tuple it was written with
+    @param sampleLabels - the (proband, father, mother) column labels, None uses DEFAULT_LABELS
+    @return - list of (fatherGT, motherGT, sites, meanBaf, expected, passed) with one entry per pair of GT strings, meanBaf is None
+        when there are too few sites and passed is False when the mean is more than four standard errors (plus a small allowance) from
+        the expected value
+    '''
+    if sampleLabels is None:
+        sampleLabels = DEFAULT_LABELS
+    contigs, samples = readHeader(vcfFN)
+    sums = np.zeros((3, 3))
+    squares = np.zeros((3, 3))
+    counts = np.zeros((3, 3), dtype='int64')
+    for chrom in contigs:
+        sites = loadContig(vcfFN, chrom, list(sampleLabels))
+        depths = sites.ad[:, PROBAND, :].sum(axis=1)
+        keep = (depths > 0) & (sites.gt[:, FATHER] >= 0) & (sites.gt[:, MOTHER] >= 0)
+        bafs = 1.0*sites.ad[keep, PROBAND, 1]/depths[keep]
+        classes = 3*sites.gt[keep, FATHER].astype('int64')+sites.gt[keep, MOTHER]
+        sums += np.bincount(classes, bafs, minlength=9).reshape(3, 3)
+        squares += np.bincount(classes, bafs*bafs, minlength=9).reshape(3, 3)
+        counts += np.bincount(classes, minlength=9).reshape(3, 3)
+
+    ret = []
+    for fatherGT in range(0, 3):
+        for motherGT in range(0, 3):
+            n = counts[fatherGT, motherGT]
+            expected = expectedBaf(fatherGT, motherGT, params)
+            if n < 2:
+                ret.append((GT_LABELS[fatherGT], GT_LABELS[motherGT], int(n), None, expected, True))
+                continue
+            mean = sums[fatherGT, motherGT]/n
+            variance = max(squares[fatherGT, motherGT]/n-mean*mean, 0.0)*n/(n-1)
+            passed = abs(mean-expected) <= 4*np.sqrt(variance/n)+0.005
+            ret.append((GT_LABELS[fatherGT], GT_LABELS[motherGT], int(n), float(mean), expected, bool(passed)))
+    return ret
@@ -0,0 +1,309 @@
+'''
+Optional on-disk cache of the unfiltered per-site arrays produced by the VcfReaders backends.  Each contig is stored as a set of
+.npy files that are memory-mapped on load, so re-running the scripts with different depth/quality thresholds never has to open the VCF.
+
+Layout of a cache directory:
+    <cacheDir>/<sha1 of the VCF path>/header.json - contigs, samples and the size/mtime of the VCF and its index
+    <cacheDir>/<sha1 of the VCF path>/<contig>/manifest.json - samples stored, site count and a fingerprint of the contig's records
+    <cacheDir>/<sha1 of the VCF path>/<contig>/{pos,snv,gt,gq,ad}.npy - the ContigSites arrays
+
+The manifest is always written last, so an entry without one is partial and gets rebuilt.  When the VCF or index changes, each contig's
+records are re-hashed (BGZF decode only, no VCF parsing) and only the contigs whose records changed are re-extracted.  Files with a .csi
+index instead of a tabix index (including BCF) are not hashed, every contig is re-extracted when they change.
+'''
+
+import collections
+import hashlib
+import json
+import numpy as np
+import os
+import urllib.parse
+
+from . import Bgzf
+from .Lru import MAX_OPEN_FILES, LruCache, fileStamp
+from .VcfArrays import ContigSites, MissingContig, sliceSites
+from .VcfReaders import indexFilename, openVcf
+
+#bump this whenever the layout or the meaning of the stored arrays changes
+CACHE_VERSION = 1
+
+#the arrays stored for each contig, in ContigSites order
+ARRAY_NAMES = ContigSites._fields
+
+#caches opened by openCache(...), keyed on (cacheDir, file stamp, pid) like VcfArrays.openReader(...)
+_caches = LruCache(MAX_OPEN_FILES)
+
+#site arrays kept in memory by loadRegion(...) and loadContig(...), bounded by bytes and empty unless setMemoryLimit(...) is called
+_memory = LruCache(0, lambda sites: sum(values.nbytes for values in sites))
+
+def writeJson(fn, value):
+    '''
+    Writes a JSON file atomically so readers never see a partial file
+    @param fn - the filename to write
+    @param value - the JSON-serializable value
+    '''
+    tmpFN = fn+'.tmp'+str(os.getpid())
+    with open(tmpFN, 'w') as fp:
+        json.dump(value, fp)
+    os.replace(tmpFN, fn)
+
+def readJson(fn):
+    '''
+    @param fn - the filename to read
+    @return - the parsed JSON value, or None if the file is absent or unreadable
+    '''
+    try:
+        with open(fn, 'r') as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+class SiteCache(object):
+    '''
+    The cache entries for a single VCF file
+    '''
+    def __init__(self, cacheDir, vcfFN):
+        '''
+        @param cacheDir - the top-level cache directory, created if needed
+        @param vcfFN - the VCF filename, a bgzipped VCF or BCF with a .tbi or .csi index
+        '''
+        self.vcfFN = vcfFN
+        self.indexFN = indexFilename(vcfFN)
+        self.cacheDir = os.path.join(cacheDir, hashlib.sha1(os.path.abspath(vcfFN).encode()).hexdigest())
+        if not os.path.exists(self.cacheDir):
+            os.makedirs(self.cacheDir)
+
+        #the stamp changes whenever the VCF or its index is rewritten
+        vcfStat = os.stat(vcfFN)
+        indexStat = os.stat(self.indexFN)
+        self.stamp = [CACHE_VERSION, os.path.abspath(vcfFN), vcfStat.st_size, vcfStat.st_mtime_ns, indexStat.st_size, indexStat.st_mtime_ns]
+
+        headerFN = os.path.join(self.cacheDir, 'header.json')
+        header = readJson(headerFN)
+        if header is None or header['stamp'] != self.stamp:
+            vcfReader = openVcf(vcfFN)
+            header = {
+                'stamp' : self.stamp,
+                'contigs' : list(vcfReader.contigs.items()),
+                'samples' : vcfReader.samples
+            }
+            writeJson(headerFN, header)
+
+        self.contigs = collections.OrderedDict((chrom, length) for chrom, length in header['contigs'])
+        self.samples = header['samples']
+        self.tabixIndex = None
+        self.fingerprints = {}
+
+    def contigDir(self, chrom):
+        '''
+        @param chrom - the contig name
+        @return - the directory holding this contig's entry
+        '''
+        return os.path.join(self.cacheDir, urllib.parse.quote(chrom, safe=''))
+
+    def fingerprint(self, chrom):
+        '''
+        This function hashes the uncompressed records for a contig, it only needs BGZF decoding and is independent of where the contig
+        sits in the file
+        @param chrom - the contig name
+        @return - the hex digest, or None if the contig has no records in the tabix index
+        '''
+        if chrom in self.fingerprints:
+            return self.fingerprints[chrom]
+        if not self.indexFN.endswith('.tbi'):
+            #.csi indexes are not parsed, so the fingerprint only matches while the file is unchanged
+            return hashlib.sha1(json.dumps(self.stamp+[chrom]).encode()).hexdigest()
+        if self.tabixIndex is None:
+            self.tabixIndex = Bgzf.openTabixIndex(self.indexFN)
+        if not (chrom in self.tabixIndex):
+            self.fingerprints[chrom] = None
+            return None
+
+        contigIndex = self.tabixIndex[chrom]
+        digest = hashlib.sha1()
+        with open(self.vcfFN, 'rb') as fp:
+            for data in Bgzf.iterRange(fp, contigIndex.beg, contigIndex.end):
+                digest.update(data)
+        self.fingerprints[chrom] = digest.hexdigest()
+        return self.fingerprints[chrom]
+
+    def isValid(self, manifest, sampleLabels):
+        '''
+        @param manifest - the parsed manifest.json for a contig, may be None
+        @param sampleLabels - the samples the caller needs
+        @return - True if the entry holds every requested sample and matches the current VCF
+        '''
+        if manifest is None or not all(sampleLabel in manifest['samples'] for sampleLabel in sampleLabels):
+            return False
+        if manifest['stamp'] == self.stamp:
+            return True
+
+        #the file changed, but this contig's records might not have
+        if manifest['fingerprint'] != self.fingerprint(manifest['chrom']):
+            return False
+        manifest['stamp'] = self.stamp
+        writeJson(os.path.join(self.contigDir(manifest['chrom']), 'manifest.json'), manifest)
+        return True
+
+    def rebuild(self, chrom, sampleLabels):
+        '''
+        This function extracts a contig from the VCF and replaces its cache entry
+        @param chrom - the contig name
+        @param sampleLabels - the samples to store
+        @return - the new manifest
+        '''
+        contigDir = self.contigDir(chrom)
+        manifestFN = os.path.join(contigDir, 'manifest.json')
+        if not os.path.exists(contigDir):
+            os.makedirs(contigDir)
+        if os.path.exists(manifestFN):
+            os.remove(manifestFN)
+
+        manifest = {
+            'chrom' : chrom,
+            'stamp' : self.stamp,
+            'fingerprint' : self.fingerprint(chrom),
+            'samples' : sampleLabels
+        }
+        sites = None
+        if manifest['fingerprint'] is not None:
+            try:
+                sites = openVcf(self.vcfFN).extract(chrom, sampleLabels)
+            except MissingContig:
+                if self.indexFN.endswith('.tbi'):
+                    raise
+                #without a tabix index it is the reader that finds the contig has no records
+        if sites is None:
+            #nothing to fetch for this contig, remember that so we don't try again
+            manifest['missing'] = True
+        else:
+            for name, values in zip(ARRAY_NAMES, sites):
+                tmpFN = os.path.join(contigDir, name+'.tmp'+str(os.getpid())+'.npy')
+                np.save(tmpFN, values)
+                os.replace(tmpFN, os.path.join(contigDir, name+'.npy'))
+            manifest['sites'] = len(sites.pos)
+
+        writeJson(manifestFN, manifest)
+        return manifest
+
+    def load(self, chrom, sampleLabels):
+        '''
+        This function returns the arrays for a contig, rebuilding the entry first if it is absent, partial, or stale
+        @param chrom - the contig name
+        @param sampleLabels - the column labels for the samples to extract
+        @return - a ContigSites tuple with the sample columns in the requested order; raises MissingContig if the contig has no records
+        '''
+        manifest = readJson(os.path.join(self.contigDir(chrom), 'manifest.json'))
+        if not self.isValid(manifest, sampleLabels):
+            #keep any samples that were already stored so different scripts can share the entry
+            storedLabels = list(manifest['samples']) if manifest is not None else []
+            manifest = self.rebuild(chrom, storedLabels+[s for s in sampleLabels if not (s in storedLabels)])
+
+        if manifest.get('missing', False):
+            raise MissingContig(chrom, self.vcfFN)
+
+        arrays = [np.load(os.path.join(self.contigDir(chrom), name+'.npy'), mmap_mode='r') for name in ARRAY_NAMES]
+        if any(values.shape[0] != manifest['sites'] for values in arrays):
+            #someone else left this entry half-written
+            manifest = self.rebuild(chrom, manifest['samples'])
+            arrays = [np.load(os.path.join(self.contigDir(chrom), name+'.npy'), mmap_mode='r') for name in ARRAY_NAMES]
+
+        pos, snv, gt, gq, ad = arrays
+        if manifest['samples'] != sampleLabels:
+            columns = [manifest['samples'].index(sampleLabel) for sampleLabel in sampleLabels]
+            gt = gt[:, columns]
+            gq = gq[:, columns]
+            ad = ad[:, columns]
+        return ContigSites(pos, snv, gt, gq, ad)
+
+def openCache(cacheDir, vcfFN):
+    '''
+    @param cacheDir - the top-level cache directory
+    @param vcfFN - the VCF filename
+    @return - a SiteCache for the file, reused across calls within the same process
+    '''
+    k = (cacheDir, fileStamp(vcfFN), os.getpid())
+    siteCache = _caches.get(k)
+    if siteCache is None:
+        siteCache = _caches.put(k, SiteCache(cacheDir, vcfFN))
+    return siteCache
+
+def setMemoryLimit(maxBytes):
+    '''
+    This function keeps the most recently loaded site arrays in memory so repeated loads of the same region skip the VCF and the
+    on-disk cache, it is meant for long-running processes (see JobServer.py)
+    @param maxBytes - the most bytes of arrays to keep, 0 turns the memory cache off
+    '''
+    _memory.resize(maxBytes)
+
+def memoryStats():
+    '''
+    @return - the LruCache.stats() of the in-memory site arrays
+    '''
+    return _memory.stats()
+
+def rememberSites(vcfFN, k, load):
+    '''
+    @param vcfFN - the VCF filename, its file stamp is part of the key
+    @param k - the rest of the key, the region and samples that were loaded
+    @param load - a function that loads the ContigSites when they are not in memory
+    @return - the ContigSites, the arrays are read-only when they are shared through the memory cache
+    '''
+    if _memory.maxSize == 0:
+        return load()
+    k = (fileStamp(vcfFN),)+k
+    sites = _memory.get(k)
+    if sites is None:
+        sites = load()
+        for values in sites:
+            values.flags.writeable = False
+        _memory.put(k, sites)
+    return sites
+
+def readHeader(vcfFN, cacheDir=None):
+    '''
+    @param vcfFN - the VCF filename, see VcfReaders.openVcf(...) for the formats each reader handles
+    @param cacheDir - optional cache directory, if set the header comes from the cache when it is current
+    @return - tuple (contigs, samples)
+        contigs - an OrderedDict where key is the contig name and value is its length from the header (may be None)
+        samples - the sample column labels
+    '''
+    if cacheDir is None:
+        vcfReader = openVcf(vcfFN)
+        return (vcfReader.contigs, vcfReader.samples)
+    siteCache = openCache(cacheDir, vcfFN)
+    return (siteCache.contigs, siteCache.samples)
+
+def loadRegion(vcfFN, region, sampleLabels, cacheDir=None):
+    '''
+    @param vcfFN - the VCF filename, see VcfReaders.openVcf(...) for the formats each reader handles
+    @param region - the Regions.Region to load, raises VcfArrays.MissingContig if the contig has no records
+    @param sampleLabels - the column labels for the samples to extract
+    @param cacheDir - optional cache directory, if set the whole contig is cached and the region is sliced from it
+    @return - a ContigSites tuple with the records whose POS is inside the region
+    '''
+    def load():
+        '''
+        Reads the region from the VCF or the on-disk cache
+        '''
+        if cacheDir is None:
+            return openVcf(vcfFN).extract(region.chrom, sampleLabels, region.start, region.end)
+        return sliceSites(openCache(cacheDir, vcfFN).load(region.chrom, sampleLabels), region.start, region.end)
+    return rememberSites(vcfFN, (region.chrom, region.start, region.end, tuple(sampleLabels)), load)
+
+def loadContig(vcfFN, chrom, sampleLabels, cacheDir=None):
+    '''
+    @param vcfFN - the VCF filename, see VcfReaders.openVcf(...) for the formats each reader handles
+    @param chrom - the contig to load, raises VcfArrays.MissingContig if it has no records
+    @param sampleLabels - the column labels for the samples to extract
+    @param cacheDir - optional cache directory, if set the arrays are read from (and saved to) the cache
+    @return - a ContigSites tuple
+    '''
+    def load():
+        '''
+        Reads the contig from the VCF or the on-disk cache
+        '''
+        if cacheDir is None:
+            return openVcf(vcfFN).extract(chrom, sampleLabels)
+        return openCache(cacheDir, vcfFN).load(chrom, sampleLabels)
+    return rememberSites(vcfFN, (chrom, None, None, tuple(sampleLabels)), load)
@@ -0,0 +1,182 @@
+'''
+This module runs the TrioMixoploid.py calculation for a grid of depth and quality thresholds from a single scan of the VCF (see
+"mixoviz trio-mixoploid --sweep").  Each informative site keeps the lowest depth and the lowest quality of the three trio calls, so the
+site passes a pair of thresholds exactly when every call would have passed them in a separate run, and every grid cell is a mask over
+the same arrays.
+'''
+
+import dataclasses
+import functools
+import numpy as np
+import sys
+
+from .Regions import mapRegions, planRegions
+from .RunStats import timed
+from .SiteCache import loadRegion, readHeader
+from .TrioMixoploid import depthSummaries, informativeMasks, mergeSummaries, printRatioHeader, ratioColumns, ratioRows
+from .VcfArrays import MISSING, MissingContig, PROBAND, totalDepth
+
+def sweepRegion(vcfFN, proband, father, mother, grid, cacheDir, bins, region):
+    '''
+    This function reads a region once and gathers the informative calls for every pair of thresholds, it is run in a worker process when
+    threads are used
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param grid - list of (MIN_DEPTH, MIN_QUALITY) pairs
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param bins - the number of BAF histogram bins for the medians, None keeps every frequency for exact medians
+    @param region - the Regions.Region to scan
+    @return - list with one TrioMixoploid.depthSummaries(...) tuple per pair in grid, or None if the contig has no records
+    '''
+    try:
+        sites = loadRegion(vcfFN, region, [proband, father, mother], cacheDir)
+    except MissingContig:
+        return None
+
+    with timed('filter'):
+        #no thresholds keeps every informative site, as before a missing GQ counts as a quality of 0 and a missing AD as a depth of 0
+        mask0011, mask1100 = informativeMasks(sites, 0, 0)
+        minDepths = totalDepth(sites).min(axis=1)
+        minQuals = np.where(sites.gq == MISSING, 0, sites.gq).min(axis=1)
+        informative = [(minDepths[mask], minQuals[mask], sites.ad[mask, PROBAND, 0], sites.ad[mask, PROBAND, 1])
+            for mask in [mask0011, mask1100]]
+
+        ret = []
+        for MIN_DEPTH, MIN_QUALITY in grid:
+            depths = ()
+            for siteDepths, siteQuals, refDepths, altDepths in informative:
+                passing = (siteDepths >= MIN_DEPTH) & (siteQuals >= MIN_QUALITY)
+                depths += (refDepths[passing], altDepths[passing])
+            ret.append(depthSummaries(depths, bins))
+        return ret
+
+def mergeSweepSummaries(results):
+    '''
+    @param results - a list of sweepRegion(...) results for consecutive regions of a contig
+    @return - one sweepRegion(...) result covering all of the regions
+    '''
+    return [mergeSummaries([result[i] for result in results]) for i in range(0, len(results[0]))]
+
+def sweepTrioBiallelic(vcfFN, proband, father, mother, depths, qualities, threads=1, cacheDir=None, bins=None, bootstrap=0, seed=0,
+    shardSize=None, regionsFN=None):
+    '''
+    This function scans the VCF once and performs the calculations for every combination of thresholds, SweepTable.write() prints them
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param depths - the minimum depths to try
+    @param qualities - the minimum qualities to try
+    @param threads - the number of worker processes used to scan contigs in parallel
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param bins - the number of BAF histogram bins for the medians, None keeps every frequency for exact medians
+    @param bootstrap - the number of bootstrap replicates for the confidence intervals, 0 skips them
+    @param seed - the random seed for the bootstrap replicates, each pair of thresholds uses the same seed
+    @param shardSize - the largest region scanned by one worker in base pairs, None scans whole contigs (see Regions.py)
+    @param regionsFN - optional BED file, only the records inside its regions are used
+    @return - a SweepTable with the TrioMixoploid.py rows of every pair of thresholds
+    '''
+    #get the chromosomes we plan to go through
+    contigs, samples = readHeader(vcfFN, cacheDir)
+    plan = planRegions(vcfFN, contigs, shardSize, regionsFN)
+    chromList = [chrom for chrom, regions in plan]
+    for sampleLabel in [proband, father, mother]:
+        if (sampleLabel not in samples):
+            raise Exception('Missing required column "'+sampleLabel+'" in VCF file: '+vcfFN)
+    if len(depths) == 0 or len(qualities) == 0:
+        raise Exception('The sweep needs at least one depth and one quality')
+
+    #iterate through the VCF, each region is handled by sweepRegion(...)
+    grid = [(MIN_DEPTH, MIN_QUALITY) for MIN_DEPTH in depths for MIN_QUALITY in qualities]
+    summaries = [[] for pair in grid]
+    worker = functools.partial(sweepRegion, vcfFN, proband, father, mother, grid, cacheDir, bins)
+    for chrom, result in zip(chromList, mapRegions(worker, plan, threads, mergeSweepSummaries)):
+        for i in range(0, len(grid)):
+            summaries[i].append(None if result is None else result[i])
+
+    rows = []
+    for (MIN_DEPTH, MIN_QUALITY), pairSummaries in zip(grid, summaries):
+        for rowValues in ratioRows(chromList, pairSummaries, bins, bootstrap, seed):
+            rows.append([MIN_DEPTH, MIN_QUALITY]+rowValues)
+    return SweepTable(['min_depth', 'min_quality']+ratioColumns(bins, bootstrap), rows, list(depths), list(qualities), bins, bootstrap,
+        seed)
+
+@dataclasses.dataclass
+class SweepTable:
+    '''
+    The result of sweepTrioBiallelic(...), a long-format table with the TrioMixoploid.py rows of each pair of thresholds grouped together
+    '''
+    columns: list
+    rows: list
+    depths: list
+    qualities: list
+    bins: int = None
+    bootstrap: int = 0
+    seed: int = 0
+
+    def value(self, MIN_DEPTH, MIN_QUALITY, chrom='autosomes', column='diploid_frac'):
+        '''
+        @param MIN_DEPTH - one of the swept depths
+        @param MIN_QUALITY - one of the swept qualities
+        @param chrom - the contig name without any "chr" prefix, or 'autosomes' for the final row
+        @param column - the column to return
+        @return - the value, None if the contig is not in the table
+        '''
+        for rowValues in self.rows:
+            if rowValues[0:3] == [MIN_DEPTH, MIN_QUALITY, chrom]:
+                return rowValues[self.columns.index(column)]
+        return None
+
+    def write(self, fp=None):
+        '''
+        This function prints the table in the TSV format of TrioMixoploid.py with the two threshold columns in front
+        @param fp - the file handle to print to (default: STDOUT)
+        '''
+        if fp is None:
+            fp = sys.stdout
+        printRatioHeader(', '.join([str(x) for x in self.depths]), ', '.join([str(x) for x in self.qualities]), fp, self.bins,
+            self.bootstrap, self.seed)
+        print('##min_depth, min_quality - the thresholds of the row, rows for each pair of thresholds are grouped together', file=fp)
+        print('#'+'\t'.join(self.columns), file=fp)
+        for rowValues in self.rows:
+            print('\t'.join([str(x) for x in rowValues]), file=fp)
+
+def plotSweepHeatmap(table, outFN, chrom='autosomes', dpi=None):
+    '''
+    This function draws the diploid fraction of one row for every pair of thresholds as a heatmap
+    @param table - a SweepTable from sweepTrioBiallelic(...)
+    @param outFN - the image filename, the format comes from the extension
+    @param chrom - the contig name without any "chr" prefix, or 'autosomes' for the final row
+    @param dpi - the resolution of the saved image, None uses the matplotlib default
+    '''
+    from .Rendering import loadPyplot
+
+    values = np.full((len(table.qualities), len(table.depths)), np.nan)
+    for i, MIN_QUALITY in enumerate(table.qualities):
+        for j, MIN_DEPTH in enumerate(table.depths):
+            value = table.value(MIN_DEPTH, MIN_QUALITY, chrom)
+            if value is not None and value != '--':
+                values[i, j] = value
+
+    plt = loadPyplot()
+    f, ax = plt.subplots(1, 1)
+    f.set_figheight(1.5+.6*len(table.qualities))
+    f.set_figwidth(2.5+.9*len(table.depths))
+    image = ax.imshow(np.ma.masked_invalid(values), origin='lower', aspect='auto', interpolation='nearest', cmap='viridis')
+    f.colorbar(image, ax=ax, label='diploid_frac')
+    for i in range(0, len(table.qualities)):
+        for j in range(0, len(table.depths)):
+            label = '--' if np.isnan(values[i, j]) else '%.3f' % values[i, j]
+            ax.text(j, i, label, horizontalalignment='center', verticalalignment='center', color='white')
+    ax.set_xticks(range(0, len(table.depths)))
+    ax.set_xticklabels([str(x) for x in table.depths])
+    ax.set_yticks(range(0, len(table.qualities)))
+    ax.set_yticklabels([str(x) for x in table.qualities])
+    ax.set_xlabel('Minimum depth')
+    ax.set_ylabel('Minimum quality')
+    ax.set_title('diploid_frac ['+chrom+']')
+    f.tight_layout()
+    plt.savefig(outFN, dpi=dpi)
+    plt.close(f)
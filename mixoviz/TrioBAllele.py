@@ -0,0 +1,449 @@
+'''
+This module creates a 3x3 multiplot of bi-allelic sites in a trio, one figure per chromosome (see "mixoviz trio-ballele -h").
+'''
+
+import dataclasses
+import functools
+import numpy as np
+import os
+import shutil
+import sys
+import tempfile
+
+from .Rendering import RenderPool, drawSites, loadPyplot
+from .Regions import mapRegions, planRegions
+from .RunStats import activeStats, countRejects, setContig, timed
+from .SiteCache import loadRegion, readHeader
+from .TrioMixoploid import readWindowTrack
+from .VcfArrays import FATHER, GT_LABELS, GT_OTHER, MOTHER, MissingContig, PROBAND, parentalMask, trioPassMask, trioRejectMasks
+
+def splitRegion(vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, cacheDir, region):
+    '''
+    This function gathers the passing calls for a single region split by parental genotypes, it is run in a worker process when threads
+    are used
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param region - the Regions.Region to scan
+    @return - dictionary where key is (patGT, matGT) and value is a tuple (positions, proband ref depths, proband alt depths), only
+        non-empty combinations are included; None if the contig has no records
+    '''
+    try:
+        sites = loadRegion(vcfFN, region, [proband, father, mother], cacheDir)
+    except MissingContig:
+        return None
+    with timed('filter'):
+        if activeStats() is not None:
+            otherGT = (sites.gt[:, FATHER] == GT_OTHER) | (sites.gt[:, MOTHER] == GT_OTHER)
+            countRejects(len(sites.pos), trioRejectMasks(sites, MIN_DEPTH, MIN_QUALITY)+[('genotype', otherGT)])
+        return splitSites(sites, MIN_DEPTH, MIN_QUALITY)
+
+def mergeSplits(splits):
+    '''
+    @param splits - a list of splitSites(...) results for consecutive regions of a contig
+    @return - one splitSites(...) result covering all of the regions
+    '''
+    if len(splits) == 1:
+        return splits[0]
+    ret = {}
+    for k in sorted(set(k for split in splits for k in split.keys())):
+        parts = [split[k] for split in splits if k in split]
+        ret[k] = tuple(np.concatenate([part[i] for part in parts]) for i in range(0, 3))
+    return ret
+
+def splitSites(sites, MIN_DEPTH, MIN_QUALITY):
+    '''
+    This function splits the passing calls for one contig by parental genotypes
+    @param sites - a ContigSites tuple extracted for (proband, father, mother)
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @return - dictionary where key is (patGT, matGT) and value is a tuple (positions, proband ref depths, proband alt depths), only
+        non-empty combinations are included
+    '''
+    #make sure everything passes these user-set parameters
+    passing = trioPassMask(sites, MIN_DEPTH, MIN_QUALITY)
+    ret = {}
+    for pType in range(0, 3):
+        for mType in range(0, 3):
+            mask = parentalMask(sites, passing, pType, mType)
+            if mask.any():
+                k = (GT_LABELS[pType], GT_LABELS[mType])
+                ret[k] = (sites.pos[mask], sites.ad[mask, PROBAND, 0], sites.ad[mask, PROBAND, 1])
+    return ret
+
+def reloadSplit(vcfFN, sampleLabels, MIN_DEPTH, MIN_QUALITY, cacheDir, regions, chrom):
+    '''
+    This function recomputes the split of one contig from the cached site arrays, see SplitSpill
+    @param vcfFN - the .vcf.bgz file to parse
+    @param sampleLabels - the (proband, father, mother) labels
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @param cacheDir - the directory for cached per-site arrays (see SiteCache.py)
+    @param regions - dictionary where key is the contig name and value is its list of Regions.Region from planRegions(...)
+    @param chrom - the contig to split
+    @return - the splitSites(...) result for the whole contig
+    '''
+    return mergeSplits([splitSites(loadRegion(vcfFN, region, sampleLabels, cacheDir), MIN_DEPTH, MIN_QUALITY) for region in regions[chrom]])
+        
+def plotTrioBiallelic(vcfFN, proband, father, mother, outDir, MIN_DEPTH, MIN_QUALITY, threads=1, cacheDir=None, density=False,
+    imageFormat='png', dpi=None, renderThreads=1, overlayFN=None, shardSize=None, regionsFN=None):
+    '''
+    This function will actually plot the figures per chromosome
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param outDir - the directory to save all images to
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @param threads - the number of worker processes used to scan contigs in parallel
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param density - if True, draw binned density images instead of scatter plots (see Rendering.drawSites(...))
+    @param imageFormat - the image format and file extension to save the figures as
+    @param dpi - the resolution of the saved images, None uses the matplotlib default
+    @param renderThreads - the number of worker processes used to draw the figures
+    @param overlayFN - optional BED track from TrioMixoploid.py --track to draw over the informative panels
+    @param shardSize - the largest region scanned by one worker in base pairs, None scans whole contigs (see Regions.py)
+    @param regionsFN - optional BED file, only the records inside its regions are used
+    @return - a TrioPlots with the summary rows and the figure for each contig
+    '''
+    #make sure we can do this first
+    if not os.path.exists(outDir):
+        os.makedirs(outDir)
+    
+    #get the chromosomes we plan to go through
+    contigs, samples = readHeader(vcfFN, cacheDir)
+    plan = planRegions(vcfFN, contigs, shardSize, regionsFN)
+    chromList = [chrom for chrom, regions in plan]
+    for sampleLabel in [proband, father, mother]:
+        if (sampleLabel not in samples):
+            raise Exception('Missing required column "'+sampleLabel+'" in VCF file: '+vcfFN)
+    
+    #with a cache the splits are cheap to recompute from the cached arrays, otherwise each one is spilled to a temporary file
+    reload = None
+    if cacheDir is not None:
+        reload = functools.partial(reloadSplit, vcfFN, [proband, father, mother], MIN_DEPTH, MIN_QUALITY, cacheDir, dict(plan))
+    
+    #iterate through the VCF, each region is handled by splitRegion(...)
+    missing = []
+    worker = functools.partial(splitRegion, vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, cacheDir)
+    overlay = readWindowTrack(overlayFN) if overlayFN is not None else None
+    with SplitSpill(reload) as splits:
+        for chrom, split in zip(chromList, mapRegions(worker, plan, threads, mergeSplits)):
+            if split is None:
+                missing.append(chrom)
+                continue
+            splits.add(chrom, split)
+        
+        with RenderPool(renderThreads) as renderPool:
+            ret = renderTrioPlots(vcfFN, proband, outDir, contigs, splits, density, imageFormat, dpi, renderPool, overlay)
+    ret.missing = missing
+    return ret
+
+class SplitSpill(object):
+    '''
+    The splitSites(...) results of each contig, kept out of memory until the contig is drawn so the peak memory is one contig rather
+    than the whole genome.  Only the autosome depth totals for deriveRatio(...) stay in memory.  Each split is written to a temporary
+    .npz file, or when a reload function is given (such as a re-read of the SiteCache.py arrays) nothing is written and the split is
+    recomputed when it is needed.
+    '''
+    def __init__(self, reload=None):
+        '''
+        @param reload - optional function that returns the split of a contig, replacing the temporary files
+        '''
+        self.reload = reload
+        self.tmpDir = None if reload is not None else tempfile.mkdtemp(prefix='mixoviz-trio-')
+        self.spillFNs = {}
+        #the contigs with data, in the order they were added
+        self.chromList = []
+        #reference and alternate proband depth totals of the 0/0 1/1 and 1/1 0/0 panels across the autosomes
+        self.totals = [0.0, 0.0, 0.0, 0.0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def add(self, chrom, split):
+        '''
+        @param chrom - the contig name
+        @param split - the splitSites(...) result for the whole contig
+        '''
+        self.chromList.append(chrom)
+        if isAutosome(chrom):
+            #only allows autosomes to get added to these totals, stopping at the first panel without sites
+            for i, k in enumerate([('0/0', '1/1'), ('1/1', '0/0')]):
+                if not (k in split):
+                    break
+                self.totals[2*i] += np.sum(split[k][1])
+                self.totals[2*i+1] += np.sum(split[k][2])
+        
+        if self.tmpDir is not None:
+            arrays = {}
+            for (patGT, matGT), dv in split.items():
+                panel = str(GT_LABELS.index(patGT)*3+GT_LABELS.index(matGT))
+                arrays['pos'+panel], arrays['ref'+panel], arrays['alt'+panel] = dv
+            self.spillFNs[chrom] = os.path.join(self.tmpDir, str(len(self.spillFNs))+'.npz')
+            np.savez(self.spillFNs[chrom], **arrays)
+
+    def load(self, chrom):
+        '''
+        @param chrom - a contig passed to add(...)
+        @return - the splitSites(...) result for the contig
+        '''
+        if self.reload is not None:
+            return self.reload(chrom)
+        ret = {}
+        with np.load(self.spillFNs[chrom]) as spilled:
+            for pType in range(0, 3):
+                for mType in range(0, 3):
+                    panel = str(pType*3+mType)
+                    if 'pos'+panel in spilled.files:
+                        ret[(GT_LABELS[pType], GT_LABELS[mType])] = (spilled['pos'+panel], spilled['ref'+panel], spilled['alt'+panel])
+        return ret
+
+    def close(self):
+        '''
+        This function removes the temporary files
+        '''
+        if self.tmpDir is not None:
+            shutil.rmtree(self.tmpDir, ignore_errors=True)
+            self.tmpDir = None
+
+@dataclasses.dataclass
+class TrioPlots:
+    '''
+    The result of plotTrioBiallelic(...) and renderTrioPlots(...), the rows have the reference total, alternate total, and B-allele
+    frequency of each parental genotype panel from top left to bottom right
+    '''
+    #the contigs with no data
+    missing: list
+    #warnings about the expected ratios, such as no informative sites
+    warnings: list
+    #the diploid fraction derived from all autosomes, used for the red lines in the figures
+    derivedRatio: float
+    columns: list
+    rows: list
+    #contig name to the saved figure filename
+    figures: dict
+
+    def write(self, fp=None):
+        '''
+        This function prints the warnings, derived ratio, and the summary rows in a TSV format
+        @param fp - the file handle to print to (default: STDOUT)
+        '''
+        if fp is None:
+            fp = sys.stdout
+        for chrom in self.missing:
+            print('Warning: missing data for chromosome "'+chrom+'"', file=fp)
+        for warning in self.warnings:
+            print(warning, file=fp)
+        print('Derived ratio=', self.derivedRatio, file=fp)
+        print('\t'.join(self.columns), file=fp)
+        for rowValues in self.rows:
+            print('\t'.join([str(x) for x in rowValues]), file=fp)
+
+def renderTrioPlots(vcfFN, proband, outDir, contigs, splits, density=False, imageFormat='png', dpi=None, renderPool=None, overlay=None):
+    '''
+    This function derives the expected ratios across all autosomes, then plots the 3x3 figure and gathers the summary row for each contig
+    @param vcfFN - the .vcf.bgz file that was parsed, used for the figure titles
+    @param proband - the label for the proband/child
+    @param outDir - the directory to save all images to
+    @param contigs - dictionary where key is the contig name and value is its length from the VCF header
+    @param splits - a SplitSpill with the contigs to plot, each contig is loaded from it just before it is drawn
+    @param density - if True, draw binned density images instead of scatter plots (see Rendering.drawSites(...))
+    @param imageFormat - the image format and file extension to save the figures as
+    @param dpi - the resolution of the saved images, None uses the matplotlib default
+    @param renderPool - a Rendering.RenderPool that draws the figures, by default they are drawn in this process
+    @param overlay - optional windowed estimates from TrioMixoploid.readWindowTrack(...) to draw over the informative panels
+    @return - a TrioPlots with no missing contigs, the caller knows which contigs were left out of splits
+    '''
+    ret = TrioPlots([], [], None, None, [], {})
+    
+    #this is the order from top left to bottom right of the genotypes in the final figure
+    typeOrder = GT_LABELS
+    
+    #calculate the ratios from the autosome totals gathered during the scan so we can figure out what to plot
+    derivedRatio = deriveRatio(*splits.totals, warnings=ret.warnings)
+    ret.derivedRatio = derivedRatio
+    plotHlines = expectedLines(derivedRatio)
+    
+    #this is just figuring out what to print to the screen in a tsv format 
+    header = ['chrom']
+    for pType in range(0, 3):
+        for mType in range(0, 3):
+            header += [typeOrder[pType]+'_'+typeOrder[mType], '', '']
+    ret.columns = header
+    
+    #now we can go through each chromosome and send the results off to be plotted
+    ownPool = renderPool is None
+    if ownPool:
+        renderPool = RenderPool()
+    for chrom in splits.chromList:
+        setContig(chrom)
+        split = splits.load(chrom)
+        
+        #calculate the chromosome length
+        chromLen = contigs[chrom]
+        for pType in range(0, 3):
+            for mType in range(0, 3):
+                k = (typeOrder[pType], typeOrder[mType])
+                chromLen = max(chromLen, split.get(k, ([0], [0], [0]))[0][-1])
+        
+        #row values stored what will eventually be printed to the screen for this chromosome
+        rowValues = [chrom]
+        panelXs = []
+        panelYs = []
+        
+        for pType in range(0, 3):
+            for mType in range(0, 3):
+                #get the data for this chromosome and parental GTs
+                k = (typeOrder[pType], typeOrder[mType])
+                dv = split.get(k, ([], [], []))
+                
+                #calculate the B-allele frequencies
+                panelXs.append(np.asarray(dv[0]))
+                panelYs.append(100.0*np.array(dv[2])/(np.array(dv[1])+np.array(dv[2])))
+                
+                #add the values to print for this chromosome
+                if len(dv[0]) > 0:
+                    #this method is weighting the variants by their coverage
+                    refTot = np.sum(dv[1])
+                    altTot = np.sum(dv[2])
+                    rowValues += [refTot, altTot, 100.0*altTot/(refTot+altTot)]
+                else:
+                    rowValues += [0, 0, 'undefined']
+        
+        ret.rows.append(rowValues)
+        
+        #if it is an autosome, plot the red ratio lines
+        chromHlines = plotHlines if isAutosome(chrom) else None
+        
+        #the windowed fit is the mean B-allele frequency in the two panels with opposite homozygous parents
+        windowLines = None
+        if overlay is not None and chrom in overlay:
+            starts, ends, ps, es = overlay[chrom]
+            windowLines = [(starts+ends)/2.0, 100.0*(2.0/3-ps/6-es), 100.0*(1.0/3+ps/6-es)]
+        
+        outFN = outDir+'/'+chrom+'.'+imageFormat
+        renderPool.submit(plotTrioContig, vcfFN, proband, chrom, chromLen, chromHlines, outFN, density, dpi, panelXs, panelYs,
+            windowLines=windowLines)
+        ret.figures[chrom] = outFN
+    
+    if ownPool:
+        renderPool.close()
+    return ret
+
+def isAutosome(chrom):
+    '''
+    @param chrom - the contig name
+    @return - True if the name, without any "chr" prefix, is a number
+    '''
+    c = chrom
+    if c[0:3] == 'chr':
+        c = c[3:]
+    try:
+        int(c)
+        return True
+    except ValueError:
+        return False
+
+def deriveRatio(totalRef0011, totalAlt0011, totalRef1100, totalAlt1100, warnings=None):
+    '''
+    This function derives the diploid fraction from the proband depths in the two panels with opposite homozygous parents
+    @param totalRef0011 - the autosome reference depth total of the 0/0 1/1 panel
+    @param totalAlt0011 - the autosome alternate depth total of the 0/0 1/1 panel
+    @param totalRef1100 - the autosome reference depth total of the 1/1 0/0 panel
+    @param totalAlt1100 - the autosome alternate depth total of the 1/1 0/0 panel
+    @param warnings - optional list that a warning is appended to for each panel without alternate alleles
+    @return - the derived ratio used for the red lines in the figures
+    '''
+    if totalAlt0011 == 0.0:
+        if warnings is not None:
+            warnings.append('WARNING: no 0/0 and 1/1 alleles detected')
+        ratio0011 = 0.0
+    else:
+        ratio0011 = totalAlt0011/(totalAlt0011+totalRef0011)
+    if totalAlt1100 == 0.0:
+        if warnings is not None:
+            warnings.append('WARNING: no 1/1 and 0/0 alleles detected')
+        ratio1100 = 1.0
+    else:
+        ratio1100 = 1-totalAlt1100/(totalAlt1100+totalRef1100)
+    
+    combinedRatio = .5*ratio0011+.5*ratio1100
+    return 4-6*combinedRatio
+
+def expectedLines(derivedRatio):
+    '''
+    @param derivedRatio - the result of deriveRatio(...)
+    @return - the expected B-allele frequencies (0 to 1) to draw as red lines in each panel, top left to bottom right
+    '''
+    #TODO: make these horizontal lines into an option
+    return [[0],
+        [0, (1-derivedRatio)/3, (derivedRatio-4)/-6, 1-(derivedRatio-4)/-6],
+        [(derivedRatio-4)/-6],
+        [0, 1-(derivedRatio-4)/-6],
+        [0, (1-derivedRatio)/3, (derivedRatio-4)/-6, 1-(derivedRatio-4)/-6, 1-(1-derivedRatio)/3, 1.0],
+        [(derivedRatio-4)/-6, 1.0],
+        [1-(derivedRatio-4)/-6],
+        [(derivedRatio-4)/-6, 1-(derivedRatio-4)/-6, 1-(1-derivedRatio)/3, 1.0],
+        [1.0]]
+
+def plotTrioContig(vcfFN, proband, chrom, chromLen, plotHlines, outFN, density, dpi, panelXs, panelYs, windowLines=None):
+    '''
+    This function draws and saves the 3x3 figure for one contig, it is run in a render worker when render threads are used
+    @param vcfFN - the .vcf.bgz file that was parsed, used for the title
+    @param proband - the label for the proband/child
+    @param chrom - the contig name
+    @param chromLen - the right edge of the x-axis
+    @param plotHlines - the expected ratios to draw as red lines in each panel, or None to skip them (non-autosomes)
+    @param outFN - the image filename, the format comes from the extension
+    @param density - if True, draw binned density images instead of scatter plots (see Rendering.drawSites(...))
+    @param dpi - the resolution of the saved image, None uses the matplotlib default
+    @param panelXs - the positions for each panel, top left to bottom right
+    @param panelYs - the B-allele frequencies for each panel as a percentage, top left to bottom right
+    @param windowLines - optional list [xs, ys0011, ys1100] of window midpoints and the windowed B-allele frequency for the 0/0 1/1 and
+        1/1 0/0 panels, as a percentage
+    '''
+    #this is the order from top left to bottom right of the genotypes in the final figure
+    typeOrder = GT_LABELS
+    
+    #create a 3x3 figure
+    plt = loadPyplot()
+    f, axarr = plt.subplots(3, 3, sharex=True, sharey=True)
+    f.set_figheight(12)
+    f.set_figwidth(12)
+    plt.suptitle(vcfFN.split('/')[-1]+' '+proband+'['+chrom+']')
+    plt.xlim([0, chromLen])
+    plt.ylim([0, 100])
+    
+    for pType in range(0, 3):
+        for mType in range(0, 3):
+            drawSites(axarr[pType, mType], panelXs[pType*3+mType], panelYs[pType*3+mType], chromLen, density)
+            axarr[pType, mType].set_title(typeOrder[pType]+' '+typeOrder[mType])
+            axarr[pType, mType].grid()
+            
+            if plotHlines is not None:
+                for hlineValue in plotHlines[pType*3+mType]:
+                    axarr[pType, mType].axhline(100.0*hlineValue, color='red', linestyle='dashed', linewidth=2)
+    
+    if windowLines is not None:
+        #these are the 0/0 1/1 and 1/1 0/0 panels
+        axarr[0, 2].plot(windowLines[0], windowLines[1], color='green', linewidth=2)
+        axarr[2, 0].plot(windowLines[0], windowLines[2], color='green', linewidth=2)
+    
+    # hide tick and tick label of the big axes
+    f.add_subplot(111, frameon=False)
+    plt.tick_params(labelcolor='none', top='off', bottom='off', left='off', right='off')
+    plt.xlabel("Position")
+    plt.ylabel("B-allele frequency")
+    
+    #save and close the figure
+    plt.savefig(outFN, dpi=dpi)
+    plt.close(f)
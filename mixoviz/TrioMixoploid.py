@@ -0,0 +1,527 @@
+'''
+This module calculates the fraction of cells that are diploid under the assumption that it is a mixture of diploid/triploid cells and
+the extra copy is inherited from the maternal line (see "mixoviz trio-mixoploid -h").
+'''
+
+import collections
+import dataclasses
+import functools
+import numpy as np
+import os
+import sys
+
+from .BafSketch import bootstrapMeans, newBafSummary
+from .Options import CI_LEVEL
+from .Regions import mapRegions, planRegions
+from .RunStats import activeStats, countRejects, setContig, timed
+from .SiteCache import loadRegion, readHeader
+from .VcfArrays import GT_HOMREF, GT_HOMALT, MissingContig, PROBAND, parentalMask, trioPassMask, trioRejectMasks
+
+#columns of the TSV output, the same order as the values from ratioRows(...)
+RATIO_COLUMNS = ['chrom', 'diploid_frac', 'triploid_frac', 'e', 'diploid_frac_median', 'triploid_frac_median', 'e_median']
+
+#extra columns added after RATIO_COLUMNS when the medians come from a BAF histogram
+BOUND_COLUMNS = ['diploid_frac_median_bound', 'e_median_bound']
+
+#extra columns added at the end when bootstrap replicates are requested
+CI_COLUMNS = ['diploid_frac_ci_low', 'diploid_frac_ci_high', 'triploid_frac_ci_low', 'triploid_frac_ci_high', 'e_ci_low', 'e_ci_high']
+
+#columns of the windowed BED track, see printWindowTrack(...)
+WINDOW_COLUMNS = ['chrom', 'start', 'end', 'sites_0011', 'sites_1100', 'diploid_frac', 'triploid_frac', 'e']
+
+#settings for the windowed scan
+#   size - the window width, in base pairs or informative sites
+#   step - the distance between window starts, in the same units as size
+#   sites - if True, size and step count informative sites instead of base pairs
+WindowSpec = collections.namedtuple('WindowSpec', ['size', 'step', 'sites'])
+
+def calculateRatio(ratio0011, ratio1100):
+    '''
+    This function will calculate 'p' and 'e' for our two ratios.  Note: we assume that the maternal line is the source of any triploidy in
+    the system of equations.
+    @param ratio0011 - the ratio of ALT/TOTAL for alleles where the paternal genotype is 0/0 and the maternal genotype is 1/1
+    @param ratio1100 - the ratio of ALT/TOTAL for alleles where the paternal genotype is 1/1 and the maternal genotype is 0/0
+    @return - tuple (p, e)
+        p - the fraction of cells that are diploid given the above ratios (1-p is the fraction triploid)
+        e - the error term that allows the system of equation to be solved (i.e. reference/technical bias term)
+    '''
+    #logical form      ==>  standard linear alg. form for solving for p and e
+    #f01+e = -p/6+2/3  ==>  p+6e = 4-6*f01
+    #f10+e = p/6+1/3   ==>  -p+6e = 2-6*f10
+    #this stores the constants in front of the unknown variable on the left-hand side
+    systemLHS = [[1, 6],
+                 [-1, 6]]
+    
+    #this stores the calculate constant on the right-hand side based on the observed average allelic ratios
+    systemRHS = [4-6*ratio0011, 2-6*ratio1100]
+    
+    #calculate and return p, e
+    result = np.linalg.solve(systemLHS, systemRHS)
+    return result[0], result[1]
+
+def calculateRatios(ratios0011, ratios1100):
+    '''
+    This function is calculateRatio(...) for arrays of ratios, it uses the closed form of the same system so every pair is solved at once
+    @param ratios0011 - array of ALT/TOTAL ratios where the paternal genotype is 0/0 and the maternal genotype is 1/1
+    @param ratios1100 - array of ALT/TOTAL ratios where the paternal genotype is 1/1 and the maternal genotype is 0/0
+    @return - tuple (ps, es) of arrays, see calculateRatio(...)
+    '''
+    #adding and subtracting the two equations gives 2p = 2-6*f01+6*f10 and 12e = 6-6*f01-6*f10
+    ps = 1-3*ratios0011+3*ratios1100
+    es = (1-ratios0011-ratios1100)/2.0
+    return ps, es
+
+def summarizeRegion(vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, cacheDir, bins, windowed, region):
+    '''
+    This function gathers the informative calls for a single region, it is run in a worker process when threads are used
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param bins - the number of BAF histogram bins for the medians, None keeps every frequency for exact medians
+    @param windowed - if True, the informative sites are also returned for the windowed scan
+    @param region - the Regions.Region to scan
+    @return - tuple (summary, informative) or None if the contig has no records
+        summary - the result of depthSummaries(...)
+        informative - tuple (pos0011, pos1100, depths) for windowRatios(...), or None if windowed is False
+    '''
+    try:
+        sites = loadRegion(vcfFN, region, [proband, father, mother], cacheDir)
+    except MissingContig:
+        return None
+    
+    with timed('filter'):
+        mask0011, mask1100 = informativeMasks(sites, MIN_DEPTH, MIN_QUALITY)
+        if activeStats() is not None:
+            countRejects(len(sites.pos), trioRejectMasks(sites, MIN_DEPTH, MIN_QUALITY)+[('genotype', ~(mask0011 | mask1100))])
+        depths = (sites.ad[mask0011, PROBAND, 0], sites.ad[mask0011, PROBAND, 1],
+            sites.ad[mask1100, PROBAND, 0], sites.ad[mask1100, PROBAND, 1])
+        informative = None
+        if windowed:
+            informative = (sites.pos[mask0011], sites.pos[mask1100], depths)
+        return (depthSummaries(depths, bins), informative)
+
+def mergeSummaries(summaries):
+    '''
+    @param summaries - a list of depthSummaries(...) results for consecutive regions of a contig
+    @return - one depthSummaries(...) result covering all of the regions
+    '''
+    baf0011, baf1100 = summaries[0]
+    for other0011, other1100 in summaries[1:]:
+        baf0011.merge(other0011)
+        baf1100.merge(other1100)
+    return (baf0011, baf1100)
+
+def mergeRegionSummaries(results):
+    '''
+    @param results - a list of summarizeRegion(...) results for consecutive regions of a contig
+    @return - one summarizeRegion(...) result covering all of the regions
+    '''
+    summary = mergeSummaries([result[0] for result in results])
+    informative = None
+    if results[0][1] is not None:
+        informative = (np.concatenate([result[1][0] for result in results]), np.concatenate([result[1][1] for result in results]),
+            tuple(np.concatenate([result[1][2][i] for result in results]) for i in range(0, 4)))
+    return (summary, informative)
+
+def informativeMasks(sites, MIN_DEPTH, MIN_QUALITY):
+    '''
+    @param sites - a ContigSites tuple extracted for (proband, father, mother)
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @return - tuple (mask0011, mask1100) of the passing sites where the parents are 0/0 and 1/1, and 1/1 and 0/0 respectively
+    '''
+    #make sure everything passes these user-set parameters
+    passing = trioPassMask(sites, MIN_DEPTH, MIN_QUALITY)
+    mask0011 = parentalMask(sites, passing, GT_HOMREF, GT_HOMALT)
+    mask1100 = parentalMask(sites, passing, GT_HOMALT, GT_HOMREF)
+    return (mask0011, mask1100)
+
+def informativeDepths(sites, MIN_DEPTH, MIN_QUALITY):
+    '''
+    This function pulls out the proband allele depths at sites where the parents are opposite homozygotes
+    @param sites - a ContigSites tuple extracted for (proband, father, mother)
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @return - tuple (r0011, a0011, r1100, a1100) of proband ref/alt depths for each parental GT combination
+    '''
+    mask0011, mask1100 = informativeMasks(sites, MIN_DEPTH, MIN_QUALITY)
+    return (sites.ad[mask0011, PROBAND, 0], sites.ad[mask0011, PROBAND, 1],
+        sites.ad[mask1100, PROBAND, 0], sites.ad[mask1100, PROBAND, 1])
+
+def depthSummaries(depths, bins=None):
+    '''
+    This function reduces the informative depths to the B-allele frequency summaries used for the ratios
+    @param depths - tuple (r0011, a0011, r1100, a1100) from informativeDepths(...)
+    @param bins - the number of BAF histogram bins, None keeps every frequency for exact medians (see BafSketch.py)
+    @return - tuple (baf0011, baf1100) of BafSketch summaries
+    '''
+    r0011, a0011, r1100, a1100 = depths
+    baf0011 = newBafSummary(bins)
+    baf0011.add(r0011, a0011)
+    baf1100 = newBafSummary(bins)
+    baf1100.add(r1100, a1100)
+    return (baf0011, baf1100)
+
+def windowRatios(pos0011, pos1100, depths, windowSpec, chromLen=None):
+    '''
+    This function estimates the ratios in sliding windows along a contig.  The mean frequencies come from cumulative sums over the sorted
+    informative sites, so each window costs two binary searches no matter how wide it is or how much windows overlap.
+    @param pos0011 - the positions of the informative sites where the parents are 0/0 and 1/1, sorted
+    @param pos1100 - the positions of the informative sites where the parents are 1/1 and 0/0, sorted
+    @param depths - tuple (r0011, a0011, r1100, a1100) from informativeDepths(...)
+    @param windowSpec - a WindowSpec for the windows
+    @param chromLen - the contig length, base pair windows stop here and the last window ends here (default: the last informative site)
+    @return - tuple (starts, ends, n0011, n1100, ps, es) of arrays with one entry per window
+        starts, ends - the window as a 0-based, half-open BED interval
+        n0011, n1100 - the number of informative sites of each type in the window
+        ps, es - the diploid fraction and error term for the window, nan if either type has no sites
+    '''
+    r0011, a0011, r1100, a1100 = depths
+    allPos = np.sort(np.concatenate([pos0011, pos1100]))
+    if windowSpec.sites:
+        #each window spans a fixed number of informative sites
+        if len(allPos) == 0:
+            firsts = np.array([], dtype='int64')
+        else:
+            firsts = np.arange(0, max(len(allPos)-windowSpec.size, 0)+1, windowSpec.step)
+            if firsts[-1]+windowSpec.size < len(allPos):
+                #the step skipped past the last sites, so a final window ends on the last one
+                firsts = np.append(firsts, len(allPos)-windowSpec.size)
+        lasts = np.minimum(firsts+windowSpec.size, len(allPos))-1
+        starts = allPos[firsts].astype('int64')-1
+        ends = allPos[lasts].astype('int64')
+    else:
+        if not chromLen:
+            chromLen = int(allPos[-1]) if len(allPos) > 0 else 0
+        starts = np.arange(0, max(chromLen-windowSpec.size, 0)+1, windowSpec.step, dtype='int64')
+        if starts[-1]+windowSpec.size < chromLen:
+            #the step skipped past the end of the contig, so a final window ends there
+            starts = np.append(starts, chromLen-windowSpec.size)
+        ends = np.minimum(starts+windowSpec.size, chromLen)
+    
+    def windowMeans(pos, refDepths, altDepths):
+        #the VCF positions are 1-based, so a site is in (start, end]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            freqs = 1.0*altDepths/(refDepths+altDepths)
+        #a site without reads has no frequency, it makes the windows holding it nan (as it does the contig row) but not the later ones
+        nonFinite = ~np.isfinite(freqs)
+        cumFreqs = np.concatenate([[0.0], np.cumsum(np.where(nonFinite, 0.0, freqs))])
+        cumNonFinite = np.concatenate([[0], np.cumsum(nonFinite)])
+        firstIndices = np.searchsorted(pos, starts, side='right')
+        endIndices = np.searchsorted(pos, ends, side='right')
+        counts = endIndices-firstIndices
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = (cumFreqs[endIndices]-cumFreqs[firstIndices])/counts
+        means[cumNonFinite[endIndices] > cumNonFinite[firstIndices]] = np.nan
+        return (counts, means)
+    
+    n0011, mean0011 = windowMeans(pos0011, r0011, a0011)
+    n1100, mean1100 = windowMeans(pos1100, r1100, a1100)
+    ps, es = calculateRatios(mean0011, mean1100)
+    return (starts, ends, n0011, n1100, ps, es)
+
+def printWindowTrack(chrom, windows, fp):
+    '''
+    This function prints the windows for one contig as BED lines
+    @param chrom - the contig name, as it appears in the VCF
+    @param windows - the result of windowRatios(...)
+    @param fp - the file handle to print to
+    '''
+    for start, end, n0011, n1100, p, e in zip(*windows):
+        if n0011 == 0 or n1100 == 0:
+            rowValues = [chrom, start, end, n0011, n1100]+['--']*3
+        else:
+            rowValues = [chrom, start, end, n0011, n1100, p, 1-p, e]
+        print('\t'.join([str(x) for x in rowValues]), file=fp)
+
+def readWindowTrack(trackFN):
+    '''
+    This function loads a track written by the windowed scan, skipping windows without an estimate
+    @param trackFN - the BED track from TrioMixoploid.py --track
+    @return - a dictionary where key is the contig name and value is a tuple (starts, ends, ps, es) of arrays
+    '''
+    rows = collections.OrderedDict()
+    with open(trackFN, 'r') as fp:
+        for l in fp:
+            fields = l.rstrip('\n').split('\t')
+            if l[0] == '#' or fields[5] == '--':
+                continue
+            rows.setdefault(fields[0], []).append((int(fields[1]), int(fields[2]), float(fields[5]), float(fields[7])))
+    
+    ret = collections.OrderedDict()
+    for chrom, chromRows in rows.items():
+        starts, ends, ps, es = zip(*chromRows)
+        ret[chrom] = (np.array(starts), np.array(ends), np.array(ps), np.array(es))
+    return ret
+
+def calcTrioBiallelic(vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, threads=1, cacheDir=None, bins=None, bootstrap=0, seed=0,
+    trackFN=None, windowSpec=None, shardSize=None, regionsFN=None):
+    '''
+    This function will scan the VCF and perform the calculations, RatioTable.write() prints them in the TSV format
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @param threads - the number of worker processes used to scan contigs in parallel
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param bins - the number of BAF histogram bins for the medians, None keeps every frequency for exact medians
+    @param bootstrap - the number of bootstrap replicates for the confidence intervals, 0 skips them
+    @param seed - the random seed for the bootstrap replicates
+    @param trackFN - if set, the windowed scan is written to this file as a BED track (see windowRatios(...))
+    @param windowSpec - a WindowSpec for the windowed scan, only used when trackFN is set
+    @param shardSize - the largest region scanned by one worker in base pairs, None scans whole contigs (see Regions.py)
+    @param regionsFN - optional BED file, only the records inside its regions are used
+    @return - a RatioTable with one row per contig followed by the autosomes row
+    '''
+    #get the chromosomes we plan to go through
+    contigs, samples = readHeader(vcfFN, cacheDir)
+    plan = planRegions(vcfFN, contigs, shardSize, regionsFN)
+    chromList = [chrom for chrom, regions in plan]
+    for sampleLabel in [proband, father, mother]:
+        if (sampleLabel not in samples):
+            raise Exception('Missing required column "'+sampleLabel+'" in VCF file: '+vcfFN)
+    
+    if trackFN is None:
+        windowSpec = None
+    
+    #iterate through the VCF, each region is handled by summarizeRegion(...)
+    def consumeContigs(trackFP):
+        '''
+        Writes the windows for each contig as it arrives, passing the summaries on to the table
+        '''
+        worker = functools.partial(summarizeRegion, vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, cacheDir, bins,
+            windowSpec is not None)
+        for chrom, result in zip(chromList, mapRegions(worker, plan, threads, mergeRegionSummaries)):
+            if result is None:
+                yield None
+                continue
+            
+            summary, informative = result
+            if trackFP is not None:
+                pos0011, pos1100, depths = informative
+                setContig(chrom)
+                with timed('ratios'):
+                    windows = windowRatios(pos0011, pos1100, depths, windowSpec, contigs[chrom])
+                printWindowTrack(chrom, windows, trackFP)
+            yield summary
+    
+    trackFP = None
+    if trackFN is not None:
+        trackFP = open(trackFN, 'w')
+        print('#'+'\t'.join(WINDOW_COLUMNS), file=trackFP)
+    try:
+        rows = list(ratioRows(chromList, consumeContigs(trackFP), bins, bootstrap, seed))
+    finally:
+        if trackFP is not None:
+            trackFP.close()
+    return RatioTable(ratioColumns(bins, bootstrap), rows, MIN_DEPTH, MIN_QUALITY, bins, bootstrap, seed)
+
+@dataclasses.dataclass
+class RatioTable:
+    '''
+    The result of calcTrioBiallelic(...), the rows are in the column order from ratioColumns(...) with '--' where the ratios
+    could not be calculated
+    '''
+    columns: list
+    rows: list
+    MIN_DEPTH: int
+    MIN_QUALITY: int
+    bins: int = None
+    bootstrap: int = 0
+    seed: int = 0
+
+    def row(self, chrom):
+        '''
+        @param chrom - the contig name without any "chr" prefix, or 'autosomes' for the final row
+        @return - a dictionary from column name to value, None if the contig is not in the table
+        '''
+        for rowValues in self.rows:
+            if rowValues[0] == chrom:
+                return dict(zip(self.columns, rowValues))
+        return None
+
+    def write(self, fp=None):
+        '''
+        This function prints the table in the same TSV format as printRatioTable(...)
+        @param fp - the file handle to print to (default: STDOUT)
+        '''
+        if fp is None:
+            fp = sys.stdout
+        printRatioHeader(self.MIN_DEPTH, self.MIN_QUALITY, fp, self.bins, self.bootstrap, self.seed)
+        print('#'+'\t'.join(self.columns), file=fp)
+        for rowValues in self.rows:
+            print('\t'.join([str(x) for x in rowValues]), file=fp)
+
+def printRatioHeader(MIN_DEPTH, MIN_QUALITY, fp, bins=None, bootstrap=0, seed=0, medians=True):
+    '''
+    This function prints the '##' lines describing the command, parameters, and columns of the table
+    @param MIN_DEPTH - the minimum depth that was required
+    @param MIN_QUALITY - the minimum quality that was required
+    @param fp - the file handle to print to
+    @param bins - the number of BAF histogram bins used for the medians, None if they are exact
+    @param bootstrap - the number of bootstrap replicates used for the confidence intervals, 0 if there are none
+    @param seed - the random seed for the bootstrap replicates
+    @param medians - if False, the median columns are left out of the descriptions
+    '''
+    print('##COMMAND:', file=fp)
+    print('##  python '+' '.join(sys.argv), file=fp)
+    print('##PARAMETERS:', file=fp)
+    print('##  MIN_DEPTH = at least '+str(MIN_DEPTH)+' reads to include variant', file=fp)
+    print('##  MIN_QUALITY = at least '+str(MIN_QUALITY)+' quality score to include variant', file=fp)
+    if bins is not None:
+        print('##  BINS = medians estimated from a '+str(bins)+' bin B-allele frequency histogram', file=fp)
+    if bootstrap > 0:
+        print('##  BOOTSTRAP = '+str(bootstrap)+' replicates with seed '+str(seed)+' for the '+str(CI_LEVEL)+'% confidence intervals', file=fp)
+    print('##chrom - the chromosome tested', file=fp)
+    print('##diploid_frac - the fraction of cells that are diploid based on the mean statistics', file=fp)
+    print('##triploid_frac - the fraction of cells that are triploid based on the mean statistics', file=fp)
+    print('##e - the error value from the system using mean statistics, values greater than .01 may indicate an atypical sample', file=fp)
+    if medians:
+        print('##diploid_frac_median - the fraction of cells that are diploid based on the median statistics', file=fp)
+        print('##triploid_frac_median - the fraction of cells that are triploid based on the median statistics', file=fp)
+        print('##e_median - the error value from the system using median statistics, values greater than .01 may indicate an atypical sample', file=fp)
+    if bins is not None:
+        print('##diploid_frac_median_bound - diploid_frac_median (and triploid_frac_median) is within this of the value from exact medians', file=fp)
+        print('##e_median_bound - e_median is within this of the value from exact medians', file=fp)
+    if bootstrap > 0:
+        for column in ['diploid_frac', 'triploid_frac', 'e']:
+            print('##'+column+'_ci_low, '+column+'_ci_high - the bootstrap percentile confidence interval for '+column, file=fp)
+
+def ratioColumns(bins=None, bootstrap=0):
+    '''
+    @param bins - the number of BAF histogram bins used for the medians, None if they are exact
+    @param bootstrap - the number of bootstrap replicates used for the confidence intervals, 0 if there are none
+    @return - the column names for the rows from ratioRows(...)
+    '''
+    ret = RATIO_COLUMNS
+    if bins is not None:
+        ret = ret+BOUND_COLUMNS
+    if bootstrap > 0:
+        ret = ret+CI_COLUMNS
+    return ret
+
+def printRatioTable(chromList, summaries, MIN_DEPTH, MIN_QUALITY, fp=None, bins=None, bootstrap=0, seed=0):
+    '''
+    This function prints the TSV header, one row per contig, and the final row across all autosomes
+    @param chromList - the contigs that were scanned
+    @param summaries - an iterable with the depthSummaries(...) tuple of each contig in chromList, such as the summary from
+        mergeRegionSummaries(...), or None for a contig without records
+    @param MIN_DEPTH - the minimum depth that was required, only used for the header
+    @param MIN_QUALITY - the minimum quality that was required, only used for the header
+    @param fp - the file handle to print to (default: STDOUT)
+    @param bins - the number of BAF histogram bins used for the summaries, None if they are exact
+    @param bootstrap - the number of bootstrap replicates for the confidence intervals, 0 skips them
+    @param seed - the random seed for the bootstrap replicates
+    '''
+    if fp is None:
+        fp = sys.stdout
+    
+    #header for everything
+    printRatioHeader(MIN_DEPTH, MIN_QUALITY, fp, bins, bootstrap, seed)
+    print('#'+'\t'.join(ratioColumns(bins, bootstrap)), file=fp)
+    
+    for rowValues in ratioRows(chromList, summaries, bins, bootstrap, seed):
+        print('\t'.join([str(x) for x in rowValues]), file=fp)
+
+def ratioRows(chromList, summaries, bins=None, bootstrap=0, seed=0):
+    '''
+    This function calculates the table rows, one per contig followed by the final row across all autosomes
+    @param chromList - the contigs that were scanned
+    @param summaries - an iterable with the depthSummaries(...) tuple of each contig in chromList, such as the summary from
+        mergeRegionSummaries(...), or None for a contig without records
+    @param bins - the number of BAF histogram bins used for the summaries, None if they are exact
+    @param bootstrap - the number of bootstrap replicates for the confidence intervals, 0 skips them
+    @param seed - the random seed for the bootstrap replicates
+    @return - an iterator over the row values, see ratioColumns(...)
+    '''
+    rng = np.random.default_rng(seed)
+    
+    #go through each chromosome merging the frequencies with each GT combination
+    total0011 = newBafSummary(bins)
+    total1100 = newBafSummary(bins)
+    
+    #iterate through the per-contig summaries
+    for chrom, summary in zip(chromList, summaries):
+        c = chrom
+        if c[0:3] == 'chr':
+            c = c[3:]
+        setContig(chrom)
+        
+        if summary is None:
+            #print('Warning: missing data for chromosome "'+chrom+'"')
+            continue
+        
+        #these are the frequencies we care about
+        baf0011, baf1100 = summary
+        if baf0011.count() == 0 or baf1100.count() == 0:
+            #one of these values doesn't exist, so we cannot perform the calculation
+            yield [c]+['--']*len(ratioColumns(bins, bootstrap)[1:])
+            continue
+        
+        try:
+            #this will raise an exception for non-autosomes
+            cInt = int(c)
+            
+            #add these to the total for the final overall score
+            total0011.merge(baf0011)
+            total1100.merge(baf1100)
+        
+        except:
+            #skip non-autosomes
+            pass
+        
+        with timed('ratios'):
+            rowValues = [c]+ratioValues(baf0011, baf1100, bins, bootstrap, rng)
+        yield rowValues
+    
+    #calculate the overall ratios
+    setContig(None)
+    with timed('ratios'):
+        rowValues = ['autosomes']+ratioValues(total0011, total1100, bins, bootstrap, rng)
+    yield rowValues
+
+def ratioValues(baf0011, baf1100, bins=None, bootstrap=0, rng=None):
+    '''
+    This function plugs the mean and median frequencies into the system of equations
+    @param baf0011 - the BafSketch summary for sites where the paternal genotype is 0/0 and the maternal genotype is 1/1
+    @param baf1100 - the BafSketch summary for sites where the paternal genotype is 1/1 and the maternal genotype is 0/0
+    @param bins - the number of BAF histogram bins used for the summaries, None if they are exact
+    @param bootstrap - the number of bootstrap replicates for the confidence intervals, 0 skips them
+    @param rng - the numpy.random.Generator for the bootstrap replicates
+    @return - the row values after the chromosome, see ratioColumns(...)
+    '''
+    p, e = calculateRatio(baf0011.mean(), baf1100.mean())
+    median0011, bound0011 = baf0011.median()
+    median1100, bound1100 = baf1100.median()
+    p2, e2 = calculateRatio(median0011, median1100)
+    ret = [p, 1-p, e, p2, 1-p2, e2]
+    if bins is not None:
+        #from the solution p = 1-3*f01+3*f10 and e = (1-f01-f10)/2
+        ret += [3*(bound0011+bound1100), (bound0011+bound1100)/2.0]
+    if bootstrap > 0:
+        ret += bootstrapIntervals(baf0011, baf1100, bootstrap, rng)
+    return ret
+
+def bootstrapIntervals(baf0011, baf1100, bootstrap, rng):
+    '''
+    This function resamples the sites for both parental GT combinations and solves every replicate's system at once
+    @param baf0011 - the BafSketch summary for sites where the paternal genotype is 0/0 and the maternal genotype is 1/1
+    @param baf1100 - the BafSketch summary for sites where the paternal genotype is 1/1 and the maternal genotype is 0/0
+    @param bootstrap - the number of bootstrap replicates
+    @param rng - the numpy.random.Generator for the bootstrap replicates
+    @return - the confidence interval values, see CI_COLUMNS
+    '''
+    if baf0011.count() == 0 or baf1100.count() == 0:
+        return [np.nan]*len(CI_COLUMNS)
+    
+    ps, es = calculateRatios(bootstrapMeans(baf0011, bootstrap, rng), bootstrapMeans(baf1100, bootstrap, rng))
+    tail = (100-CI_LEVEL)/2.0
+    pLow, pHigh = np.percentile(ps, [tail, 100-tail])
+    eLow, eHigh = np.percentile(es, [tail, 100-tail])
+    return [pLow, pHigh, 1-pHigh, 1-pLow, eLow, eHigh]
@@ -0,0 +1,119 @@
+'''
+This module produces the full trio report from a single scan of the VCF: the TrioMixoploid.py table, the TrioBAllele.py figures, and
+the BAllele.py figures for the proband, father, and mother (see "mixoviz trio-report -h").
+'''
+
+import functools
+import os
+
+from .BAllele import mergeRatios, plotSampleContig, sampleRatios
+from .Rendering import RenderPool
+from .Regions import mapRegions, planRegions
+from .SiteCache import loadRegion, readHeader
+from .TrioBAllele import SplitSpill, mergeSplits, renderTrioPlots, splitSites
+from .TrioMixoploid import depthSummaries, informativeDepths, mergeSummaries, printRatioTable
+from .VcfArrays import MissingContig
+
+def scanRegion(vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, SAMPLE_DEPTH, SAMPLE_QUAL, cacheDir, region):
+    '''
+    This function reads a region once and prepares the data for every part of the report, it is run in a worker process when threads
+    are used
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param MIN_DEPTH - the minimum depth required by all trio calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all trio calls to consider it
+    @param SAMPLE_DEPTH - the minimum depth to include a variant in the single-sample plots
+    @param SAMPLE_QUAL - the minimum quality to include a variant in the single-sample plots
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param region - the Regions.Region to scan
+    @return - tuple (summary, split, ratios) or None if the contig has no records
+        summary - the result of TrioMixoploid.depthSummaries(...)
+        split - the result of TrioBAllele.splitSites(...)
+        ratios - the result of BAllele.sampleRatios(...) for the proband, father, and mother
+    '''
+    try:
+        sites = loadRegion(vcfFN, region, [proband, father, mother], cacheDir)
+    except MissingContig:
+        return None
+
+    summary = depthSummaries(informativeDepths(sites, MIN_DEPTH, MIN_QUALITY))
+    split = splitSites(sites, MIN_DEPTH, MIN_QUALITY)
+    ratios = [sampleRatios(sites, column, SAMPLE_DEPTH, SAMPLE_QUAL) for column in range(0, 3)]
+    return (summary, split, ratios)
+
+def mergeScans(scans):
+    '''
+    @param scans - a list of scanRegion(...) results for consecutive regions of a contig
+    @return - one scanRegion(...) result covering all of the regions
+    '''
+    summary = mergeSummaries([scan[0] for scan in scans])
+    split = mergeSplits([scan[1] for scan in scans])
+    ratios = [mergeRatios([scan[2][column] for scan in scans]) for column in range(0, 3)]
+    return (summary, split, ratios)
+
+def createTrioReport(vcfFN, proband, father, mother, outDir, MIN_DEPTH, MIN_QUALITY, SAMPLE_DEPTH, SAMPLE_QUAL, threads=1, cacheDir=None,
+    density=False, imageFormat='png', dpi=None, renderThreads=1, shardSize=None, regionsFN=None):
+    '''
+    This function scans the VCF once and writes every output of the three separate scripts
+        <outDir>/mixoploid.tsv - the TrioMixoploid.py table
+        <outDir>/trio.tsv - the TrioBAllele.py summary
+        <outDir>/trio/<chrom>.<imageFormat> - the TrioBAllele.py figures
+        <outDir>/samples/<label>/<chrom>.<imageFormat> - the BAllele.py figures for each trio member
+    @param vcfFN - the .vcf.bgz file to parse
+    @param proband - the label for the proband/child
+    @param father - the label for the father to test
+    @param mother - the label for the mother to test
+    @param outDir - the directory to save everything to
+    @param MIN_DEPTH - the minimum depth required by all trio calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all trio calls to consider it
+    @param SAMPLE_DEPTH - the minimum depth to include a variant in the single-sample plots
+    @param SAMPLE_QUAL - the minimum quality to include a variant in the single-sample plots
+    @param threads - the number of worker processes used to scan contigs in parallel
+    @param cacheDir - optional directory for cached per-site arrays (see SiteCache.py)
+    @param density - if True, draw binned density images instead of scatter plots (see Rendering.drawSites(...))
+    @param imageFormat - the image format and file extension to save the figures as
+    @param dpi - the resolution of the saved images, None uses the matplotlib default
+    @param renderThreads - the number of worker processes used to draw the figures, shared by the trio and single-sample figures
+    @param shardSize - the largest region scanned by one worker in base pairs, None scans whole contigs (see Regions.py)
+    @param regionsFN - optional BED file, only the records inside its regions are used
+    '''
+    sampleLabels = [proband, father, mother]
+    trioDir = outDir+'/trio'
+    sampleDirs = [outDir+'/samples/'+sampleLabel for sampleLabel in sampleLabels]
+    for d in [trioDir]+sampleDirs:
+        if not os.path.exists(d):
+            os.makedirs(d)
+
+    #get the chromosomes we plan to go through
+    contigs, samples = readHeader(vcfFN, cacheDir)
+    plan = planRegions(vcfFN, contigs, shardSize, regionsFN)
+    chromList = [chrom for chrom, regions in plan]
+    for sampleLabel in sampleLabels:
+        if (sampleLabel not in samples):
+            raise Exception('Missing required column "'+sampleLabel+'" in VCF file: '+vcfFN)
+
+    with open(outDir+'/mixoploid.tsv', 'w') as mixoFP, open(outDir+'/trio.tsv', 'w') as trioFP, RenderPool(renderThreads) as renderPool, \
+        SplitSpill() as splits:
+        def consumeContigs():
+            '''
+            Plots the single-sample figures and spills the trio data as each contig arrives, passing the summaries on to the table
+            '''
+            worker = functools.partial(scanRegion, vcfFN, proband, father, mother, MIN_DEPTH, MIN_QUALITY, SAMPLE_DEPTH, SAMPLE_QUAL, cacheDir)
+            for chrom, result in zip(chromList, mapRegions(worker, plan, threads, mergeScans)):
+                if result is None:
+                    print('Warning: missing data for chromosome "'+chrom+'"')
+                    print('Warning: missing data for chromosome "'+chrom+'"', file=trioFP)
+                    yield None
+                    continue
+
+                summary, split, ratios = result
+                splits.add(chrom, split)
+                for sampleLabel, sampleDir, (xs, ys) in zip(sampleLabels, sampleDirs, ratios):
+                    renderPool.submit(plotSampleContig, vcfFN, sampleLabel, chrom, contigs[chrom], xs, ys, sampleDir, SAMPLE_DEPTH,
+                        SAMPLE_QUAL, density, imageFormat, dpi)
+                yield summary
+
+        printRatioTable(chromList, consumeContigs(), MIN_DEPTH, MIN_QUALITY, mixoFP)
+        renderTrioPlots(vcfFN, proband, trioDir, contigs, splits, density, imageFormat, dpi, renderPool).write(trioFP)
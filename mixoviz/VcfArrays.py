@@ -0,0 +1,233 @@
+'''
+Shared helpers for pulling the per-sample call data out of a tabix-indexed VCF in one pass per contig.  The data is returned as NumPy
+arrays so the scripts can filter and aggregate with vectorized masks instead of per-variant Python logic.
+'''
+
+import array
+import collections
+import numpy as np
+import os
+
+from .Lru import MAX_OPEN_FILES, LruCache, fileStamp
+from .RunStats import activeStats
+
+#integer codes used for the GT arrays; the order matches the genotype order in the trio figures
+GT_HOMREF = 0
+GT_HET = 1
+GT_HOMALT = 2
+GT_OTHER = -1
+GT_LABELS = ['0/0', '0/1', '1/1']
+GT_CODES = {
+    '0/0': GT_HOMREF, '0|0': GT_HOMREF,
+    '0/1': GT_HET, '0|1': GT_HET, '1/0': GT_HET, '1|0': GT_HET,
+    '1/1': GT_HOMALT, '1|1': GT_HOMALT
+}
+
+#sentinel stored in the GQ and AD arrays when the field is absent or could not be parsed
+MISSING = -1
+
+#column order for the trio arrays
+PROBAND = 0
+FATHER = 1
+MOTHER = 2
+
+#pos - 1-based position (int32, n)
+#snv - True if the reference allele is a single base (bool, n)
+#gt - genotype codes (int8, n x samples)
+#gq - genotype quality (int32, n x samples)
+#ad - reference and alternate allele depths (int32, n x samples x 2)
+ContigSites = collections.namedtuple('ContigSites', ['pos', 'snv', 'gt', 'gq', 'ad'])
+
+class MissingContig(Exception):
+    '''
+    Raised by the readers when a contig has no records in the VCF, the only failure the scans report as missing data instead of passing
+    it on to the caller
+    '''
+    def __init__(self, chrom, vcfFN):
+        '''
+        @param chrom - the contig name
+        @param vcfFN - the VCF filename
+        '''
+        Exception.__init__(self, 'No records for contig "'+chrom+'" in VCF file: '+vcfFN)
+        self.chrom = chrom
+
+#readers opened by openReader(...), keyed on (file stamp, pid) so forked workers never share a file handle with their parent and a
+#rewritten file is reopened
+_readers = LruCache(MAX_OPEN_FILES)
+
+def openReader(vcfFN):
+    '''
+    @param vcfFN - the VCF filename, must be a bgzipped vcf (.vcf.gz) with a tabix index (.vcf.gz.tbi)
+    @return - a vcf.Reader for the file, reused across calls within the same process
+    '''
+    k = (fileStamp(vcfFN), os.getpid())
+    vcfReader = _readers.get(k)
+    if vcfReader is None:
+        #PyVCF is only needed when a contig is not already in the cache, so it is imported on first use
+        import vcf
+        vcfReader = _readers.put(k, vcf.Reader(filename=vcfFN, compressed=True))
+    return vcfReader
+
+def parseQuality(value):
+    '''
+    Converts a GQ value into an int
+    @param value - the parsed GQ value from the VCF, may be None
+    @return - the quality as an int, or MISSING if it is absent or not a number
+    '''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+def parseDepths(value):
+    '''
+    Converts an AD value into a reference and alternate depth
+    @param value - the parsed AD value from the VCF, may be None
+    @return - tuple (ref, alt), both MISSING unless AD is exactly two integers
+    '''
+    try:
+        ref, alt = value
+        return (int(ref), int(alt))
+    except (TypeError, ValueError):
+        return (MISSING, MISSING)
+
+def extractContig(vcfReader, chrom, sampleLabels, start=None, end=None):
+    '''
+    This function reads every variant on a contig once and stores the call information for the requested samples.  Multi-allelic
+    sites are dropped here since none of the scripts use them, all other filtering is left to the caller.
+    @param vcfReader - an open vcf.Reader for a tabix-indexed VCF
+    @param chrom - the contig to fetch, any exception from the tabix fetch is passed to the caller (see VcfReaders.PyvcfReader for
+        the MissingContig check)
+    @param sampleLabels - the column labels for the samples to extract
+    @param start - optional 0-based start, only records with start < POS are included
+    @param end - optional end, only records with POS <= end are included
+    @return - a ContigSites tuple with one row per site
+    '''
+    sampleIndices = [vcfReader.samples.index(sampleLabel) for sampleLabel in sampleLabels]
+
+    pos = array.array('i')
+    snv = array.array('b')
+    gt = array.array('b')
+    gq = array.array('i')
+    ad = array.array('i')
+    multiallelic = 0
+    records = vcfReader.fetch(chrom) if start is None and end is None else vcfReader.fetch(chrom, start or 0, end)
+    for var in records:
+        #the fetch also returns records that only overlap the region, the region holds the records that start in it
+        if (start is not None and var.POS <= start) or (end is not None and var.POS > end):
+            continue
+
+        #we only care about bi-allelic variants
+        if len(var.ALT) > 1:
+            multiallelic += 1
+            continue
+
+        pos.append(var.POS)
+        snv.append(len(var.REF) == 1)
+        for i in sampleIndices:
+            data = var.samples[i].data
+            gt.append(GT_CODES.get(data.GT, GT_OTHER))
+            gq.append(parseQuality(getattr(data, 'GQ', None)))
+            ad.extend(parseDepths(getattr(data, 'AD', None)))
+
+    countMultiallelic(multiallelic)
+    return packSites(pos, snv, gt, gq, ad, len(sampleIndices))
+
+def packSites(pos, snv, gt, gq, ad, numSamples):
+    '''
+    This function turns the arrays filled by the VCF readers into a ContigSites tuple without copying them
+    @param pos - array.array('i') of positions
+    @param snv - array.array('b') of SNV flags
+    @param gt - array.array('b') of GT codes, numSamples per site
+    @param gq - array.array('i') of GQ values, numSamples per site
+    @param ad - array.array('i') of reference and alternate depths, 2*numSamples per site
+    @param numSamples - the number of sample columns
+    @return - a ContigSites tuple
+    '''
+    return ContigSites(
+        np.frombuffer(pos, dtype=np.int32),
+        np.frombuffer(snv, dtype=np.int8).astype(bool),
+        np.frombuffer(gt, dtype=np.int8).reshape(-1, numSamples),
+        np.frombuffer(gq, dtype=np.int32).reshape(-1, numSamples),
+        np.frombuffer(ad, dtype=np.int32).reshape(-1, numSamples, 2)
+    )
+
+def countMultiallelic(multiallelic):
+    '''
+    This function records the multi-allelic records a reader skipped in the run statistics, if they are being collected
+    @param multiallelic - the number of records skipped
+    '''
+    stats = activeStats()
+    if stats is not None:
+        stats.addSites(multiallelic, 0, {'multiallelic' : multiallelic})
+
+def sliceSites(sites, start=None, end=None):
+    '''
+    @param sites - a ContigSites tuple
+    @param start - optional 0-based start, only sites with start < POS are kept
+    @param end - optional end, only sites with POS <= end are kept
+    @return - a ContigSites tuple with the sites inside the region, the arrays are views
+    '''
+    first = 0 if start is None else np.searchsorted(sites.pos, start, side='right')
+    last = len(sites.pos) if end is None else np.searchsorted(sites.pos, end, side='right')
+    if first == 0 and last == len(sites.pos):
+        return sites
+    return ContigSites(*[values[first:last] for values in sites])
+
+def totalDepth(sites):
+    '''
+    @param sites - a ContigSites tuple
+    @return - sum(AD) for every call (n x samples), 0 where AD is missing
+    '''
+    return np.where(sites.ad[:, :, 0] == MISSING, 0, sites.ad.sum(axis=2))
+
+def trioPassMask(sites, MIN_DEPTH, MIN_QUALITY):
+    '''
+    This function applies the filters shared by the trio scripts: a single base reference and every trio member passing the depth and
+    quality thresholds.  As before, a missing GQ counts as a quality of 0 and a missing AD counts as a depth of 0.
+    @param sites - a ContigSites tuple extracted for (proband, father, mother)
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @return - a boolean array with one value per site
+    '''
+    return sites.snv & np.all(callPassMask(sites, MIN_DEPTH, MIN_QUALITY), axis=1)
+
+def callPassMask(sites, MIN_DEPTH, MIN_QUALITY):
+    '''
+    This function applies the depth and quality thresholds to every call, a missing GQ counts as a quality of 0 and a missing AD counts
+    as a depth of 0
+    @param sites - a ContigSites tuple
+    @param MIN_DEPTH - the minimum depth required for a call
+    @param MIN_QUALITY - the minimum quality required for a call
+    @return - a boolean array (n x samples)
+    '''
+    gq = np.where(sites.gq == MISSING, 0, sites.gq)
+    return (gq >= MIN_QUALITY) & (totalDepth(sites) >= MIN_DEPTH)
+
+def trioRejectMasks(sites, MIN_DEPTH, MIN_QUALITY):
+    '''
+    This function breaks trioPassMask(...) down by the reason a site fails, for RunStats.countRejects(...)
+    @param sites - a ContigSites tuple extracted for (proband, father, mother)
+    @param MIN_DEPTH - the minimum depth required by all variant calls to consider it
+    @param MIN_QUALITY - the minimum quality required by all variant calls to consider it
+    @return - list of (reason, mask) where mask is True for the sites failing that filter
+    '''
+    missingGQ = sites.gq == MISSING
+    missingAD = sites.ad[:, :, 0] == MISSING
+    failsQuality = np.where(missingGQ, 0, sites.gq) < MIN_QUALITY
+    failsDepth = totalDepth(sites) < MIN_DEPTH
+    return [('indel', ~sites.snv),
+        ('missing_gq', np.any(missingGQ & failsQuality, axis=1)),
+        ('missing_ad', np.any(missingAD & failsDepth, axis=1)),
+        ('depth', np.any(failsDepth, axis=1)),
+        ('quality', np.any(failsQuality, axis=1))]
+
+def parentalMask(sites, passing, patType, matType):
+    '''
+    @param sites - a ContigSites tuple extracted for (proband, father, mother)
+    @param passing - the result of trioPassMask(...)
+    @param patType - the required GT code for the father
+    @param matType - the required GT code for the mother
+    @return - a boolean array that is True for passing sites with the given parental genotypes
+    '''
+    return passing & (sites.gt[:, FATHER] == patType) & (sites.gt[:, MOTHER] == matType)
@@ -0,0 +1,446 @@
+'''
+The VCF reader backends.  Every backend opens one file and offers the same three things:
+    contigs - an OrderedDict where key is the contig name and value is its length from the header (may be None)
+    samples - the sample column labels
+    extract(chrom, sampleLabels, start=None, end=None) - the ContigSites for the records with start < POS <= end, raises
+        VcfArrays.MissingContig when the contig has no records
+
+Backends, in the order "auto" tries them:
+    raw - RawVcf.py, a tab-splitting parser for bgzipped VCF with a tabix index, no extra dependencies
+    pysam - htslib through pysam, reads bgzipped VCF or BCF with a .tbi or .csi index; BCF values are never parsed as text
+    cyvcf2 - htslib through cyvcf2, reads the same inputs as pysam but costs more per record when only a trio is extracted
+    pyvcf - VcfArrays.extractContig(...) through PyVCF, the slowest and the reference the others are checked against
+
+The backend is picked once per process with setReader(...) (or the MIXOVIZ_READER environment variable, which worker processes inherit).
+With the default "auto", the first backend in AUTO_ORDER that is installed and can read the file is used.  All backends drop multi-allelic
+records and decode GT, GQ and AD the same way, so they produce identical arrays; checkConformance(...) verifies that for a given file.
+'''
+
+import array
+import collections
+import os
+import time
+import warnings
+
+from . import Options
+from .Bgzf import ioThreads, openTabixIndex
+from .Lru import MAX_OPEN_FILES, LruCache, fileStamp
+from .RawVcf import openRawReader
+from .RunStats import activeStats
+from .VcfArrays import GT_OTHER, MISSING, MissingContig, countMultiallelic, extractContig, openReader, packSites
+
+#the environment variable holding the backend name, "auto" when unset
+READER_ENV = 'MIXOVIZ_READER'
+
+#the backends tried by "auto", fastest first; the pure-python readers only handle bgzipped VCF with a tabix index
+AUTO_ORDER = ['raw', 'pysam', 'cyvcf2', 'pyvcf']
+TABIX_ONLY = ['raw', 'pyvcf']
+
+#htslib missing and end-of-vector markers for int32 FORMAT values, as returned by cyvcf2
+HTS_INT_MISSING = -2147483648
+HTS_INT_VECTOR_END = -2147483647
+
+#backends opened by openVcf(...), keyed on (file stamp, pid, backend name, I/O threads) like VcfArrays.openReader(...)
+_backends = LruCache(MAX_OPEN_FILES)
+
+def setReader(name):
+    '''
+    This function picks the backend used by openVcf(...) in this process and in any worker process started after it
+    @param name - one of Options.READER_NAMES
+    '''
+    if not (name in Options.READER_NAMES):
+        raise Exception('Unknown VCF reader "'+name+'", expected one of: '+', '.join(Options.READER_NAMES))
+    os.environ[READER_ENV] = name
+
+def selectedReader():
+    '''
+    @return - the backend name set by setReader(...), "auto" by default
+    '''
+    return os.environ.get(READER_ENV, 'auto')
+
+def isTabixVcf(vcfFN):
+    '''
+    @param vcfFN - the VCF filename
+    @return - True if the file is a bgzipped VCF with a tabix index, the only input the pure-python readers handle
+    '''
+    return not vcfFN.endswith('.bcf') and os.path.exists(vcfFN+'.tbi')
+
+def indexFilename(vcfFN):
+    '''
+    @param vcfFN - the VCF filename
+    @return - the .tbi or .csi index next to it, raises an exception if there is neither
+    '''
+    for suffix in ['.tbi', '.csi']:
+        if os.path.exists(vcfFN+suffix):
+            return vcfFN+suffix
+    raise Exception('Missing .tbi or .csi index for VCF file: '+vcfFN)
+
+def genotypeCode(alleles):
+    '''
+    @param alleles - the allele indices of one call, None for a missing allele
+    @return - the VcfArrays.GT_CODES code for the call, GT_OTHER unless it is a diploid call of the REF and first ALT allele
+    '''
+    if alleles is None or len(alleles) != 2:
+        return GT_OTHER
+    a, b = alleles
+    if (a == 0 or a == 1) and (b == 0 or b == 1):
+        return a+b
+    return GT_OTHER
+
+def diploidAlleles(row):
+    '''
+    @param row - one sample's row of a cyvcf2 genotype array: the allele indices (-1 missing, -2 past the sample's ploidy) and the phase flag
+    @return - the two allele indices, or None if the call is not diploid
+    '''
+    alleles = row[:-1]
+    if len(alleles) < 2 or any(allele != -2 for allele in alleles[2:]):
+        return None
+    return alleles[0:2]
+
+def qualityValue(value):
+    '''
+    @param value - the decoded GQ value, may be None
+    @return - the quality as an int, or MISSING if it is absent
+    '''
+    if value is None:
+        return MISSING
+    if isinstance(value, tuple):
+        #GQ declared with a Number other than 1
+        if len(value) != 1 or value[0] is None:
+            return MISSING
+        value = value[0]
+    return int(value)
+
+def depthValues(values):
+    '''
+    @param values - the decoded AD values, may be None
+    @return - tuple (ref, alt), both MISSING unless AD is exactly two values that are both present
+    '''
+    if values is None or len(values) != 2 or values[0] is None or values[1] is None:
+        return (MISSING, MISSING)
+    return (values[0], values[1])
+
+def recordParseTime(parseStart):
+    '''
+    @param parseStart - the time.perf_counter() value from before the records were read
+    '''
+    stats = activeStats()
+    if stats is not None:
+        stats.addTime('parse', time.perf_counter()-parseStart)
+
+class PyvcfReader(object):
+    '''
+    VcfArrays.extractContig(...) behind the common reader interface
+    '''
+    name = 'pyvcf'
+
+    def __init__(self, vcfFN):
+        '''
+        @param vcfFN - the VCF filename, must be a bgzipped vcf (.vcf.gz) with a tabix index (.vcf.gz.tbi)
+        '''
+        self.vcfFN = vcfFN
+        self.vcfReader = openReader(vcfFN)
+        #PyVCF raises a ValueError for a contig outside the index, the same error as a bad region, so the index is checked first
+        self.tabixIndex = openTabixIndex(vcfFN+'.tbi')
+        self.contigs = collections.OrderedDict((chrom, contig.length) for chrom, contig in self.vcfReader.contigs.items())
+        self.samples = self.vcfReader.samples
+
+    def extract(self, chrom, sampleLabels, start=None, end=None):
+        if not (chrom in self.tabixIndex):
+            raise MissingContig(chrom, self.vcfFN)
+        parseStart = time.perf_counter()
+        sites = extractContig(self.vcfReader, chrom, sampleLabels, start, end)
+        recordParseTime(parseStart)
+        return sites
+
+class PysamReader(object):
+    '''
+    Records decoded by htslib through pysam.VariantFile
+    '''
+    name = 'pysam'
+
+    def __init__(self, vcfFN):
+        '''
+        @param vcfFN - the VCF or BCF filename, must have a .tbi or .csi index
+        '''
+        import pysam
+        self.vcfFN = vcfFN
+        #htslib inflates BGZF blocks on its own threads, the same setting Bgzf.iterRange(...) uses for the raw reader
+        self.variantFile = pysam.VariantFile(vcfFN, threads=ioThreads()[0])
+        header = self.variantFile.header
+        self.contigs = collections.OrderedDict((chrom, contig.length) for chrom, contig in header.contigs.items())
+        self.samples = list(header.samples)
+
+    def extract(self, chrom, sampleLabels, start=None, end=None):
+        sampleIndices = [self.samples.index(sampleLabel) for sampleLabel in sampleLabels]
+        if not (chrom in self.variantFile.index):
+            #pysam raises a ValueError for a contig outside the header or a tabix index, the same error as a bad region
+            raise MissingContig(chrom, self.vcfFN)
+        parseStart = time.perf_counter()
+        multiallelic = 0
+
+        pos = array.array('i')
+        snv = array.array('b')
+        gt = array.array('b')
+        gq = array.array('i')
+        ad = array.array('i')
+        for record in self.variantFile.fetch(chrom, start or 0, end):
+            #the fetch also returns records that only overlap the region
+            if (start is not None and record.pos <= start) or (end is not None and record.pos > end):
+                continue
+            alts = record.alts
+            if alts is not None and len(alts) > 1:
+                multiallelic += 1
+                continue
+
+            pos.append(record.pos)
+            snv.append(len(record.ref) == 1)
+            calls = record.samples
+            for i in sampleIndices:
+                call = calls[i]
+                gt.append(genotypeCode(call.get('GT')))
+                gq.append(qualityValue(call.get('GQ')))
+                ad.extend(depthValues(call.get('AD')))
+
+        if len(pos) == 0 and multiallelic == 0 and next(iter(self.variantFile.fetch(chrom)), None) is None:
+            raise MissingContig(chrom, self.vcfFN)
+        recordParseTime(parseStart)
+        countMultiallelic(multiallelic)
+        return packSites(pos, snv, gt, gq, ad, len(sampleIndices))
+
+class Cyvcf2Reader(object):
+    '''
+    Records decoded by htslib through cyvcf2.VCF, FORMAT values come back as arrays so only the requested samples are touched in python
+    '''
+    name = 'cyvcf2'
+
+    def __init__(self, vcfFN):
+        '''
+        @param vcfFN - the VCF or BCF filename, must have a .tbi or .csi index
+        '''
+        import cyvcf2
+        self.vcfFN = vcfFN
+        vcf = cyvcf2.VCF(vcfFN)
+        try:
+            lengths = vcf.seqlens
+        except:
+            #the header has no contig lengths
+            lengths = [None]*len(vcf.seqnames)
+        self.contigs = collections.OrderedDict(zip(vcf.seqnames, lengths))
+        self.samples = list(vcf.samples)
+        vcf.close()
+
+        #htslib only unpacks the samples a VCF object was opened with, so there is one per distinct sample set
+        self.subsets = LruCache(MAX_OPEN_FILES)
+
+    def openSubset(self, sampleLabels):
+        '''
+        @param sampleLabels - the samples to unpack
+        @return - a cyvcf2.VCF limited to those samples, they keep their file order in its arrays
+        '''
+        k = tuple(sorted(set(sampleLabels), key=self.samples.index))
+        vcf = self.subsets.get(k)
+        if vcf is None:
+            import cyvcf2
+            vcf = self.subsets.put(k, cyvcf2.VCF(self.vcfFN, samples=list(k), threads=ioThreads()[0] or None))
+        return vcf
+
+    def extract(self, chrom, sampleLabels, start=None, end=None):
+        vcf = self.openSubset(sampleLabels)
+        sampleIndices = [vcf.samples.index(sampleLabel) for sampleLabel in sampleLabels]
+        numSamples = len(sampleIndices)
+        parseStart = time.perf_counter()
+        multiallelic = 0
+
+        #htslib regions are 1-based and inclusive, an open end reads to the end of the contig
+        region = chrom
+        if start is not None or end is not None:
+            region = chrom+':'+str((start or 0)+1)+'-'+(str(end) if end is not None else '')
+
+        pos = array.array('i')
+        snv = array.array('b')
+        gt = array.array('b')
+        gq = array.array('i')
+        ad = array.array('i')
+        #cyvcf2 warns when a tabix index has no entry for the contig, that case raises below instead
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for variant in vcf(region):
+                recordPos = variant.POS
+                if (start is not None and recordPos <= start) or (end is not None and recordPos > end):
+                    continue
+                if len(variant.ALT) > 1:
+                    multiallelic += 1
+                    continue
+
+                pos.append(recordPos)
+                snv.append(len(variant.REF) == 1)
+
+                #tolist() on the whole array is cheaper than fancy indexing a few rows out of it
+                if not ('GT' in variant.FORMAT):
+                    gt.extend([GT_OTHER]*numSamples)
+                else:
+                    rows = variant.genotype.array().tolist()
+                    for i in sampleIndices:
+                        gt.append(genotypeCode(diploidAlleles(rows[i])))
+
+                qualities = variant.format('GQ')
+                if qualities is None:
+                    gq.extend([MISSING]*numSamples)
+                else:
+                    rows = qualities.tolist()
+                    for i in sampleIndices:
+                        value = rows[i][0]
+                        #float GQ is missing as NaN, int GQ as the htslib missing marker
+                        gq.append(MISSING if value != value or value <= HTS_INT_VECTOR_END else int(value))
+
+                depths = variant.format('AD')
+                if depths is None or depths.shape[1] < 2:
+                    ad.extend([MISSING]*(2*numSamples))
+                else:
+                    rows = depths.tolist()
+                    for i in sampleIndices:
+                        values = rows[i]
+                        if values[0] <= HTS_INT_VECTOR_END or values[1] <= HTS_INT_VECTOR_END or (len(values) > 2 and values[2] != HTS_INT_VECTOR_END):
+                            ad.extend((MISSING, MISSING))
+                        else:
+                            ad.extend(values[0:2])
+
+        if len(pos) == 0 and multiallelic == 0 and not self.hasRecords(vcf, chrom):
+            raise MissingContig(chrom, self.vcfFN)
+        recordParseTime(parseStart)
+        countMultiallelic(multiallelic)
+        return packSites(pos, snv, gt, gq, ad, numSamples)
+
+    def hasRecords(self, vcf, chrom):
+        '''
+        @param vcf - a cyvcf2.VCF from openSubset(...)
+        @param chrom - the contig name
+        @return - True if the contig has at least one record
+        '''
+        with warnings.catch_warnings():
+            #cyvcf2 warns when a tabix index has no entry for the contig
+            warnings.simplefilter('ignore')
+            return next(iter(vcf(chrom)), None) is not None
+
+#the backend classes, keyed on name; RawVcfReader comes through openRawReader(...) so it shares that cache
+BACKENDS = {
+    'cyvcf2' : Cyvcf2Reader,
+    'pysam' : PysamReader,
+    'pyvcf' : PyvcfReader
+}
+
+def openBackend(vcfFN, name):
+    '''
+    @param vcfFN - the VCF filename
+    @param name - the backend name, not "auto"
+    @return - the backend for the file, reused across calls within the same process; raises an exception if the backend is not
+        installed or cannot read the file
+    '''
+    if name == 'raw':
+        return openRawReader(vcfFN)
+    k = (fileStamp(vcfFN), os.getpid(), name, ioThreads()[0])
+    backend = _backends.get(k)
+    if backend is None:
+        backend = _backends.put(k, BACKENDS[name](vcfFN))
+    return backend
+
+def availableReaders(vcfFN):
+    '''
+    @param vcfFN - the VCF filename
+    @return - the backend names, in AUTO_ORDER, that are installed and can read the file
+    '''
+    ret = []
+    for name in AUTO_ORDER:
+        if name in TABIX_ONLY and not isTabixVcf(vcfFN):
+            continue
+        try:
+            openBackend(vcfFN, name)
+        except ImportError:
+            continue
+        ret.append(name)
+    return ret
+
+def openVcf(vcfFN):
+    '''
+    @param vcfFN - the VCF filename, a bgzipped VCF with a tabix index works with every backend, BCF and .csi indexes need cyvcf2 or pysam
+    @return - the selectedReader() backend for the file
+    '''
+    name = selectedReader()
+    if name != 'auto':
+        return openBackend(vcfFN, name)
+    for name in AUTO_ORDER:
+        if name in TABIX_ONLY and not isTabixVcf(vcfFN):
+            continue
+        try:
+            return openBackend(vcfFN, name)
+        except ImportError:
+            pass
+    raise Exception('No installed VCF reader can open '+vcfFN+', BCF files and .csi indices need cyvcf2 or pysam')
+
+def compareSites(expected, sites):
+    '''
+    @param expected - the reference ContigSites
+    @param sites - the ContigSites to check
+    @return - a description of the first difference, or None if the arrays are identical
+    '''
+    for name, expectedValues, values in zip(expected._fields, expected, sites):
+        if expectedValues.shape != values.shape:
+            return name+' shape '+str(values.shape)+' != '+str(expectedValues.shape)
+        mismatch = expectedValues != values
+        if mismatch.ndim > 1:
+            mismatch = mismatch.any(axis=tuple(range(1, mismatch.ndim)))
+        mismatch = mismatch.nonzero()[0]
+        if len(mismatch) > 0:
+            i = mismatch[0]
+            return name+' differs at POS '+str(expected.pos[i])+': '+str(values[i].tolist())+' != '+str(expectedValues[i].tolist())
+    return None
+
+def checkConformance(vcfFN, sampleLabels, readers=None, reference=None):
+    '''
+    This function extracts every contig with each backend and compares the arrays against a reference backend
+    @param vcfFN - the VCF filename
+    @param sampleLabels - the column labels for the samples to extract
+    @param readers - the backend names to check, None checks every availableReaders(...) backend
+    @param reference - the backend the others must match, None uses pyvcf when it can read the file and the last available backend
+        otherwise
+    @return - tuple (reference, results)
+        reference - the backend the others were compared against
+        results - a list of (reader, contigs, sites, seconds, difference) where difference is None when every contig matched
+    '''
+    available = availableReaders(vcfFN)
+    if readers is None:
+        readers = available
+    if reference is None:
+        reference = 'pyvcf' if 'pyvcf' in available else available[-1]
+
+    contigs = openBackend(vcfFN, reference).contigs
+    expected = collections.OrderedDict()
+    for chrom in contigs:
+        try:
+            expected[chrom] = openBackend(vcfFN, reference).extract(chrom, sampleLabels)
+        except MissingContig:
+            #contigs without records are absent for every backend
+            expected[chrom] = None
+
+    ret = []
+    for name in readers:
+        numSites = 0
+        difference = None
+        st = time.perf_counter()
+        for chrom, expectedSites in expected.items():
+            try:
+                sites = openBackend(vcfFN, name).extract(chrom, sampleLabels)
+            except MissingContig:
+                sites = None
+            if (sites is None) != (expectedSites is None):
+                difference = chrom+': records '+('missing' if sites is None else 'present')+' but the reference disagrees'
+            elif sites is not None:
+                numSites += len(sites.pos)
+                diff = compareSites(expectedSites, sites)
+                if diff is not None:
+                    difference = chrom+': '+diff
+            if difference is not None:
+                break
+        ret.append((name, len(expected), numSites, time.perf_counter()-st, difference))
+    return (reference, ret)
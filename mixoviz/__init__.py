@@ -0,0 +1,49 @@
+'''
+Detection and visualization of 2n/3n mixoploidy from a VCF.  The main functions are available from the package, each is imported from
+its module on first use so "import mixoviz" does not load numpy, matplotlib, or PyVCF:
+    calcTrioBiallelic(...) - the diploid/triploid ratio table for a trio, returns a TrioMixoploid.RatioTable
+    plotTrioBiallelic(...) - the 3x3 trio B-allele figures, returns a TrioBAllele.TrioPlots
+    plotChromosomeCalls(...) - the single-sample B-allele figures, returns a BAllele.SamplePlots
+    createTrioReport(...) - all of the above from a single scan of the VCF
+    exportPyramid(...) - a multi-resolution pyramid of binned B-allele frequencies for fast browsing, read with BafPyramid
+    calcCohort(...) - the ratio table for every trio in a joint-called VCF
+    approxTrioBiallelic(...) - a fast approximate autosome diploid fraction that stops once its interval is narrow enough
+    sweepTrioBiallelic(...) - the ratio table for a grid of depth and quality thresholds from one scan, returns a ThresholdSweep.SweepTable
+    simulateTrio(...) - write a synthetic trio VCF with a known diploid fraction
+'''
+
+import importlib
+
+#the name exported by the package and the module it comes from
+_EXPORTS = {
+    'calcTrioBiallelic': 'TrioMixoploid',
+    'RatioTable': 'TrioMixoploid',
+    'WindowSpec': 'TrioMixoploid',
+    'plotTrioBiallelic': 'TrioBAllele',
+    'TrioPlots': 'TrioBAllele',
+    'plotChromosomeCalls': 'BAllele',
+    'SamplePlots': 'BAllele',
+    'createTrioReport': 'TrioReport',
+    'exportPyramid': 'BafPyramid',
+    'BafPyramid': 'BafPyramid',
+    'PyramidExport': 'BafPyramid',
+    'calcCohort': 'CohortMixoploid',
+    'approxTrioBiallelic': 'ApproxMixoploid',
+    'ApproxRatio': 'ApproxMixoploid',
+    'sweepTrioBiallelic': 'ThresholdSweep',
+    'SweepTable': 'ThresholdSweep',
+    'simulateTrio': 'SimulateTrio',
+    'SimParams': 'SimulateTrio'
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module('.'+_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError('module '+repr(__name__)+' has no attribute '+repr(name))
+
+def __dir__():
+    return sorted(list(globals())+__all__)
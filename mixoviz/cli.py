@@ -0,0 +1,676 @@
+'''
+The mixoviz command line, each analysis is a subcommand (see "mixoviz -h").  Only argparse and the constants in Options.py are imported
+here, the analysis modules are imported once a subcommand runs so the help is printed without loading numpy, matplotlib, or PyVCF.
+'''
+
+import argparse as ap
+import sys
+
+from .Options import (BENCHMARK_STAGES, CI_LEVEL, DEFAULT_HOST, DEFAULT_IO_QUEUE, DEFAULT_LABELS, DEFAULT_PORT, DEFAULT_PYRAMID_BAF_BINS,
+    DEFAULT_PYRAMID_BIN_SIZE, DEFAULT_APPROX_REGION, DEFAULT_APPROX_TOLERANCE, DEFAULT_SWEEP_DEPTHS, DEFAULT_SWEEP_QUALITIES, IMAGE_FORMATS, READER_NAMES)
+
+def addReaderArguments(p):
+    '''
+    @param p - the parser to add the VCF reader arguments to, shared by every command that scans a VCF
+    '''
+    p.add_argument('--reader', metavar='reader', dest='reader', type=str, default='auto', choices=READER_NAMES, help='the VCF reader backend, one of '+', '.join(READER_NAMES)+'; auto picks the fastest installed one\nthat can read the file (default: auto)')
+    p.add_argument('--io-threads', metavar='threads', dest='ioThreads', type=int, default=0, help='threads per process that decompress BGZF blocks ahead of the parser (default: 0, decompress inline)')
+    p.add_argument('--io-queue', metavar='blocks', dest='ioQueue', type=int, default=DEFAULT_IO_QUEUE, help='most BGZF blocks decompressed ahead of the parser with --io-threads (default: '+str(DEFAULT_IO_QUEUE)+')')
+
+def setReaderOptions(args):
+    '''
+    @param args - parsed arguments from a parser that addReaderArguments(...) was called on
+    '''
+    from .Bgzf import setIoThreads
+    from .VcfReaders import setReader
+    setReader(args.reader)
+    setIoThreads(args.ioThreads, args.ioQueue)
+
+def intList(value):
+    '''
+    @param value - a comma-separated list of integers from the command line
+    @return - the list of integers
+    '''
+    try:
+        return [int(x) for x in value.split(',') if x != '']
+    except ValueError:
+        raise ap.ArgumentTypeError('expected a comma-separated list of integers: '+value)
+
+def addBAlleleArguments(p):
+    '''
+    @param p - the parser to add the "ballele" arguments to
+    '''
+    #optional arguments with default
+    p.add_argument('-d', metavar='depth', dest='depth', type=int, default=8, help='minimum read depth to consider a variant (default: 8)')
+    p.add_argument('-q', metavar='quality', dest='quality', type=int, default=0, help='minimum quality to consider a variant (default: 0)')
+    p.add_argument('--cache', metavar='cacheDir', dest='cacheDir', type=str, default=None, help='directory for cached per-site arrays, reused across runs and scripts (default: no cache)')
+    p.add_argument('-r', '--render-threads', metavar='renderThreads', dest='renderThreads', type=int, default=1, help='number of worker processes used to draw figures (default: 1)')
+    p.add_argument('--format', metavar='format', dest='imageFormat', type=str, default='png', choices=IMAGE_FORMATS, help='image format for the figures, one of '+', '.join(IMAGE_FORMATS)+' (default: png)')
+    p.add_argument('--dpi', metavar='dpi', dest='dpi', type=int, default=None, help='resolution of the saved figures (default: matplotlib default)')
+    p.add_argument('--density', dest='density', action='store_true', default=False, help='draw binned density images instead of alpha-blended scatter plots')
+    p.add_argument('--stats', metavar='statsFN', dest='statsFN', type=str, default=None, help='write a JSON report of the time spent in each stage and the sites rejected by each filter\n(default: no report)')
+    p.add_argument('--profile', metavar='profileFN', dest='profileFN', type=str, default=None, help='write a cProfile dump of the whole run, including render worker processes (default: no profile)')
+    addReaderArguments(p)
+
+    #required main arguments
+    p.add_argument('inputVCF', type=str, help='the input VCF file to analyze, bgzipped with a tabix index or an indexed BCF file')
+    p.add_argument('sample', type=str, help='the sample identifier in the vcf')
+    p.add_argument('outputDir', type=str, help='the output .png file to write')
+
+def runBAllele(args):
+    '''
+    @param args - the parsed "ballele" arguments
+    '''
+    from .BAllele import plotChromosomeCalls
+    from .RunStats import instrumented
+
+    #run the B-allele frequency script
+    setReaderOptions(args)
+    with instrumented(args.statsFN, args.profileFN):
+        plots = plotChromosomeCalls(args.inputVCF, args.sample, args.outputDir, args.depth, args.quality, args.cacheDir, args.density,
+            args.imageFormat, args.dpi, args.renderThreads)
+    plots.write()
+
+def addTrioBAlleleArguments(p):
+    '''
+    @param p - the parser to add the "trio-ballele" arguments to
+    '''
+    #optional arguments with default
+    DEFAULT_DEPTH = 20
+    p.add_argument('-d', metavar='depth', dest='depth', type=int, default=DEFAULT_DEPTH, help='minimum read depth to consider a variant (default: '+str(DEFAULT_DEPTH)+')')
+    p.add_argument('-q', metavar='quality', dest='quality', type=int, default=20, help='minimum quality to consider a variant (default: 20)')
+    p.add_argument('-t', '--threads', metavar='threads', dest='threads', type=int, default=1, help='number of worker processes used to scan contigs (default: 1)')
+    p.add_argument('--cache', metavar='cacheDir', dest='cacheDir', type=str, default=None, help='directory for cached per-site arrays, reused across runs and scripts (default: no cache)')
+    p.add_argument('--shard-size', metavar='bp', dest='shardSize', type=int, default=None, help='split contigs into regions of at most this many base pairs, scanned largest first (default: whole contigs)')
+    p.add_argument('--regions', metavar='bedFN', dest='regionsFN', type=str, default=None, help='only use the records inside the regions of this BED file (default: everything)')
+    p.add_argument('-r', '--render-threads', metavar='renderThreads', dest='renderThreads', type=int, default=1, help='number of worker processes used to draw figures (default: 1)')
+    p.add_argument('--format', metavar='format', dest='imageFormat', type=str, default='png', choices=IMAGE_FORMATS, help='image format for the figures, one of '+', '.join(IMAGE_FORMATS)+' (default: png)')
+    p.add_argument('--dpi', metavar='dpi', dest='dpi', type=int, default=None, help='resolution of the saved figures (default: matplotlib default)')
+    p.add_argument('--overlay', metavar='trackFN', dest='overlayFN', type=str, default=None, help='a BED track from TrioMixoploid.py --track, the windowed fit is drawn over the\n0/0 1/1 and 1/1 0/0 panels (default: none)')
+    p.add_argument('--density', dest='density', action='store_true', default=False, help='draw binned density images instead of alpha-blended scatter plots')
+    p.add_argument('--stats', metavar='statsFN', dest='statsFN', type=str, default=None, help='write a JSON report of the time spent in each stage and the sites rejected by each filter\n(default: no report)')
+    p.add_argument('--profile', metavar='profileFN', dest='profileFN', type=str, default=None, help='write a cProfile dump of the whole run, including worker processes (default: no profile)')
+    addReaderArguments(p)
+
+    #required main arguments
+    p.add_argument('inputVCF', type=str, help='a tabix-formatted VCF file (data.vcf.gz) or an indexed BCF file (data.bcf) to analyze')
+    p.add_argument('proband', type=str, help='proband identifier in VCF')
+    p.add_argument('father', type=str, help='father identifier in VCF')
+    p.add_argument('mother', type=str, help='mother identifier in VCF')
+    p.add_argument('outputDir', type=str, help='the output directory')
+
+def runTrioBAllele(args):
+    '''
+    @param args - the parsed "trio-ballele" arguments
+    '''
+    from .RunStats import instrumented
+    from .TrioBAllele import plotTrioBiallelic
+
+    #run the trio B-allele plot script
+    setReaderOptions(args)
+    with instrumented(args.statsFN, args.profileFN):
+        plots = plotTrioBiallelic(args.inputVCF, args.proband, args.father, args.mother, args.outputDir, args.depth, args.quality, args.threads,
+            args.cacheDir, args.density, args.imageFormat, args.dpi, args.renderThreads, args.overlayFN, args.shardSize, args.regionsFN)
+    plots.write()
+
+def addTrioMixoploidArguments(p):
+    '''
+    @param p - the parser to add the "trio-mixoploid" arguments to
+    '''
+    #optional arguments with default
+    DEFAULT_DEPTH = 20
+    DEFAULT_QUAL = 20
+    p.add_argument('-d', metavar='depth', dest='depth', type=int, default=DEFAULT_DEPTH, help='minimum read depth to consider a variant (default: '+str(DEFAULT_DEPTH)+')')
+    p.add_argument('-q', metavar='quality', dest='quality', type=int, default=DEFAULT_QUAL, help='minimum quality to consider a variant (default: '+str(DEFAULT_QUAL)+')')
+    p.add_argument('-t', '--threads', metavar='threads', dest='threads', type=int, default=1, help='number of worker processes used to scan contigs (default: 1)')
+    p.add_argument('--cache', metavar='cacheDir', dest='cacheDir', type=str, default=None, help='directory for cached per-site arrays, reused across runs and scripts (default: no cache)')
+    p.add_argument('--shard-size', metavar='bp', dest='shardSize', type=int, default=None, help='split contigs into regions of at most this many base pairs, scanned largest first (default: whole contigs)')
+    p.add_argument('--regions', metavar='bedFN', dest='regionsFN', type=str, default=None, help='only use the records inside the regions of this BED file (default: everything)')
+    p.add_argument('--bins', metavar='bins', dest='bins', type=int, default=None, help='estimate the medians from a B-allele frequency histogram with this many bins so memory stays constant\nin the number of sites, adds columns bounding the difference from exact medians (default: exact medians)')
+    p.add_argument('--bootstrap', metavar='replicates', dest='bootstrap', type=int, default=0, help='number of bootstrap replicates, adds '+str(CI_LEVEL)+'%% confidence interval columns (default: 0)')
+    p.add_argument('--seed', metavar='seed', dest='seed', type=int, default=0, help='random seed for the bootstrap replicates (default: 0)')
+    DEFAULT_WINDOW = 1000000
+    p.add_argument('--track', metavar='trackFN', dest='trackFN', type=str, default=None, help='also estimate the ratios in sliding windows along each chromosome and write them to this BED file\n(default: no windows)')
+    p.add_argument('-w', '--window', metavar='size', dest='windowSize', type=int, default=DEFAULT_WINDOW, help='the window size for --track (default: '+str(DEFAULT_WINDOW)+')')
+    p.add_argument('-s', '--step', metavar='step', dest='windowStep', type=int, default=None, help='the distance between window starts for --track (default: one tenth of the window size)')
+    p.add_argument('--site-windows', dest='siteWindows', action='store_true', default=False, help='the window size and step count informative sites instead of base pairs')
+    p.add_argument('--sweep', dest='sweep', action='store_true', default=False, help='print a long-format table with the rows of every combination of --depths and --qualities\nfrom one scan, instead of the table for -d and -q')
+    p.add_argument('--depths', metavar='depths', dest='depths', type=intList, default=DEFAULT_SWEEP_DEPTHS, help='comma-separated minimum read depths for --sweep (default: '+','.join([str(x) for x in DEFAULT_SWEEP_DEPTHS])+')')
+    p.add_argument('--qualities', metavar='qualities', dest='qualities', type=intList, default=DEFAULT_SWEEP_QUALITIES, help='comma-separated minimum qualities for --sweep (default: '+','.join([str(x) for x in DEFAULT_SWEEP_QUALITIES])+')')
+    p.add_argument('--approx', dest='approx', action='store_true', default=False, help='estimate only the autosome diploid_frac from random regions, stopping once its '+str(CI_LEVEL)+'%% interval\nis narrower than --tolerance or a budget is used up, for fast triage')
+    p.add_argument('--tolerance', metavar='width', dest='tolerance', type=float, default=DEFAULT_APPROX_TOLERANCE, help='the interval width that stops --approx (default: '+str(DEFAULT_APPROX_TOLERANCE)+')')
+    p.add_argument('--max-sites', metavar='sites', dest='maxSites', type=int, default=None, help='stop --approx after this many informative sites (default: no limit)')
+    p.add_argument('--max-seconds', metavar='seconds', dest='maxSeconds', type=float, default=None, help='stop --approx after this many seconds (default: no limit)')
+    p.add_argument('--approx-region', metavar='bp', dest='approxRegion', type=int, default=DEFAULT_APPROX_REGION, help='the size of each region read by --approx (default: '+str(DEFAULT_APPROX_REGION)+')')
+    p.add_argument('--heatmap', metavar='imageFN', dest='heatmapFN', type=str, default=None, help='with --sweep, also draw the autosome diploid_frac of each combination as a heatmap (default: none)')
+    p.add_argument('--stats', metavar='statsFN', dest='statsFN', type=str, default=None, help='write a JSON report of the time spent in each stage and the sites rejected by each filter\n(default: no report)')
+    p.add_argument('--profile', metavar='profileFN', dest='profileFN', type=str, default=None, help='write a cProfile dump of the whole run, including worker processes (default: no profile)')
+    addReaderArguments(p)
+
+    #required main arguments
+    p.add_argument('inputVCF', type=str, help='a tabix-formatted VCF file (data.vcf.gz) or an indexed BCF file (data.bcf) to analyze')
+    p.add_argument('proband', type=str, help='proband identifier in VCF')
+    p.add_argument('father', type=str, help='father identifier in VCF')
+    p.add_argument('mother', type=str, help='mother identifier in VCF')
+
+def runTrioMixoploid(args):
+    '''
+    @param args - the parsed "trio-mixoploid" arguments
+    '''
+    from .RunStats import instrumented
+    from .TrioMixoploid import WindowSpec, calcTrioBiallelic
+
+    setReaderOptions(args)
+    if args.sweep:
+        runSweep(args)
+        return
+    if args.approx:
+        runApprox(args)
+        return
+    if args.heatmapFN is not None:
+        raise Exception('--heatmap requires --sweep')
+
+    #run the trio ratio calculation
+    windowStep = args.windowStep if args.windowStep is not None else max(args.windowSize//10, 1)
+    if args.windowSize < 1 or windowStep < 1:
+        raise Exception('The window size and step must be at least 1, got -w '+str(args.windowSize)+' and -s '+str(windowStep))
+    with instrumented(args.statsFN, args.profileFN):
+        table = calcTrioBiallelic(args.inputVCF, args.proband, args.father, args.mother, args.depth, args.quality, args.threads, args.cacheDir,
+            args.bins, args.bootstrap, args.seed, args.trackFN, WindowSpec(args.windowSize, windowStep, args.siteWindows),
+            args.shardSize, args.regionsFN)
+    table.write()
+
+def runApprox(args):
+    '''
+    @param args - the parsed "trio-mixoploid" arguments with --approx set
+    '''
+    from .ApproxMixoploid import approxTrioBiallelic
+    from .RunStats import instrumented
+
+    if args.trackFN is not None or args.heatmapFN is not None or args.bins is not None or args.bootstrap > 0:
+        raise Exception('--approx cannot be combined with --track, --heatmap, --bins, or --bootstrap')
+
+    #read random regions until the estimate is good enough
+    with instrumented(args.statsFN, args.profileFN):
+        estimate = approxTrioBiallelic(args.inputVCF, args.proband, args.father, args.mother, args.depth, args.quality, args.tolerance,
+            args.maxSites, args.maxSeconds, args.approxRegion, args.threads, args.cacheDir, args.seed, args.regionsFN)
+    estimate.write()
+
+def runSweep(args):
+    '''
+    @param args - the parsed "trio-mixoploid" arguments with --sweep set
+    '''
+    from .RunStats import instrumented
+    from .ThresholdSweep import plotSweepHeatmap, sweepTrioBiallelic
+
+    if args.trackFN is not None or args.approx:
+        raise Exception('--sweep cannot be combined with --track or --approx')
+    if args.heatmapFN is not None and args.heatmapFN.split('.')[-1] not in IMAGE_FORMATS:
+        raise Exception('The heatmap file must end in one of: '+', '.join(IMAGE_FORMATS))
+
+    #run the trio ratio calculation for every combination of thresholds
+    with instrumented(args.statsFN, args.profileFN):
+        table = sweepTrioBiallelic(args.inputVCF, args.proband, args.father, args.mother, args.depths, args.qualities, args.threads,
+            args.cacheDir, args.bins, args.bootstrap, args.seed, args.shardSize, args.regionsFN)
+    table.write()
+    if args.heatmapFN is not None:
+        plotSweepHeatmap(table, args.heatmapFN)
+
+def addTrioReportArguments(p):
+    '''
+    @param p - the parser to add the "trio-report" arguments to
+    '''
+    #optional arguments with default
+    DEFAULT_DEPTH = 20
+    DEFAULT_QUAL = 20
+    DEFAULT_SAMPLE_DEPTH = 8
+    DEFAULT_SAMPLE_QUAL = 0
+    p.add_argument('-d', metavar='depth', dest='depth', type=int, default=DEFAULT_DEPTH, help='minimum read depth to consider a trio variant (default: '+str(DEFAULT_DEPTH)+')')
+    p.add_argument('-q', metavar='quality', dest='quality', type=int, default=DEFAULT_QUAL, help='minimum quality to consider a trio variant (default: '+str(DEFAULT_QUAL)+')')
+    p.add_argument('-D', metavar='sampleDepth', dest='sampleDepth', type=int, default=DEFAULT_SAMPLE_DEPTH, help='minimum read depth for the single-sample plots (default: '+str(DEFAULT_SAMPLE_DEPTH)+')')
+    p.add_argument('-Q', metavar='sampleQuality', dest='sampleQuality', type=int, default=DEFAULT_SAMPLE_QUAL, help='minimum quality for the single-sample plots (default: '+str(DEFAULT_SAMPLE_QUAL)+')')
+    p.add_argument('-t', '--threads', metavar='threads', dest='threads', type=int, default=1, help='number of worker processes used to scan contigs (default: 1)')
+    p.add_argument('--cache', metavar='cacheDir', dest='cacheDir', type=str, default=None, help='directory for cached per-site arrays, reused across runs and scripts (default: no cache)')
+    p.add_argument('--shard-size', metavar='bp', dest='shardSize', type=int, default=None, help='split contigs into regions of at most this many base pairs, scanned largest first (default: whole contigs)')
+    p.add_argument('--regions', metavar='bedFN', dest='regionsFN', type=str, default=None, help='only use the records inside the regions of this BED file (default: everything)')
+    p.add_argument('-r', '--render-threads', metavar='renderThreads', dest='renderThreads', type=int, default=1, help='number of worker processes used to draw figures (default: 1)')
+    p.add_argument('--format', metavar='format', dest='imageFormat', type=str, default='png', choices=IMAGE_FORMATS, help='image format for the figures, one of '+', '.join(IMAGE_FORMATS)+' (default: png)')
+    p.add_argument('--dpi', metavar='dpi', dest='dpi', type=int, default=None, help='resolution of the saved figures (default: matplotlib default)')
+    p.add_argument('--density', dest='density', action='store_true', default=False, help='draw binned density images instead of alpha-blended scatter plots')
+    addReaderArguments(p)
+
+    #required main arguments
+    p.add_argument('inputVCF', type=str, help='a tabix-formatted VCF file (data.vcf.gz) or an indexed BCF file (data.bcf) to analyze')
+    p.add_argument('proband', type=str, help='proband identifier in VCF')
+    p.add_argument('father', type=str, help='father identifier in VCF')
+    p.add_argument('mother', type=str, help='mother identifier in VCF')
+    p.add_argument('outputDir', type=str, help='the output directory')
+
+def runTrioReport(args):
+    '''
+    @param args - the parsed "trio-report" arguments
+    '''
+    from .TrioReport import createTrioReport
+
+    #run every part of the report
+    setReaderOptions(args)
+    createTrioReport(args.inputVCF, args.proband, args.father, args.mother, args.outputDir, args.depth, args.quality,
+        args.sampleDepth, args.sampleQuality, args.threads, args.cacheDir, args.density, args.imageFormat, args.dpi, args.renderThreads,
+        args.shardSize, args.regionsFN)
+
+def addTrioPyramidArguments(p):
+    '''
+    @param p - the parser to add the "trio-pyramid" arguments to
+    '''
+    #optional arguments with default
+    DEFAULT_DEPTH = 20
+    DEFAULT_QUAL = 20
+    DEFAULT_SAMPLE_DEPTH = 8
+    DEFAULT_SAMPLE_QUAL = 0
+    p.add_argument('-d', metavar='depth', dest='depth', type=int, default=DEFAULT_DEPTH, help='minimum read depth to consider a trio variant (default: '+str(DEFAULT_DEPTH)+')')
+    p.add_argument('-q', metavar='quality', dest='quality', type=int, default=DEFAULT_QUAL, help='minimum quality to consider a trio variant (default: '+str(DEFAULT_QUAL)+')')
+    p.add_argument('-D', metavar='sampleDepth', dest='sampleDepth', type=int, default=DEFAULT_SAMPLE_DEPTH, help='minimum read depth for the single-sample panels (default: '+str(DEFAULT_SAMPLE_DEPTH)+')')
+    p.add_argument('-Q', metavar='sampleQuality', dest='sampleQuality', type=int, default=DEFAULT_SAMPLE_QUAL, help='minimum quality for the single-sample panels (default: '+str(DEFAULT_SAMPLE_QUAL)+')')
+    p.add_argument('-t', '--threads', metavar='threads', dest='threads', type=int, default=1, help='number of worker processes used to scan contigs (default: 1)')
+    p.add_argument('--cache', metavar='cacheDir', dest='cacheDir', type=str, default=None, help='directory for cached per-site arrays, reused across runs and scripts (default: no cache)')
+    p.add_argument('--shard-size', metavar='bp', dest='shardSize', type=int, default=None, help='split contigs into regions of at most this many base pairs, scanned largest first (default: whole contigs)')
+    p.add_argument('--regions', metavar='bedFN', dest='regionsFN', type=str, default=None, help='only use the records inside the regions of this BED file (default: everything)')
+    p.add_argument('--bin-size', metavar='bp', dest='binSize', type=int, default=DEFAULT_PYRAMID_BIN_SIZE, help='position bin size of the finest level, a power of two (default: '+str(DEFAULT_PYRAMID_BIN_SIZE)+')')
+    p.add_argument('--baf-bins', metavar='bins', dest='bafBins', type=int, default=DEFAULT_PYRAMID_BAF_BINS, help='number of B-allele frequency bins (default: '+str(DEFAULT_PYRAMID_BAF_BINS)+')')
+    addReaderArguments(p)
+
+    #required main arguments
+    p.add_argument('inputVCF', type=str, help='a tabix-formatted VCF file (data.vcf.gz) or an indexed BCF file (data.bcf) to analyze')
+    p.add_argument('proband', type=str, help='proband identifier in VCF')
+    p.add_argument('father', type=str, help='father identifier in VCF')
+    p.add_argument('mother', type=str, help='mother identifier in VCF')
+    p.add_argument('outputFN', type=str, help='the pyramid file to write (pyramid.npz)')
+
+def runTrioPyramid(args):
+    '''
+    @param args - the parsed "trio-pyramid" arguments
+    '''
+    from .BafPyramid import exportPyramid
+
+    #scan the VCF once and write every level
+    setReaderOptions(args)
+    export = exportPyramid(args.inputVCF, args.proband, args.father, args.mother, args.outputFN, args.depth, args.quality, args.sampleDepth,
+        args.sampleQuality, args.threads, args.cacheDir, args.binSize, args.bafBins, args.shardSize, args.regionsFN)
+    export.write()
+
+def addPyramidViewArguments(p):
+    '''
+    @param p - the parser to add the "pyramid-view" arguments to
+    '''
+    p.add_argument('--region', metavar='region', dest='region', type=str, default=None, help='the region to draw as "chrom" or "chrom:start-end" (default: a karyogram of every contig)')
+    p.add_argument('--samples', dest='samples', action='store_true', default=False, help='draw the proband, father, and mother in the region instead of the parental genotype classes')
+    p.add_argument('--panel', metavar='panel', dest='panel', type=str, default=None, help='the sample or parental genotype class (such as "0/0 1/1") drawn in the karyogram (default: the proband)')
+    p.add_argument('--dpi', metavar='dpi', dest='dpi', type=int, default=None, help='resolution of the saved figure (default: matplotlib default)')
+
+    #required main arguments
+    p.add_argument('pyramidFN', type=str, help='a pyramid file written by "mixoviz trio-pyramid"')
+    p.add_argument('outputFN', type=str, help='the image file to write, one of '+', '.join(IMAGE_FORMATS)+' by extension')
+
+def runPyramidView(args):
+    '''
+    @param args - the parsed "pyramid-view" arguments
+    '''
+    from .BafPyramid import renderKaryogram, renderRegion
+
+    if args.outputFN.split('.')[-1] not in IMAGE_FORMATS:
+        raise Exception('The image file must end in one of: '+', '.join(IMAGE_FORMATS))
+    if args.region is None:
+        renderKaryogram(args.pyramidFN, args.outputFN, args.panel, args.dpi)
+    else:
+        renderRegion(args.pyramidFN, args.outputFN, args.region, args.samples, args.dpi)
+
+def addCohortMixoploidArguments(p):
+    '''
+    @param p - the parser to add the "cohort-mixoploid" arguments to
+    '''
+    #optional arguments with default
+    DEFAULT_DEPTH = 20
+    DEFAULT_QUAL = 20
+    p.add_argument('-d', metavar='depth', dest='depth', type=int, default=DEFAULT_DEPTH, help='minimum read depth to consider a variant (default: '+str(DEFAULT_DEPTH)+')')
+    p.add_argument('-q', metavar='quality', dest='quality', type=int, default=DEFAULT_QUAL, help='minimum quality to consider a variant (default: '+str(DEFAULT_QUAL)+')')
+    p.add_argument('-l', '--long', dest='longFormat', action='store_true', default=False, help='write one long-format table (cohort.tsv) instead of one table per trio')
+    p.add_argument('-t', '--threads', metavar='threads', dest='threads', type=int, default=1, help='number of worker processes used to scan contigs (default: 1)')
+    p.add_argument('--cache', metavar='cacheDir', dest='cacheDir', type=str, default=None, help='directory for cached per-site arrays, reused across runs and scripts (default: no cache)')
+    p.add_argument('--shard-size', metavar='bp', dest='shardSize', type=int, default=None, help='split contigs into regions of at most this many base pairs, scanned largest first (default: whole contigs)')
+    p.add_argument('--regions', metavar='bedFN', dest='regionsFN', type=str, default=None, help='only use the records inside the regions of this BED file (default: everything)')
+    p.add_argument('--bins', metavar='bins', dest='bins', type=int, default=None, help='estimate the medians from a B-allele frequency histogram with this many bins so memory stays constant\nin the number of sites, adds columns bounding the difference from exact medians (default: exact medians)')
+    p.add_argument('--bootstrap', metavar='replicates', dest='bootstrap', type=int, default=0, help='number of bootstrap replicates, adds '+str(CI_LEVEL)+'%% confidence interval columns (default: 0)')
+    p.add_argument('--seed', metavar='seed', dest='seed', type=int, default=0, help='random seed for the bootstrap replicates (default: 0)')
+    addReaderArguments(p)
+
+    #required main arguments
+    p.add_argument('inputVCF', type=str, help='a tabix-formatted VCF file (data.vcf.gz) or an indexed BCF file (data.bcf) to analyze')
+    p.add_argument('trioManifest', type=str, help='a PED file, or a file with "proband father mother" on each line')
+    p.add_argument('outputDir', type=str, help='the output directory, one <proband>.tsv is written per trio')
+
+def runCohortMixoploid(args):
+    '''
+    @param args - the parsed "cohort-mixoploid" arguments
+    '''
+    from .CohortMixoploid import calcCohort
+
+    #run the cohort calculation
+    setReaderOptions(args)
+    calcCohort(args.inputVCF, args.trioManifest, args.outputDir, args.depth, args.quality, args.longFormat, args.threads, args.cacheDir, args.bins,
+        args.bootstrap, args.seed, args.shardSize, args.regionsFN)
+
+def addConformanceArguments(p):
+    '''
+    @param p - the parser to add the "conformance" arguments to
+    '''
+    #optional arguments with default
+    DEFAULT_DEPTH = 20
+    DEFAULT_QUAL = 20
+    p.add_argument('-d', metavar='depth', dest='depth', type=int, default=DEFAULT_DEPTH, help='minimum read depth for the ratio tables that are compared (default: '+str(DEFAULT_DEPTH)+')')
+    p.add_argument('-q', metavar='quality', dest='quality', type=int, default=DEFAULT_QUAL, help='minimum quality for the ratio tables that are compared (default: '+str(DEFAULT_QUAL)+')')
+    p.add_argument('--readers', metavar='readers', dest='readers', type=str, default=None, help='comma separated reader backends to check (default: every installed one that can read the file)')
+    p.add_argument('--reference', metavar='reader', dest='reference', type=str, default=None, help='the reader backend the others must match (default: pyvcf when it can read the file)')
+
+    #required main arguments
+    p.add_argument('inputVCF', type=str, help='a tabix-formatted VCF file (data.vcf.gz) or an indexed BCF file (data.bcf) to check')
+    p.add_argument('proband', type=str, help='proband identifier in VCF')
+    p.add_argument('father', type=str, help='father identifier in VCF')
+    p.add_argument('mother', type=str, help='mother identifier in VCF')
+
+def runConformance(args):
+    '''
+    @param args - the parsed "conformance" arguments
+    '''
+    import io
+    from .TrioMixoploid import calcTrioBiallelic
+    from .VcfReaders import checkConformance, setReader
+
+    def ratioTable(name):
+        '''
+        @param name - the reader backend to use
+        @return - the ratio table as written to the TSV output, so contigs without informative sites compare equal
+        '''
+        setReader(name)
+        fp = io.StringIO()
+        calcTrioBiallelic(args.inputVCF, args.proband, args.father, args.mother, args.depth, args.quality).write(fp)
+        return fp.getvalue()
+
+    readers = args.readers.split(',') if args.readers is not None else None
+    for name in (readers or [])+[args.reference or 'pyvcf']:
+        if name == 'auto' or not (name in READER_NAMES):
+            raise Exception('Unknown VCF reader "'+name+'", expected one of: '+', '.join(READER_NAMES[1:]))
+
+    #every backend must extract the same arrays, and produce the same ratio table from them
+    sampleLabels = [args.proband, args.father, args.mother]
+    reference, results = checkConformance(args.inputVCF, sampleLabels, readers, args.reference)
+    expectedTable = ratioTable(reference)
+
+    print('#reference\t'+reference)
+    print('#reader\tcontigs\tsites\tseconds\tresult')
+    failed = False
+    for name, numContigs, numSites, seconds, difference in results:
+        if difference is None and ratioTable(name) != expectedTable:
+            difference = 'the ratio table differs'
+        failed = failed or difference is not None
+        print('\t'.join([name, str(numContigs), str(numSites), '%0.3f' % seconds, 'ok' if difference is None else difference]))
+    if failed:
+        sys.exit(1)
+
+def addSimulateArguments(p):
+    '''
+    @param p - the parser to add the "simulate" arguments to
+    '''
+    #optional arguments with default
+    p.add_argument('-n', '--sites', metavar='sites', dest='sites', type=int, default=100000, help='the number of records to write (default: 100000)')
+    p.add_argument('-p', metavar='diploidFrac', dest='diploidFrac', type=float, default=0.7, help='the true fraction of diploid cells in the proband (default: 0.7)')
+    p.add_argument('--contigs', metavar='contigs', dest='contigs', type=str, default=None, help='comma separated name:length list of contigs, sites are spread in proportion to length\n(default: GRCh38 chr1-chr22 and chrX)')
+    p.add_argument('--depth', metavar='depth', dest='depth', type=float, default=35, help='the mean read depth of each call (default: 35)')
+    p.add_argument('--dispersion', metavar='size', dest='dispersion', type=float, default=None, help='draw depths from a negative binomial with this size parameter, smaller is more overdispersed\n(default: Poisson depths)')
+    p.add_argument('--error-rate', metavar='rate', dest='errorRate', type=float, default=0.001, help='the chance a read shows the other allele (default: 0.001)')
+    p.add_argument('--multiallelic-rate', metavar='rate', dest='multiallelicRate', type=float, default=0.02, help='the fraction of records with two ALT alleles (default: 0.02)')
+    p.add_argument('--indel-rate', metavar='rate', dest='indelRate', type=float, default=0.1, help='the fraction of records that are insertions or deletions (default: 0.1)')
+    p.add_argument('--labels', metavar='labels', dest='labels', type=str, default=','.join(DEFAULT_LABELS), help='comma separated proband, father, and mother column labels (default: '+','.join(DEFAULT_LABELS)+')')
+    p.add_argument('--seed', metavar='seed', dest='seed', type=int, default=0, help='random seed (default: 0)')
+
+    #required main arguments
+    p.add_argument('outputVCF', type=str, help='the VCF file to write (sim.vcf.gz), the index is written next to it')
+
+def runSimulate(args):
+    '''
+    @param args - the parsed "simulate" arguments
+    '''
+    from .SimulateTrio import SimParams, parseContigs, simulateTrio
+
+    #write the VCF
+    sampleLabels = args.labels.split(',')
+    if len(sampleLabels) != 3:
+        raise Exception('Expected three labels for --labels, got: '+args.labels)
+    params = SimParams(args.diploidFrac, args.depth, args.dispersion, args.errorRate, args.multiallelicRate, args.indelRate)
+    simulateTrio(args.outputVCF, args.sites, parseContigs(args.contigs), params, sampleLabels, args.seed)
+
+def addBenchmarkArguments(p):
+    '''
+    @param p - the parser to add the "benchmark" arguments to
+    '''
+    #optional arguments with default
+    DEFAULT_SCALES = '100000,1000000,5000000'
+    p.add_argument('-n', '--scales', metavar='scales', dest='scales', type=str, default=DEFAULT_SCALES, help='comma separated numbers of records to simulate (default: '+DEFAULT_SCALES+')')
+    p.add_argument('--stages', metavar='stages', dest='stages', type=str, default=','.join(BENCHMARK_STAGES), help='comma separated stages to time, from '+', '.join(BENCHMARK_STAGES)+' (default: all)')
+    p.add_argument('--repeats', metavar='repeats', dest='repeats', type=int, default=1, help='number of times to run each stage (default: 1)')
+    p.add_argument('-p', metavar='diploidFrac', dest='diploidFrac', type=float, default=0.7, help='the true diploid fraction to simulate (default: 0.7)')
+    p.add_argument('--seed', metavar='seed', dest='seed', type=int, default=0, help='random seed for the simulated VCFs (default: 0)')
+    p.add_argument('-t', '--threads', metavar='threads', dest='threads', type=int, default=1, help='number of worker processes passed to the scripts that scan contigs (default: 1)')
+    p.add_argument('-r', '--render-threads', metavar='renderThreads', dest='renderThreads', type=int, default=1, help='number of worker processes passed to the scripts that draw figures (default: 1)')
+    p.add_argument('--io-threads', metavar='threads', dest='ioThreads', type=int, default=0, help='BGZF decompression threads passed to every script (default: 0)')
+    p.add_argument('-o', '--output', metavar='jsonFN', dest='outputFN', type=str, default=None, help='the JSON file to write (default: stdout)')
+
+    #required main arguments
+    p.add_argument('workDir', type=str, help='the directory for the simulated VCFs and script outputs')
+
+def runBenchmarkCommand(args):
+    '''
+    @param args - the parsed "benchmark" arguments
+    '''
+    import json
+    import os
+    from .Benchmark import runBenchmark
+
+    #run every stage at every scale
+    stages = args.stages.split(',')
+    for stage in stages:
+        if not (stage in BENCHMARK_STAGES):
+            raise Exception('Unknown stage "'+stage+'", expected one of: '+', '.join(BENCHMARK_STAGES))
+    if not os.path.exists(args.workDir):
+        os.makedirs(args.workDir)
+    benchmark = runBenchmark(args.workDir, [int(scale) for scale in args.scales.split(',')], stages, args)
+
+    if args.outputFN is None:
+        json.dump(benchmark, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.outputFN, 'w') as fp:
+            json.dump(benchmark, fp, indent=2)
+
+def addServerArguments(p):
+    '''
+    @param p - the parser to add the server address arguments to, shared by the job server and its client commands
+    '''
+    p.add_argument('--host', metavar='host', dest='host', type=str, default=DEFAULT_HOST, help='the job server address (default: '+DEFAULT_HOST+')')
+    p.add_argument('--port', metavar='port', dest='port', type=int, default=DEFAULT_PORT, help='the job server port (default: '+str(DEFAULT_PORT)+')')
+
+def addServeArguments(p):
+    '''
+    @param p - the parser to add the "serve" arguments to
+    '''
+    #optional arguments with default
+    DEFAULT_MEMORY = 1024
+    addServerArguments(p)
+    p.add_argument('-w', '--workers', metavar='workers', dest='workers', type=int, default=1, help='number of worker processes, which is also the number of jobs run at once (default: 1)')
+    p.add_argument('--memory', metavar='MB', dest='memoryMB', type=int, default=DEFAULT_MEMORY, help='megabytes of extracted site arrays each worker keeps in memory between jobs (default: '+str(DEFAULT_MEMORY)+')')
+    p.add_argument('--max-queue', metavar='jobs', dest='maxQueue', type=int, default=100, help='most jobs waiting for a worker, further submissions are refused (default: 100)')
+    p.add_argument('-v', '--verbose', dest='verbose', action='store_true', default=False, help='log every request to STDERR')
+
+def runServe(args):
+    '''
+    @param args - the parsed "serve" arguments
+    '''
+    from .JobServer import serve
+    serve(args.host, args.port, args.workers, args.memoryMB*1024*1024, args.maxQueue, args.verbose)
+
+def addSubmitArguments(p):
+    '''
+    @param p - the parser to add the "submit" arguments to
+    '''
+    #optional arguments with default
+    DEFAULT_DEPTH = 20
+    DEFAULT_QUAL = 20
+    addServerArguments(p)
+    p.add_argument('-d', metavar='depth', dest='depth', type=int, default=DEFAULT_DEPTH, help='minimum read depth to consider a variant (default: '+str(DEFAULT_DEPTH)+')')
+    p.add_argument('-q', metavar='quality', dest='quality', type=int, default=DEFAULT_QUAL, help='minimum quality to consider a variant (default: '+str(DEFAULT_QUAL)+')')
+    p.add_argument('--cache', metavar='cacheDir', dest='cacheDir', type=str, default=None, help='directory for cached per-site arrays, reused across runs and scripts (default: no cache)')
+    p.add_argument('--shard-size', metavar='bp', dest='shardSize', type=int, default=None, help='split contigs into regions of at most this many base pairs (default: whole contigs)')
+    p.add_argument('--regions', metavar='bedFN', dest='regionsFN', type=str, default=None, help='only use the records inside the regions of this BED file (default: everything)')
+    p.add_argument('--bins', metavar='bins', dest='bins', type=int, default=None, help='estimate the medians from a B-allele frequency histogram with this many bins (default: exact medians)')
+    p.add_argument('--bootstrap', metavar='replicates', dest='bootstrap', type=int, default=0, help='number of bootstrap replicates, adds '+str(CI_LEVEL)+'%% confidence interval columns (default: 0)')
+    p.add_argument('--seed', metavar='seed', dest='seed', type=int, default=0, help='random seed for the bootstrap replicates (default: 0)')
+    p.add_argument('-o', '--output', metavar='outputDir', dest='outDir', type=str, default=None, help='also draw the trio-ballele figures into this directory (default: table only)')
+    p.add_argument('--format', metavar='format', dest='imageFormat', type=str, default='png', choices=IMAGE_FORMATS, help='image format for the figures, one of '+', '.join(IMAGE_FORMATS)+' (default: png)')
+    p.add_argument('--dpi', metavar='dpi', dest='dpi', type=int, default=None, help='resolution of the saved figures (default: matplotlib default)')
+    p.add_argument('--density', dest='density', action='store_true', default=False, help='draw binned density images instead of alpha-blended scatter plots')
+    p.add_argument('--wait', dest='wait', action='store_true', default=False, help='wait for the job to finish and print its result instead of the queued status')
+
+    #required main arguments
+    p.add_argument('inputVCF', type=str, help='a tabix-formatted VCF file (data.vcf.gz) or an indexed BCF file (data.bcf) to analyze')
+    p.add_argument('proband', type=str, help='proband identifier in VCF')
+    p.add_argument('father', type=str, help='father identifier in VCF')
+    p.add_argument('mother', type=str, help='mother identifier in VCF')
+
+def runSubmit(args):
+    '''
+    @param args - the parsed "submit" arguments
+    '''
+    import json
+    from .JobServer import serverUrl, submitJob, waitJob
+
+    url = serverUrl(args.host, args.port)
+    spec = {'vcf' : args.inputVCF, 'proband' : args.proband, 'father' : args.father, 'mother' : args.mother, 'depth' : args.depth,
+        'quality' : args.quality, 'cacheDir' : args.cacheDir, 'bins' : args.bins, 'bootstrap' : args.bootstrap, 'seed' : args.seed,
+        'shardSize' : args.shardSize, 'regions' : args.regionsFN, 'outDir' : args.outDir, 'density' : args.density,
+        'imageFormat' : args.imageFormat, 'dpi' : args.dpi}
+    status = submitJob(url, spec)
+    if args.wait:
+        status = waitJob(url, status['id'])
+    json.dump(status, sys.stdout, indent=2)
+    print()
+    if status['state'] == 'failed':
+        sys.exit(1)
+
+def addStatusArguments(p):
+    '''
+    @param p - the parser to add the "status" arguments to
+    '''
+    addServerArguments(p)
+    p.add_argument('--jobs', dest='listJobs', action='store_true', default=False, help='list every job instead of the server status')
+    p.add_argument('jobId', type=int, nargs='?', default=None, help='a job id, prints the job status and result (default: the server status)')
+
+def runStatus(args):
+    '''
+    @param args - the parsed "status" arguments
+    '''
+    import json
+    from .JobServer import jobStatus, serverStatus, serverUrl
+
+    url = serverUrl(args.host, args.port)
+    if args.jobId is not None:
+        status = jobStatus(url, args.jobId)
+    elif args.listJobs:
+        status = jobStatus(url)
+    else:
+        status = serverStatus(url)
+    json.dump(status, sys.stdout, indent=2)
+    print()
+
+def addCancelArguments(p):
+    '''
+    @param p - the parser to add the "cancel" arguments to
+    '''
+    addServerArguments(p)
+    p.add_argument('jobId', type=int, help='the job to cancel')
+
+def runCancel(args):
+    '''
+    @param args - the parsed "cancel" arguments
+    '''
+    import json
+    from .JobServer import cancelJob, serverUrl
+
+    json.dump(cancelJob(serverUrl(args.host, args.port), args.jobId), sys.stdout, indent=2)
+    print()
+
+#the subcommands in the order listed by "mixoviz -h", each is (name, summary, description, add arguments function, run function)
+COMMANDS = [
+    ('ballele', 'B-allele frequency plots for one sample', 'This is a script for generating a B-allele frequencies plot per chromosome',
+        addBAlleleArguments, runBAllele),
+    ('trio-ballele', 'B-allele frequency plots of a trio split by parental genotypes',
+        'This script creates a B-allele trio plot per chromosome for all non-biallelic SNP sites', addTrioBAlleleArguments, runTrioBAllele),
+    ('trio-mixoploid', 'the diploid/triploid ratio table for a trio',
+        'This script calculates the ratios of diploid/triploid cells in a trio under the assumption that the extra copy is inherited from the maternal line',
+        addTrioMixoploidArguments, runTrioMixoploid),
+    ('trio-report', 'trio-mixoploid, trio-ballele, and ballele from one scan',
+        'This script runs TrioMixoploid.py, TrioBAllele.py, and BAllele.py (for each trio member) from a single scan of the VCF',
+        addTrioReportArguments, runTrioReport),
+    ('trio-pyramid', 'a multi-resolution pyramid of binned B-allele frequencies for a trio',
+        'This script scans the VCF once and writes binned B-allele frequency counts of the trio figure panels and each trio member at every zoom level',
+        addTrioPyramidArguments, runTrioPyramid),
+    ('pyramid-view', 'draw a region or a karyogram from a pyramid',
+        'This script draws any region, or a karyogram of every contig, from a "mixoviz trio-pyramid" file without reading the VCF',
+        addPyramidViewArguments, runPyramidView),
+    ('cohort-mixoploid', 'the ratio table for every trio in a joint-called VCF',
+        'This script calculates the ratios of diploid/triploid cells for every trio in a joint-called VCF from a single scan',
+        addCohortMixoploidArguments, runCohortMixoploid),
+    ('conformance', 'check that every VCF reader backend gives the same results',
+        'This script extracts a trio with every installed VCF reader backend and checks the sites and ratio tables match a reference backend',
+        addConformanceArguments, runConformance),
+    ('simulate', 'write a synthetic trio VCF', 'This script writes a synthetic trio VCF with a known diploid fraction for testing and benchmarking',
+        addSimulateArguments, runSimulate),
+    ('benchmark', 'time the commands on synthetic VCFs',
+        'This script times the scripts on synthetic trio VCFs of several sizes and writes the results as JSON', addBenchmarkArguments,
+        runBenchmarkCommand),
+    ('serve', 'run a local job server with warm worker processes',
+        'This runs a local job server, its workers keep the imports, VCF readers, and site arrays warm between trio jobs', addServeArguments,
+        runServe),
+    ('submit', 'queue a trio job on the job server', 'This queues a trio-mixoploid job, and optionally the trio-ballele figures, on the job server',
+        addSubmitArguments, runSubmit),
+    ('status', 'the status of the job server or one of its jobs', 'This prints the status of the job server, its jobs, or one job as JSON',
+        addStatusArguments, runStatus),
+    ('cancel', 'cancel a queued or running job', 'This cancels a job on the job server', addCancelArguments, runCancel)
+]
+
+def main(argv=None, command=None):
+    '''
+    This is the entry point of the mixoviz command
+    @param argv - the arguments to parse (default: sys.argv[1:])
+    @param command - if set, argv holds the arguments of this one subcommand, used by the standalone scripts in scripts/
+    '''
+    for name, summary, desc, addArguments, run in COMMANDS:
+        if name == command:
+            p = ap.ArgumentParser(description=desc, formatter_class=ap.RawTextHelpFormatter)
+            addArguments(p)
+            run(p.parse_args(argv))
+            return
+    if command is not None:
+        raise Exception('Unknown command "'+command+'"')
+
+    #first set up the arg parser
+    DESC = 'Mixoploidy detection and B-allele frequency plots for trios, run "mixoviz <command> -h" for the options of each command'
+    p = ap.ArgumentParser(prog='mixoviz', description=DESC, formatter_class=ap.RawTextHelpFormatter)
+    subparsers = p.add_subparsers(dest='command', metavar='command')
+    subparsers.required = True
+    for name, summary, desc, addArguments, run in COMMANDS:
+        sp = subparsers.add_parser(name, help=summary, description=desc, formatter_class=ap.RawTextHelpFormatter)
+        addArguments(sp)
+        sp.set_defaults(run=run)
+
+    #parse the arguments and run the command
+    args = p.parse_args(argv)
+    args.run(args)
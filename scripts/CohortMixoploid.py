@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+'''
+Usage: python3 CohortMixoploid.py -h
+
+This script runs the TrioMixoploid.py calculation for every trio in a joint-called VCF using a single scan of the file.
+
+This is the same as "mixoviz cohort-mixoploid", kept so the script can be run from a checkout without installing the package.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mixoviz.cli import main
+
+if __name__ == '__main__':
+    main(sys.argv[1:], command='cohort-mixoploid')
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+'''
+Usage: python3 SimulateTrio.py -h
+
+This script writes a synthetic trio VCF (bgzipped and tabix-indexed) for testing and benchmarking without patient data.
+
+This is the same as "mixoviz simulate", kept so the script can be run from a checkout without installing the package.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mixoviz.cli import main
+
+if __name__ == '__main__':
+    main(sys.argv[1:], command='simulate')
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+'''
+Usage: python3 TrioReport.py -h
+
+This script produces the full trio report from a single scan of the VCF: the TrioMixoploid.py table, the TrioBAllele.py figures, and
+the BAllele.py figures for the proband, father, and mother.
+
+This is the same as "mixoviz trio-report", kept so the script can be run from a checkout without installing the package.
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mixoviz.cli import main
+
+if __name__ == '__main__':
+    main(sys.argv[1:], command='trio-report')
@@ -0,0 +1,59 @@
+'''
+Checks that every installed VCF reader backend extracts the same arrays from a simulated trio VCF, with and without the threaded BGZF
+decompression.  Backends that are not installed are skipped.
+'''
+
+import importlib
+
+import pytest
+
+from mixoviz.Bgzf import IO_QUEUE_ENV, IO_THREADS_ENV
+from mixoviz.SimulateTrio import parseContigs, simulateTrio
+from mixoviz.VcfReaders import checkConformance
+
+#the module each backend needs, None for the built-in parser
+BACKEND_MODULES = {'raw': None, 'pysam': 'pysam', 'cyvcf2': 'cyvcf2', 'pyvcf': 'vcf'}
+
+#the contig without records checks that every backend reports it the same way
+CONTIGS = 'chr1:400000,chr2:250000,chrX:150000,chrM:16'
+
+def isInstalled(name):
+    '''
+    @param name - a key of BACKEND_MODULES
+    @return - True if the backend can be imported
+    '''
+    if BACKEND_MODULES[name] is None:
+        return True
+    try:
+        importlib.import_module(BACKEND_MODULES[name])
+    except ImportError:
+        return False
+    return True
+
+@pytest.fixture(scope='module')
+def simulatedVCF(tmp_path_factory):
+    '''
+    @return - a small simulated trio VCF with multi-allelic records and indels, indexed by SimulateTrio.py
+    '''
+    vcfFN = str(tmp_path_factory.mktemp('readers')/'sim.vcf.gz')
+    simulateTrio(vcfFN, 5000, parseContigs(CONTIGS), seed=1)
+    return vcfFN
+
+@pytest.mark.parametrize('ioThreads', [0, 2])
+@pytest.mark.parametrize('reader', sorted(BACKEND_MODULES))
+def test_conformance(simulatedVCF, reader, ioThreads, monkeypatch):
+    if not isInstalled(reader):
+        pytest.skip(reader+' is not installed')
+    #a short queue makes the threaded path wait on the parser as well as the other way around
+    monkeypatch.setenv(IO_THREADS_ENV, str(ioThreads))
+    monkeypatch.setenv(IO_QUEUE_ENV, '2')
+
+    reference = 'pyvcf' if isInstalled('pyvcf') else 'raw'
+    labels = ['PROBAND', 'FATHER', 'MOTHER']
+    referenceName, results = checkConformance(simulatedVCF, labels, [reader], reference)
+    assert referenceName == reference
+    name, numContigs, numSites, seconds, difference = results[0]
+    assert name == reader
+    assert numContigs == 4
+    assert numSites > 0
+    assert difference is None